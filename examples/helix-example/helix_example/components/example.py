@@ -23,10 +23,8 @@ class ExampleComponent(component.Component):
     def generate(self):
         template = utils.source(__name__, "example.c")
 
-        cowsay = utils.find("cowsay")
-        output, _ = utils.run(
-            "{} {}".format(cowsay, self.configuration["message"]), cwd="./"
-        )
+        cowsay = utils.find("cowsay", quote=False)
+        output, _ = utils.run([cowsay, self.configuration["message"]], cwd="./")
         formatted = repr(output.decode("utf-8")).replace("'", "")
 
         function = utils.substitute(template, message=formatted)
@@ -0,0 +1,538 @@
+"""Benchmarks.
+
+End-to-end build benchmarks of standard scenarios built from only the bundled
+example Components, micro-benchmarks of core Python primitives at increasing
+input sizes, and utilities for comparing results against a saved baseline.
+"""
+
+import os
+import sys
+import math
+import time
+import types
+import shutil
+import platform
+import tempfile
+import pkg_resources
+
+from . import build
+from . import utils
+from . import blueprint
+from . import component
+from . import exceptions
+from . import instrumentation
+
+from .blueprints.cmake import cmake
+
+TRANSFORM_CONFIGURATION = {"replace-example": {"old": "hello", "new": "goodbye"}}
+"""Configuration for bundled Transforms which require it."""
+
+STATUS_SUCCESS = "success"
+STATUS_SKIPPED = "skipped"
+STATUS_FAILURE = "failure"
+
+
+def _configuration(name, blueprint, components, transforms=None):
+    return {
+        "name": name,
+        "blueprint": {"name": blueprint},
+        "components": components,
+        "transforms": transforms or [],
+    }
+
+
+def scenarios(components=20, blueprint="cmake-cpp"):
+    """Standard end-to-end build scenarios.
+
+    Scenarios include the ``minimal-example`` and ``configuration-example``
+    Components alone, many configured Components in a single build, each
+    available Transform, and each available Blueprint (with no Components, to
+    measure its fixed cost).
+
+    Args:
+        components (int): The number of Components to include in the many
+            Components scenario.
+        blueprint (str): The Blueprint to use for all but the Blueprint
+            scenarios.
+
+    Returns:
+        A dictionary of build configurations by scenario name.
+    """
+
+    minimal = {"name": "minimal-example"}
+
+    def configured(index):
+        return {
+            "name": "configuration-example",
+            "configuration": {
+                "first_word": "hello{}".format(index),
+                "second_word": "world",
+            },
+        }
+
+    scenarios = {
+        "minimal-example": _configuration("benchmark", blueprint, [minimal]),
+        "configuration-example": _configuration(
+            "benchmark", blueprint, [configured(0)]
+        ),
+        "components-{}".format(components): _configuration(
+            "benchmark", blueprint, [configured(i) for i in range(components)]
+        ),
+    }
+
+    for transform in utils.load("helix.transforms"):
+        specification = {"name": transform.name}
+        if transform.name in TRANSFORM_CONFIGURATION:
+            specification["configuration"] = TRANSFORM_CONFIGURATION[transform.name]
+
+        scenarios["transform-{}".format(transform.name)] = _configuration(
+            "benchmark", blueprint, [minimal], [specification]
+        )
+
+    for other in utils.load("helix.blueprints"):
+        scenarios["blueprint-{}".format(other.name)] = _configuration(
+            "benchmark", other.name, []
+        )
+
+    return scenarios
+
+
+def measure(configuration, repeat=3, warmup=1, working=None):
+    """Benchmark a single build configuration.
+
+    Args:
+        configuration (dict): A build configuration.
+        repeat (int): The number of measured builds.
+        warmup (int): The number of unmeasured builds to run first.
+        working (str): A scratch directory for builds. A temporary directory
+            is used if not provided.
+
+    Returns:
+        A dictionary of results including the number of ``samples`` built,
+        their total ``wall`` time, the build ``rate`` (samples per second),
+        the mean wall time of each build stage, ``stages``, and the peak RSS
+        of any subprocess, ``maxrss`` (bytes).
+
+    Raises:
+        Any exception raised by ``build.build``.
+    """
+
+    temporary = working is None
+    if temporary:
+        working = tempfile.mkdtemp()
+
+    stages = {}
+    maxrss = 0
+    wall = 0.0
+
+    try:
+        for iteration in range(warmup + repeat):
+            output = os.path.join(working, str(iteration))
+
+            with instrumentation.Collector() as collector:
+                start = time.perf_counter()
+                result = build.build(configuration, output)
+                elapsed = time.perf_counter() - start
+
+            shutil.rmtree(output, ignore_errors=True)
+
+            if iteration < warmup:
+                continue
+
+            wall += elapsed
+
+            for name, stage in result.timings["stages"].items():
+                stages[name] = stages.get(name, 0.0) + stage["wall"] / repeat
+
+            for entry in instrumentation.accounting(collector.spans):
+                maxrss = max(maxrss, entry.get("maxrss", 0))
+    finally:
+        if temporary:
+            shutil.rmtree(working, ignore_errors=True)
+
+    return {
+        "samples": repeat,
+        "wall": wall,
+        "rate": repeat / wall if wall else None,
+        "stages": stages,
+        "maxrss": maxrss,
+    }
+
+
+def environment():
+    """Describe the current benchmark environment."""
+
+    try:
+        version = pkg_resources.get_distribution("helix").version
+    except pkg_resources.DistributionNotFound:
+        version = None
+
+    return {
+        "helix": version,
+        "python": platform.python_version(),
+        "platform": sys.platform,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run(scenarios, repeat=3, warmup=1, callback=None):
+    """Benchmark a collection of scenarios.
+
+    Scenarios with uninstalled dependencies are skipped, scenarios which fail
+    to build are recorded as failures.
+
+    Args:
+        scenarios (dict): Build configurations by scenario name.
+        repeat (int): The number of measured builds per scenario.
+        warmup (int): The number of unmeasured builds per scenario.
+        callback: An optional function called with the name and result of
+            each scenario as it completes.
+
+    Returns:
+        A JSON-serializable dictionary of the benchmark ``environment`` and
+        ``scenarios`` results by name, each with a ``status``.
+    """
+
+    results = {}
+
+    for name, configuration in scenarios.items():
+        try:
+            result = measure(configuration, repeat=repeat, warmup=warmup)
+            result["status"] = STATUS_SUCCESS
+        except (exceptions.NotInstalled, exceptions.EntrypointNotFound) as e:
+            result = {"status": STATUS_SKIPPED, "error": str(e)}
+        except Exception as e:
+            result = {"status": STATUS_FAILURE, "error": str(e)}
+
+        results[name] = result
+
+        if callback is not None:
+            callback(name, result)
+
+    return {"environment": environment(), "scenarios": results}
+
+
+def compare(results, baseline, threshold=0.1):
+    """Compare benchmark results against a baseline.
+
+    A regression is a build rate lower than, or a peak RSS higher than, the
+    baseline by more than ``threshold``. Scenarios which succeeded in the
+    baseline but not in ``results`` are also regressions.
+
+    Args:
+        results (dict): Benchmark results, as returned by ``run``.
+        baseline (dict): Baseline benchmark results.
+        threshold (float): The allowed relative change (e.g., ``0.1`` for
+            10%).
+
+    Returns:
+        A list of ``(scenario, metric, baseline, current)`` regressions.
+    """
+
+    regressions = []
+
+    for name, previous in baseline["scenarios"].items():
+        current = results["scenarios"].get(name)
+
+        if current is None or previous["status"] != STATUS_SUCCESS:
+            continue
+
+        if current["status"] != STATUS_SUCCESS:
+            regressions.append((name, "status", previous["status"], current["status"]))
+            continue
+
+        if previous["rate"] and current["rate"] < previous["rate"] * (1 - threshold):
+            regressions.append((name, "rate", previous["rate"], current["rate"]))
+
+        if previous["maxrss"] and current["maxrss"] > previous["maxrss"] * (
+            1 + threshold
+        ):
+            regressions.append((name, "maxrss", previous["maxrss"], current["maxrss"]))
+
+    return regressions
+
+
+class _MicroComponent(component.Component):
+    """A synthetic Component for micro-benchmarks."""
+
+    name = "micro-benchmark"
+    verbose_name = "Micro Benchmark"
+    description = "A synthetic Component for micro-benchmarks"
+    version = "1.0.0"
+    type = "benchmark"
+    date = "2000-01-01 00:00:00.000000"
+
+    blueprints = ["micro-benchmark"]
+
+
+def _component(size, finalized=True):
+    """Create a synthetic Component with ``size`` functions and globals."""
+
+    functions = ["int ${{f{0}}}() {{ return {0}; }}".format(i) for i in range(size)]
+
+    class Component(_MicroComponent):
+        pass
+
+    Component.globals = ["f{}".format(i) for i in range(size)]
+    Component.tags = tuple(("index", str(i)) for i in range(size))
+    Component.libraries = ["library{}".format(i) for i in range(size)]
+
+    instance = Component()
+    instance.functions = list(functions)
+    instance.calls = {"main": ["${{f{}}}();".format(i) for i in range(size)]}
+
+    if finalized:
+        instance.finalize()
+
+    return instance
+
+
+class _MicroBlueprint(blueprint.Blueprint):
+    """A synthetic Blueprint for micro-benchmarks."""
+
+    name = "micro-benchmark"
+    verbose_name = "Micro Benchmark"
+    description = "A synthetic Blueprint for micro-benchmarks"
+    version = "1.0.0"
+    type = "benchmark"
+
+    callsites = ["main"]
+
+    def generate(self, directory):
+        return []
+
+    def compile(self, directory, options):
+        return []
+
+
+def _substitute(size):
+    template = " ".join("${{p{}}}".format(i) for i in range(size))
+    parameters = {"p{}".format(i): str(i) for i in range(size)}
+
+    return lambda: utils.substitute(template, safe=False, **parameters)
+
+
+def _parse(size):
+    specification = "name:{}".format(
+        ",".join("k{0}=v{0}".format(i) for i in range(size))
+    )
+
+    return lambda: utils.parse(specification)
+
+
+def _configure(size):
+    class Configurable(utils.Configurable):
+        options = {"o{}".format(i): {"default": str(i)} for i in range(size)}
+
+    configurable = Configurable()
+    parameters = {"o{}".format(i): "value" for i in range(size)}
+
+    return lambda: configurable.configure(**parameters)
+
+
+def _finalize(size):
+    instance = _component(size, finalized=False)
+    functions, calls = instance.functions, instance.calls["main"]
+
+    def finalize():
+        instance.functions = functions
+        instance.calls = {"main": calls}
+        instance.finalize()
+
+    return finalize
+
+
+def _blueprint(size):
+    components = [_component(1) for _ in range(size)]
+
+    return lambda: _MicroBlueprint("micro", components)
+
+
+def _aggregation(size):
+    instance = _MicroBlueprint("micro", [_component(1) for _ in range(size)])
+
+    def aggregate():
+        instance.tags
+        instance.functions
+        instance.calls
+
+    return aggregate
+
+
+def _cmake(size):
+    instance = types.SimpleNamespace(components=[_component(1) for _ in range(size)])
+
+    return lambda: cmake.CMakeBlueprint._aggregate(instance, "libraries")
+
+
+def _load(size):
+    def load():
+        for _ in range(size):
+            utils.load("helix.components", "minimal-example")
+
+    return load
+
+
+MICRO = {
+    "substitute": _substitute,
+    "parse": _parse,
+    "configure": _configure,
+    "finalize": _finalize,
+    "blueprint-init": _blueprint,
+    "blueprint-aggregation": _aggregation,
+    "cmake-aggregate": _cmake,
+    "load": _load,
+}
+"""Micro-benchmark setup functions by name.
+
+Each takes an input size and returns a function to be timed: ``substitute``
+(template parameters), ``parse`` (specification parameters), ``configure``
+(options), ``finalize`` (functions and globals), ``blueprint-init`` (sanity
+checks over Components), ``blueprint-aggregation`` (``tags``, ``functions``,
+and ``calls`` over Components), ``cmake-aggregate`` (Components), and
+``load`` (entrypoint lookups).
+"""
+
+
+def timeit(function, minimum=0.02, repeat=3):
+    """Time a function.
+
+    The function is called in a loop, doubling the number of calls until the
+    loop takes at least ``minimum`` seconds, and the best of ``repeat`` loops
+    is taken.
+
+    Args:
+        function: A function with no arguments.
+        minimum (float): The minimum loop time (seconds).
+        repeat (int): The number of loops to time.
+
+    Returns:
+        The time per call (seconds).
+    """
+
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+
+        if elapsed >= minimum:
+            break
+
+        number *= 2
+
+    best = elapsed
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, time.perf_counter() - start)
+
+    return best / number
+
+
+def exponent(sizes, times):
+    """Estimate how time scales with input size.
+
+    Args:
+        sizes (list): Input sizes.
+        times (list): Times for each input size.
+
+    Returns:
+        The least-squares slope of ``log(time)`` against ``log(size)`` - e.g.,
+        ``1`` for linear and ``2`` for quadratic scaling.
+    """
+
+    x = [math.log(s) for s in sizes]
+    y = [math.log(t) for t in times]
+
+    mx, my = sum(x) / len(x), sum(y) / len(y)
+
+    numerator = sum((a - mx) * (b - my) for a, b in zip(x, y))
+    denominator = sum((a - mx) ** 2 for a in x)
+
+    return numerator / denominator if denominator else None
+
+
+def micro(sizes=(10, 100, 1000), benchmarks=None, callback=None):
+    """Run micro-benchmarks of core primitives at increasing input sizes.
+
+    Args:
+        sizes (list): Input sizes.
+        benchmarks (list): Names of benchmarks to run (see ``MICRO``) -
+            default: all.
+        callback: An optional function called with the name and result of
+            each benchmark as it completes.
+
+    Returns:
+        A JSON-serializable dictionary of the benchmark ``environment`` and
+        ``benchmarks`` results by name, each with the input ``sizes``, the
+        ``times`` per call (seconds) at each size, and the scaling
+        ``exponent``.
+    """
+
+    results = {}
+
+    for name in benchmarks or MICRO:
+        times = [timeit(MICRO[name](size)) for size in sizes]
+
+        result = {
+            "sizes": list(sizes),
+            "times": times,
+            "exponent": exponent(sizes, times) if len(sizes) > 1 else None,
+        }
+
+        results[name] = result
+
+        if callback is not None:
+            callback(name, result)
+
+    return {"environment": environment(), "benchmarks": results}
+
+
+def compare_micro(results, baseline, threshold=0.1, tolerance=0.25):
+    """Compare micro-benchmark results against a baseline.
+
+    A regression is a time at the largest common input size higher than the
+    baseline by more than ``threshold``, or a scaling exponent higher than the
+    baseline by more than ``tolerance``.
+
+    Args:
+        results (dict): Micro-benchmark results, as returned by ``micro``.
+        baseline (dict): Baseline micro-benchmark results.
+        threshold (float): The allowed relative change in time.
+        tolerance (float): The allowed absolute change in scaling exponent.
+
+    Returns:
+        A list of ``(benchmark, metric, baseline, current)`` regressions.
+    """
+
+    regressions = []
+
+    for name, previous in baseline["benchmarks"].items():
+        current = results["benchmarks"].get(name)
+
+        if current is None:
+            continue
+
+        common = set(previous["sizes"]) & set(current["sizes"])
+        if common:
+            size = max(common)
+            before = previous["times"][previous["sizes"].index(size)]
+            after = current["times"][current["sizes"].index(size)]
+
+            if after > before * (1 + threshold):
+                regressions.append((name, "time@{}".format(size), before, after))
+
+        if (
+            previous["exponent"] is not None
+            and current["exponent"] is not None
+            and current["exponent"] > previous["exponent"] + tolerance
+        ):
+            regressions.append(
+                (name, "exponent", previous["exponent"], current["exponent"])
+            )
+
+    return regressions
@@ -4,6 +4,7 @@ import abc
 from . import transform
 from . import utils
 from . import exceptions
+from . import instrumentation
 
 
 class Blueprint(utils.Metadata, utils.Dependable, metaclass=abc.ABCMeta):
@@ -168,15 +169,18 @@ class Blueprint(utils.Metadata, utils.Dependable, metaclass=abc.ABCMeta):
             if not targets:
                 transformed = True
 
-            for target in targets:
-                transformed_target = "{}.transformed".format(target)
-                if transform.supported(target):
-                    transform.transform(target, transformed_target)
+            with instrumentation.span(
+                transform.name, instrumentation.CATEGORY_TRANSFORM, type=type
+            ):
+                for target in targets:
+                    transformed_target = "{}.transformed".format(target)
+                    if transform.supported(target):
+                        transform.transform(target, transformed_target)
 
-                    os.remove(target)
-                    os.rename(transformed_target, target)
+                        os.remove(target)
+                        os.rename(transformed_target, target)
 
-                    transformed = True
+                        transformed = True
 
             if not transformed:
                 raise exceptions.BuildFailure(
@@ -194,8 +198,8 @@ class Blueprint(utils.Metadata, utils.Dependable, metaclass=abc.ABCMeta):
             directory (str): A directory with generated source code.
             options (dict): An optional dictionary of additional build options
                 that should be respected by this function. This will contain
-                things like ``stdout``, ``stderr`` and ``propagate`` for
-                display options.
+                things like ``stdout``, ``stderr``, ``propagate``, ``tee`` and
+                ``tail`` for display options (see ``utils.run``).
 
         Returns:
             A list of built artifacts.
@@ -207,11 +211,65 @@ class Blueprint(utils.Metadata, utils.Dependable, metaclass=abc.ABCMeta):
 
         return []
 
+    def prepare(self, directory):
+        """Generates code and applies source Transforms.
+
+        The first stages of ``build``.
+
+        Args:
+            directory (str): A directory to write the resulting generated source
+                code.
+        """
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        stage = instrumentation.CATEGORY_STAGE
+
+        with instrumentation.span("generate", stage):
+            sources = self.generate(directory)
+        with instrumentation.span("source-transforms", stage):
+            self.transform(transform.Transform.TYPE_SOURCE, sources)
+
+    def produce(self, directory, options=None):
+        """Compiles code generated with ``prepare``.
+
+        The compilation stage of ``build``.
+
+        Args:
+            directory (str): A directory with generated source code.
+            options (dict): An optional dictionary of additional build options
+                that should be used by ``compile``.
+
+        Returns:
+            A list of built artifacts.
+        """
+
+        with instrumentation.span("compile", instrumentation.CATEGORY_STAGE):
+            return self.compile(directory, options=options or {})
+
+    def finish(self, artifacts):
+        """Applies artifact Transforms to artifacts built with ``produce``.
+
+        The final stage of ``build``.
+
+        Args:
+            artifacts (list): A list of built artifacts.
+        """
+
+        with instrumentation.span(
+            "artifact-transforms", instrumentation.CATEGORY_STAGE
+        ):
+            self.transform(transform.Transform.TYPE_ARTIFACT, artifacts)
+
     def build(self, directory, options=None):
         """Fully builds this Blueprint.
 
         Generates code from Components, applies source Transforms, compiles
-        code, and applies artifact Transforms.
+        code, and applies artifact Transforms. Each stage is timed with
+        ``instrumentation.span`` - use an ``instrumentation.Collector`` to
+        observe them. The stages may also be run separately with ``prepare``,
+        ``produce``, and ``finish``.
 
         Args:
             directory (str): A directory to write the resulting generated source
@@ -223,14 +281,8 @@ class Blueprint(utils.Metadata, utils.Dependable, metaclass=abc.ABCMeta):
             A list of built and transformed artifacts.
         """
 
-        options = options or {}
-
-        if not os.path.isdir(directory):
-            os.makedirs(directory)
-
-        sources = self.generate(directory)
-        self.transform(transform.Transform.TYPE_SOURCE, sources)
-        artifacts = self.compile(directory, options=options)
-        self.transform(transform.Transform.TYPE_ARTIFACT, artifacts)
+        self.prepare(directory)
+        artifacts = self.produce(directory, options)
+        self.finish(artifacts)
 
         return artifacts
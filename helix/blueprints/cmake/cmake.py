@@ -135,14 +135,14 @@ class CMakeBlueprint(blueprint.Blueprint, metaclass=abc.ABCMeta):
     def compile(self, directory, options):
         """:meta private:"""
 
-        cmake = utils.find("cmake")
+        cmake = utils.find("cmake", quote=False)
 
         build_directory = os.path.join(directory, "build")
 
         if not os.path.exists(build_directory):
             os.makedirs(build_directory)
 
-        cmd = "{} ..".format(cmake)
+        cmd = [cmake, ".."]
         utils.run(
             cmd,
             build_directory,
@@ -150,9 +150,11 @@ class CMakeBlueprint(blueprint.Blueprint, metaclass=abc.ABCMeta):
             propagate=options.get("propagate"),
             stdout=options.get("stdout"),
             stderr=options.get("stderr"),
+            tee=options.get("tee"),
+            tail=options.get("tail"),
         )
 
-        cmd = "{} --build .".format(cmake)
+        cmd = [cmake, "--build", "."]
         utils.run(
             cmd,
             build_directory,
@@ -160,6 +162,8 @@ class CMakeBlueprint(blueprint.Blueprint, metaclass=abc.ABCMeta):
             propagate=options.get("propagate"),
             stdout=options.get("stdout"),
             stderr=options.get("stderr"),
+            tee=options.get("tee"),
+            tail=options.get("tail"),
         )
 
         binary = self.__binary(build_directory)
@@ -1,5 +1,8 @@
+import os
+
 from . import utils
 from . import exceptions
+from . import instrumentation
 
 
 def sane(configuration):
@@ -60,6 +63,96 @@ def load(entrypoint, specification):
         )
 
 
+class Result(tuple):
+    """The result of a build.
+
+    Unpacks as an ``(artifacts, tags)`` tuple and additionally includes build
+    ``timings``.
+
+    Args:
+        artifacts (list): A list of build artifact paths.
+        tags (tuple): Tags aggregated from all Components and Transforms.
+        timings (dict): Build timings as returned by
+            ``instrumentation.summarize``, with the ``size`` of each artifact.
+    """
+
+    def __new__(cls, artifacts, tags, timings=None):
+        result = super().__new__(cls, (artifacts, tags))
+        result.timings = timings
+
+        return result
+
+    def __getnewargs__(self):
+        return self.artifacts, self.tags, self.timings
+
+    @property
+    def artifacts(self):
+        return self[0]
+
+    @property
+    def tags(self):
+        return self[1]
+
+
+def configure(configuration):
+    """Load and configure everything needed to build a given configuration.
+
+    This is the ``configure`` stage of ``build``: Components are configured,
+    generated, and finalized, Transforms are configured, and the Blueprint is
+    created (and checked for sanity).
+
+    Args:
+        configuration: A dictionary describing blueprint, components, and
+            transforms - see ``build``.
+
+    Returns:
+        A Blueprint instance, ready to build.
+    """
+
+    sane(configuration)
+
+    with instrumentation.span("configure", instrumentation.CATEGORY_STAGE):
+        blueprint = load("helix.blueprints", configuration["blueprint"])
+
+        components = []
+        for specification in configuration["components"]:
+            component = load("helix.components", specification)()
+            component.configure(**specification.get("configuration", {}))
+            component.generate()
+            component.finalize()
+
+            components.append(component)
+
+        transforms = []
+        for specification in configuration["transforms"]:
+            transform = load("helix.transforms", specification)()
+            transform.configure(**specification.get("configuration", {}))
+
+            transforms.append(transform)
+
+    return blueprint(configuration["name"], components, transforms)
+
+
+def result(blueprint, artifacts, spans):
+    """Build a ``Result`` for a finished build.
+
+    Args:
+        blueprint: The built Blueprint instance.
+        artifacts (list): A list of build artifact paths.
+        spans (list): Spans collected during the build.
+
+    Returns:
+        A ``Result`` including timings summarized from ``spans``.
+    """
+
+    timings = instrumentation.summarize(spans)
+    timings["artifacts"] = [
+        {"path": artifact, "size": os.path.getsize(artifact)} for artifact in artifacts
+    ]
+
+    return Result(artifacts, blueprint.tags, timings)
+
+
 def build(configuration, output, options=None):
     """Build a given configuration.
 
@@ -71,10 +164,14 @@ def build(configuration, output, options=None):
             transforms to use for this build.
         output (str): The path to the output directory.
         options (dict): An optional dictionary of additional options to be
-            passed to the build command.
+            passed to the build command. A ``timeout`` option limits the total
+            time (seconds) of commands run by the build and a
+            ``command_timeout`` option limits the time of each command - see
+            ``utils.deadline``.
 
     Returns:
-        A list of build artifact paths.
+        A ``Result`` which unpacks as a tuple of build artifact paths and
+        tags, and includes per-stage, per-Transform, and subprocess timings.
 
     Example:
         Example configuration dictionary::
@@ -102,27 +199,11 @@ def build(configuration, output, options=None):
 
     options = options or {}
 
-    sane(configuration)
-
-    blueprint = load("helix.blueprints", configuration["blueprint"])
-
-    components = []
-    for specification in configuration["components"]:
-        component = load("helix.components", specification)()
-        component.configure(**specification.get("configuration", {}))
-        component.generate()
-        component.finalize()
-
-        components.append(component)
-
-    transforms = []
-    for specification in configuration["transforms"]:
-        transform = load("helix.transforms", specification)()
-        transform.configure(**specification.get("configuration", {}))
-
-        transforms.append(transform)
-
-    blueprint = blueprint(configuration["name"], components, transforms)
-    artifacts = blueprint.build(output, options=options)
+    with instrumentation.Collector() as collector, utils.deadline(
+        options.get("timeout"), command=options.get("command_timeout")
+    ):
+        with instrumentation.span("build", instrumentation.CATEGORY_BUILD):
+            blueprint = configure(configuration)
+            artifacts = blueprint.build(output, options=options)
 
-    return artifacts, blueprint.tags
+    return result(blueprint, artifacts, collector.spans)
@@ -0,0 +1,187 @@
+import json
+
+from .... import component
+from ..minimal import minimal
+
+
+class SyntheticComponent(minimal.MinimalExampleComponent):
+    """A dependency-free generated component.
+
+    Synthetic components are built on the minimal example component but
+    generate their source from a handful of size parameters rather than from
+    a template. They are intended for load and scaling tests - do not create
+    these classes directly, use ``synthesize()`` instead.
+    """
+
+    name = "synthetic"
+    verbose_name = "Synthetic"
+    description = "A generated component for load and scaling tests."
+    type = "synthetic"
+
+    blueprints = ["cmake-c", "cmake-cpp", "static-cmake-c", "static-cmake-cpp"]
+
+    size = 1
+    """The number of functions to generate."""
+
+    statements = 1
+    """The number of statements in the body of each function."""
+
+    variables = 1
+    """The number of global variables to generate."""
+
+    def generate(self):
+        variables = ["variable_{}".format(i) for i in range(self.variables)]
+        functions = ["function_{}".format(i) for i in range(self.size)]
+
+        source = []
+
+        if variables:
+            source.append(
+                "\n".join("static int ${{{}}} = 0;".format(v) for v in variables)
+            )
+
+        for index, function in enumerate(functions):
+            body = []
+
+            if index == 0:
+                for option, value in sorted(self.configuration.items()):
+                    body.append(
+                        "const char *{} = {};".format(option, json.dumps(str(value)))
+                    )
+                    body.append("(void){};".format(option))
+
+            for statement in range(self.statements):
+                if variables:
+                    target = "${{{}}}".format(
+                        variables[
+                            (index * self.statements + statement) % len(variables)
+                        ]
+                    )
+                else:
+                    target = "argc"
+
+                body.append("{} += {};".format(target, statement))
+
+            body.append("(void)argv;")
+
+            source.append(
+                "int ${{{}}}(int argc, char **argv) {{\n    {}\n    return 0;\n}}".format(
+                    function, "\n    ".join(body)
+                )
+            )
+
+        self.functions = source
+        self.calls = {"main": ["${{{}}}(argc, argv);".format(f) for f in functions]}
+        self.globals = variables + functions
+
+
+def synthesize(
+    count=1,
+    functions=1,
+    statements=1,
+    globals=1,
+    options=0,
+    tags=0,
+    prefix=SyntheticComponent.name,
+    blueprint="cmake-cpp",
+):
+    """Generate a number of synthetic Component classes.
+
+    Each generated Component has no dependencies and is supported by a single
+    CMake Blueprint, so large libraries of Components may be created for load
+    and scaling tests without writing or installing real plugins, and used
+    without any other Components to pick out a Blueprint.
+
+    Args:
+        count (int): The number of Components to generate.
+        functions (int): The number of functions in each Component.
+        statements (int): The number of statements in each function.
+        globals (int): The number of global variables in each Component (in
+            addition to its functions, which are also globals).
+        options (int): The number of configuration options of each Component.
+            Each option has a default value so generated Components may be
+            used without configuration.
+        tags (int): The number of tags of each Component, in addition to the
+            standard ``family`` and ``sample`` tags.
+        prefix (str): A prefix for generated Component names - Components are
+            named ``<prefix>-<index>``.
+        blueprint (str): The Blueprint which supports generated Components -
+            one of the CMake Blueprints supported by ``SyntheticComponent``.
+
+    Returns:
+        A list of ready to use Component classes.
+    """
+
+    for name, value in (
+        ("count", count),
+        ("functions", functions),
+        ("statements", statements),
+        ("globals", globals),
+        ("options", options),
+        ("tags", tags),
+    ):
+        if not isinstance(value, int) or value < 0:
+            raise ValueError(
+                "{} must be a non-negative integer (got {!r})".format(name, value)
+            )
+
+    if blueprint not in SyntheticComponent.blueprints:
+        raise ValueError(
+            "blueprint must be one of {} (got {!r})".format(
+                ", ".join(SyntheticComponent.blueprints), blueprint
+            )
+        )
+
+    generated = []
+
+    for index in range(count):
+        name = "{}-{}".format(prefix, index)
+
+        attributes = {
+            "__module__": __name__,
+            "name": name,
+            "verbose_name": "Synthetic {}".format(index),
+            "tags": (("family", "synthetic"), ("sample", name))
+            + tuple(("tag_{}".format(t), "value-{}".format(t)) for t in range(tags)),
+            "options": {
+                "option_{}".format(o): {"default": "value-{}".format(o)}
+                for o in range(options)
+            },
+            "blueprints": [blueprint],
+            "size": functions,
+            "statements": statements,
+            "variables": globals,
+        }
+
+        generated.append(
+            type(
+                "SyntheticComponent{}".format(index), (SyntheticComponent,), attributes
+            )
+        )
+
+    return generated
+
+
+class SyntheticComponentLoader(component.Loader):
+    """Load synthetic Components from a JSON specification.
+
+    The file should contain a single object with a ``synthetic`` key whose
+    value is passed as keyword arguments to ``synthesize()``. For example:
+
+    .. code-block:: json
+
+        {"synthetic": {"count": 10000, "functions": 4, "options": 2}}
+
+    Generated Components are supported by the ``cmake-cpp`` Blueprint unless
+    the specification includes a different ``blueprint``.
+    """
+
+    def load(self, f):
+        specification = json.load(f)
+
+        if not isinstance(specification, dict) or not isinstance(
+            specification.get("synthetic"), dict
+        ):
+            raise ValueError("not a synthetic component specification")
+
+        return synthesize(**specification["synthetic"])
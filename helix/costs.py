@@ -0,0 +1,424 @@
+"""Build cost estimates from past dataset builds.
+
+Build times vary widely between samples depending on their Components and
+Transforms (e.g., Components which link large libraries or packed
+artifacts). A cost model records how long past builds took in a small local
+SQLite database and uses it to estimate the cost of planned samples so that
+the most expensive samples may be started first, and to project the time,
+disk usage, and failure rate of a dataset before it is built.
+"""
+
+import os
+import heapq
+import sqlite3
+
+from . import utils
+from . import dataset
+from . import storage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS costs (
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    total REAL NOT NULL,
+    PRIMARY KEY (kind, name)
+);
+
+CREATE TABLE IF NOT EXISTS outcomes (
+    name TEXT PRIMARY KEY,
+    attempts INTEGER NOT NULL,
+    failures INTEGER NOT NULL
+);
+"""
+
+KIND_COMPONENT = "component"
+"""Costs of Components - their share of the build time of each sample."""
+
+KIND_TRANSFORM = "transform"
+"""Costs of Transforms - the time taken to apply each Transform."""
+
+DEFAULT = os.path.join(os.path.expanduser("~"), ".helix", "costs.sqlite")
+"""A conventional cost model path, shared between runs."""
+
+
+def _name(specification):
+    return utils.parse(dataset.specification(specification))["name"]
+
+
+class CostModel(object):
+    """A persistent model of the build cost of Components and Transforms.
+
+    The cost of a sample is estimated as the sum of the average costs of its
+    Components and Transforms. Each Component in a sample is charged an
+    equal share of the time the sample took to build, excluding Transforms,
+    so Components which are often included in slow samples become expensive
+    over time. Components and Transforms which have never been built are
+    assumed to cost as much as the average Component or Transform.
+
+    Costs are updated in memory as samples are added and written when the
+    model is flushed or closed.
+
+    Args:
+        path (str): The path to the SQLite database - created, along with its
+            parent directory, if it does not exist.
+
+    Example:
+        Ordering samples longest expected first::
+
+            with costs.CostModel(costs.DEFAULT) as model:
+                samples = model.order(samples, key=lambda s: (s, transforms))
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+        self.costs = {
+            (kind, name): [count, total]
+            for kind, name, count, total in self.connection.execute(
+                "SELECT kind, name, count, total FROM costs"
+            )
+        }
+        self.changed = set()
+        self.defaults = {}
+
+        self.outcomes = {
+            name: [attempts, failures]
+            for name, attempts, failures in self.connection.execute(
+                "SELECT name, attempts, failures FROM outcomes"
+            )
+        }
+        self.attempted = set()
+
+    def cost(self, kind, name):
+        """The average cost of a single Component or Transform.
+
+        Args:
+            kind (str): ``KIND_COMPONENT`` or ``KIND_TRANSFORM``.
+            name (str): The name of the Component or Transform.
+
+        Returns:
+            The average cost in seconds, or ``None`` if it has never been
+            built.
+        """
+
+        if (kind, name) not in self.costs:
+            return None
+
+        count, total = self.costs[(kind, name)]
+
+        return total / count
+
+    def default(self, kind):
+        """The average cost of all known Components or Transforms.
+
+        Args:
+            kind (str): ``KIND_COMPONENT`` or ``KIND_TRANSFORM``.
+
+        Returns:
+            The average cost in seconds, or ``None`` if none are known.
+        """
+
+        if kind not in self.defaults:
+            costs = [self.cost(k, n) for k, n in self.costs if k == kind]
+
+            self.defaults[kind] = sum(costs) / len(costs) if costs else None
+
+        return self.defaults[kind]
+
+    def failure(self, name):
+        """The fraction of past samples including a Component which failed.
+
+        Args:
+            name (str): The name of the Component.
+
+        Returns:
+            A tuple of the failure rate (or ``None`` if the Component has never
+            been built), number of samples attempted, and number of failures.
+        """
+
+        attempts, failures = self.outcomes.get(name, (0, 0))
+
+        return (failures / attempts if attempts else None), attempts, failures
+
+    def estimate(self, components, transforms=None):
+        """Estimate the build time of a sample.
+
+        Args:
+            components (list): Component specification strings or classes.
+            transforms (list): Transform specification strings.
+
+        Returns:
+            The estimated build time in seconds, or ``None`` if nothing is
+            known about any Component or Transform.
+        """
+
+        total = None
+
+        for kind, specifications in (
+            (KIND_COMPONENT, components),
+            (KIND_TRANSFORM, transforms or []),
+        ):
+            default = self.default(kind)
+
+            for specification in specifications:
+                cost = self.cost(kind, _name(specification))
+                if cost is None:
+                    cost = default
+
+                if cost is not None:
+                    total = (total or 0.0) + cost
+
+        return total
+
+    def order(self, samples, key=None):
+        """Sort samples by estimated cost, most expensive first.
+
+        Samples with equal estimates (e.g., when nothing is known) keep their
+        original order.
+
+        Args:
+            samples (list): Samples to sort.
+            key: A function returning the Components and Transforms of a
+                sample as a tuple of lists. Default: each sample is a list of
+                Components, without Transforms.
+
+        Returns:
+            A new, sorted list of ``samples``.
+        """
+
+        key = key or (lambda sample: (sample, []))
+
+        def cost(sample):
+            return self.estimate(*key(sample)) or 0.0
+
+        return sorted(samples, key=cost, reverse=True)
+
+    def update(self, kind, name, cost):
+        """Record a single cost observation.
+
+        Args:
+            kind (str): ``KIND_COMPONENT`` or ``KIND_TRANSFORM``.
+            name (str): The name of the Component or Transform.
+            cost (float): The observed cost in seconds.
+        """
+
+        observations = self.costs.setdefault((kind, name), [0, 0.0])
+        observations[0] += 1
+        observations[1] += cost
+
+        self.changed.add((kind, name))
+        self.defaults.pop(kind, None)
+
+    def add(self, record):
+        """Record the costs and outcome of a built sample.
+
+        Every sample counts toward the failure rate of its Components, but
+        the costs of samples which failed (other than by timing out) are
+        ignored, since failures are usually fast and say nothing of the cost
+        of a build.
+
+        Args:
+            record (dict): A sample record, as returned by ``dataset.process``.
+        """
+
+        for name in {_name(c) for c in record["components"]}:
+            outcomes = self.outcomes.setdefault(name, [0, 0])
+            outcomes[0] += 1
+            outcomes[1] += 1 if record["error"] else 0
+
+            self.attempted.add(name)
+
+        if record.get("timings"):
+            transforms = record["timings"]["transforms"]
+            for transform in transforms:
+                self.update(KIND_TRANSFORM, transform["name"], transform["wall"])
+
+            duration = record["timings"]["wall"] - sum(t["wall"] for t in transforms)
+        elif record.get("timeout") and record.get("duration") is not None:
+            duration = record["duration"]
+        else:
+            return
+
+        components = record["components"]
+        for component in components:
+            self.update(KIND_COMPONENT, _name(component), duration / len(components))
+
+    def flush(self):
+        """Write all changed costs in a single transaction."""
+
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO costs VALUES (?, ?, ?, ?)",
+                [
+                    (kind, name, *self.costs[(kind, name)])
+                    for kind, name in self.changed
+                ],
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO outcomes VALUES (?, ?, ?)",
+                [(name, *self.outcomes[name]) for name in self.attempted],
+            )
+
+        self.changed = set()
+        self.attempted = set()
+
+    def close(self):
+        """Write any changed costs and close the database."""
+
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def makespan(estimates, workers):
+    """Project the total time to build samples longest expected first.
+
+    Args:
+        estimates (list): The estimated build time of each sample.
+        workers (int): The number of parallel workers.
+
+    Returns:
+        The time until the last sample is built if each sample is started,
+        longest first, by the first worker to become free.
+    """
+
+    finished = [0.0] * max(workers, 1)
+
+    for estimate in sorted(estimates, reverse=True):
+        heapq.heappush(finished, heapq.heappop(finished) + estimate)
+
+    return max(finished)
+
+
+def footprint(record):
+    """Measure the disk usage of a built sample.
+
+    Args:
+        record (dict): A sample record, as returned by ``dataset.process``,
+            whose build directory has not yet been stored or removed.
+
+    Returns:
+        A dictionary of the bytes used by ``artifacts``, by ``intermediates``
+        (everything else in the build directory), and by the subset of
+        intermediates which are build ``logs``.
+    """
+
+    artifacts = sum(os.path.getsize(a) for a in record["artifacts"])
+
+    total = 0
+    for root, _, files in os.walk(record["directory"]):
+        for name in files:
+            path = os.path.join(root, name)
+
+            if not os.path.islink(path):
+                total += os.path.getsize(path)
+
+    logs = 0
+    for name in storage.LOGS:
+        path = os.path.join(record["directory"], name)
+
+        if os.path.isfile(path):
+            logs += os.path.getsize(path)
+
+    return {"artifacts": artifacts, "intermediates": total - artifacts, "logs": logs}
+
+
+def project(model, samples, workers, footprints=None, retention=storage.RETENTION_ALL):
+    """Project the cost of building a dataset.
+
+    Build times and failure rates are estimated from ``model`` and disk usage
+    from the ``footprints`` of a number of sample builds (e.g., of a random
+    subset of the planned samples). Components are assumed to fail
+    independently.
+
+    Args:
+        model (CostModel): A cost model.
+        samples (list): The planned samples, each a tuple of Component and
+            Transform specifications.
+        workers (int): The number of parallel workers.
+        footprints (list): Tuples of ``(record, footprint)`` for sample builds
+            (see ``footprint``).
+        retention (str): The retention policy for build intermediates - see
+            ``storage.RETENTION_*``.
+
+    Returns:
+        A dictionary of the projected ``wall`` time (or ``None`` if nothing is
+        known about the cost of any sample), total build time (``cpu``),
+        expected ``failures``, bytes used by ``artifacts`` and retained
+        ``intermediates`` and the ``scratch`` space used by builds in
+        progress (each ``None`` without ``footprints``), and the failure rate,
+        attempts, and failures of each Component (``components``, by name).
+    """
+
+    estimates = [model.estimate(*sample) for sample in samples]
+    known = [e for e in estimates if e is not None]
+
+    if known:
+        average = sum(known) / len(known)
+        estimates = [average if e is None else e for e in estimates]
+
+    components = {}
+    for sample, _ in samples:
+        for name in {_name(c) for c in sample}:
+            if name not in components:
+                components[name] = model.failure(name)
+
+    failures = 0.0
+    for sample, _ in samples:
+        success = 1.0
+        for name in {_name(c) for c in sample}:
+            success *= 1 - (components[name][0] or 0.0)
+
+        failures += 1 - success
+
+    projection = {
+        "samples": len(samples),
+        "workers": workers,
+        "wall": makespan(estimates, workers) if known else None,
+        "cpu": sum(estimates) if known else None,
+        "failures": failures,
+        "artifacts": None,
+        "intermediates": None,
+        "scratch": None,
+        "components": components,
+    }
+
+    if footprints:
+        successful = [f for r, f in footprints if not r["error"]]
+        failed = [f for r, f in footprints if r["error"]]
+
+        def mean(values):
+            return sum(values) / len(values) if values else 0
+
+        artifacts = mean([f["artifacts"] for f in successful])
+        intermediates = mean([f["intermediates"] for _, f in footprints])
+        logs = mean([f["logs"] for f in failed])
+
+        successes = len(samples) - failures
+
+        projection["artifacts"] = round(artifacts * successes)
+
+        if retention == storage.RETENTION_ALL:
+            projection["intermediates"] = round(intermediates * len(samples))
+        elif retention == storage.RETENTION_FAILURE:
+            projection["intermediates"] = round(logs * failures)
+        else:
+            projection["intermediates"] = 0
+
+        projection["scratch"] = round(
+            mean([f["artifacts"] + f["intermediates"] for _, f in footprints])
+            * min(workers, len(samples))
+        )
+
+    return projection
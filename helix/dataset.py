@@ -0,0 +1,1095 @@
+"""Dataset generation utilities.
+
+Sampling strategies for selecting combinations of Components as well as a
+parallel, streaming interface for building the resulting samples.
+"""
+
+import os
+import re
+import math
+import errno
+import signal
+import copy
+import time
+import uuid
+import queue
+import random
+import shutil
+import inspect
+import threading
+import tempfile
+import traceback
+import subprocess
+import multiprocessing
+import concurrent.futures
+
+from . import build
+from . import utils
+from . import component
+from . import exceptions
+from . import instrumentation
+
+TAIL = 64 * 1024
+"""The maximum number of bytes of build output retained in memory per stream.
+
+Build output is streamed to ``stdout.txt`` and ``stderr.txt`` so only the
+tail is kept, for error messages.
+"""
+
+
+ENGINE_PROCESS = "process"
+"""Build samples in a pool of worker processes."""
+
+ENGINE_THREAD = "thread"
+"""Build samples in a pool of threads in the current process.
+
+Builds spend nearly all of their time waiting on subprocesses, so a single
+process can drive many more concurrent builds than a pool of processes for the
+same memory.
+"""
+
+ENGINES = (ENGINE_PROCESS, ENGINE_THREAD)
+
+ENGINE_PIPELINE = "pipeline"
+"""Build samples in stages, each with its own pool of threads - see
+``pipeline``.
+
+This only applies to building samples, so it is not an ``execute`` engine.
+"""
+
+STAGE_PREPARE = "prepare"
+"""Configure Components and Transforms, generate code, and apply source
+Transforms."""
+
+STAGE_COMPILE = "compile"
+"""Compile generated code."""
+
+STAGE_TRANSFORM = "transform"
+"""Apply artifact Transforms."""
+
+STAGES = (STAGE_PREPARE, STAGE_COMPILE, STAGE_TRANSFORM)
+
+
+class SamplingError(Exception):
+    """Raised when there is a problem generating a sample list."""
+
+
+def simple(collection, samples, components):
+    """A single component per sample for every component.
+
+    Note:
+        This simply ignores the requested number of samples and components and
+        returns a single sample with a single component for every component in
+        the collection.
+    """
+
+    return [[c] for c in collection]
+
+
+def _check(collection, components):
+    if components > len(collection):
+        raise SamplingError(
+            "cannot select {} components per sample from {} components".format(
+                components, len(collection)
+            )
+        )
+
+
+def rand(collection, samples, components):
+    """A completely random dataset - may contain exact duplicates."""
+
+    _check(collection, components)
+
+    options = []
+
+    for _ in range(samples):
+        options.append(random.sample(collection, components))
+
+    return options
+
+
+def walk(collection, samples, components):
+    """A sample walk with random permutations for increased similarity.
+
+    Generates a dataset by randomly replacing a random number of components
+    from one build to the next to inject aditional similarity over a simple
+    random strategy.
+    """
+
+    CHANGE = 0.02
+
+    _check(collection, components)
+
+    options = []
+
+    for _ in range(samples):
+        if options:
+            sample = copy.deepcopy(options[-1])
+
+            change = random.randint(0, math.ceil(components * CHANGE))
+            for _ in range(change):
+                changed = random.randint(0, components - 1)
+                sample[changed] = random.choice(collection)
+
+            options.append(sample)
+        else:
+            options.append(random.sample(collection, components))
+
+    return options
+
+
+def specification(component):
+    """A printable specification of a Component string or class.
+
+    Args:
+        component: A Component specification string or Component class.
+
+    Returns:
+        ``component`` if it is already a string, otherwise the Component's
+        name.
+    """
+
+    if isinstance(component, str):
+        return component
+
+    return component.name
+
+
+def configuration(name, blueprint, components, transforms, loads=None):
+    """Build a configuration dictionary for a single sample.
+
+    Args:
+        name (str): The build name.
+        blueprint: A Blueprint name or class.
+        components (list): Component specification strings (see
+            ``utils.parse``) or Component classes.
+        transforms (list): Transform specification strings.
+        loads (list): Optional files from which additional Components should
+            be loaded (see ``component.load``).
+
+    Returns:
+        A configuration dictionary suitable for ``build.build``.
+    """
+
+    configuration = {"name": name}
+
+    if isinstance(blueprint, str):
+        configuration["blueprint"] = {"name": blueprint}
+    else:
+        configuration["blueprint"] = {"class": blueprint}
+
+    configuration["components"] = [
+        utils.parse(c) if isinstance(c, str) else {"class": c} for c in components
+    ]
+
+    if loads:
+        loaded = []
+        for load in loads:
+            with open(load, "r") as f:
+                loaded += component.load(f)
+
+        for specification in configuration["components"]:
+            if "name" not in specification:
+                continue
+
+            for c in loaded:
+                if c().name == specification["name"]:
+                    specification["class"] = c
+                    specification.pop("name")
+                    break
+
+    configuration["transforms"] = [utils.parse(t) for t in transforms]
+
+    return configuration
+
+
+def _record(components, working, index):
+    """Create a sample record and its build directory."""
+
+    identifier = uuid.uuid4().hex
+
+    project = os.path.join(working, identifier)
+
+    os.makedirs(project)
+
+    return {
+        "identifier": identifier,
+        "index": index,
+        "components": list(components),
+        "directory": project,
+        "artifacts": [],
+        "tags": (),
+        "error": None,
+        "timeout": False,
+        "transient": False,
+        "attempts": 1,
+        "duration": None,
+        "timings": None,
+        "spans": [],
+    }
+
+
+TRANSIENT_ERRNOS = frozenset(
+    getattr(errno, name)
+    for name in ("ENOSPC", "ENOMEM", "EAGAIN", "EMFILE", "ENFILE", "EDQUOT")
+    if hasattr(errno, name)
+)
+"""Operating system errors caused by exhausted resources, which may succeed if
+retried."""
+
+KILLED = re.compile(
+    rb"Killed signal terminated program"
+    rb"|unable to execute command: Killed"
+    rb"|^Killed\b"
+    rb"|Error 137\b",
+    re.MULTILINE,
+)
+"""Build output reporting a command killed by ``SIGKILL`` (e.g., by the out of
+memory killer) - from GCC, Clang, a shell, or ``make``."""
+
+
+def _killed(error):
+    """Check if a failed command, or one of its children, was killed."""
+
+    if error.returncode < 0 or error.returncode == 128 + signal.SIGKILL:
+        return True
+
+    for output in (error.stderr, error.output):
+        if isinstance(output, str):
+            output = output.encode("utf-8", "replace")
+
+        if output and KILLED.search(output):
+            return True
+
+    return False
+
+
+def transient(error):
+    """Check if a build error is likely to be transient.
+
+    Commands killed by a signal - or whose children were killed, e.g.,
+    compilers killed by the out of memory killer under ``make`` - and
+    operating system errors caused by exhausted resources (see
+    ``TRANSIENT_ERRNOS``, e.g., out of disk space) may succeed if retried.
+    Commands which exit with an error (e.g., compilation errors), missing
+    tools, timeouts, and all other errors are assumed to fail again.
+
+    Args:
+        error (Exception): The error raised by a build.
+
+    Returns:
+        ``True`` if ``error`` is likely to be transient.
+    """
+
+    if isinstance(error, exceptions.BuildTimeout):
+        return False
+
+    while error is not None:
+        if isinstance(error, OSError):
+            return error.errno in TRANSIENT_ERRNOS
+        if isinstance(error, subprocess.CalledProcessError):
+            return _killed(error)
+
+        error = error.__cause__
+
+    return False
+
+
+def _fail(record, error):
+    """Record the failure of a sample - call while handling ``error``."""
+
+    record["error"] = str(error)
+    record["timeout"] = isinstance(error, exceptions.BuildTimeout)
+    record["transient"] = transient(error)
+
+    with open(os.path.join(record["directory"], "exception.txt"), "w") as f:
+        traceback.print_exc(file=f)
+
+
+def process(
+    blueprint, components, transforms, loads, working, index=None, options=None
+):
+    """Build a single sample.
+
+    The sample is built in a new, uniquely named directory inside of
+    ``working``. Build output is logged to ``stdout.txt`` and ``stderr.txt``
+    in that directory and, if the build fails, the traceback is written to
+    ``exception.txt``.
+
+    Args:
+        blueprint: A Blueprint name or class.
+        components (list): Component specifications for this sample.
+        transforms (list): Transform specifications for this sample.
+        loads (list): Optional files from which to load additional Components.
+        working (str): The directory in which the sample should be built.
+        index (int): The optional position of this sample in the dataset plan.
+        options (dict): Additional build options (e.g., ``timeout``) - see
+            ``build.build``.
+
+    Returns:
+        A dictionary describing the sample: its ``identifier``, ``index``, the
+        ``components`` included, the build ``directory``, the build
+        ``duration`` in seconds, all instrumentation ``spans`` recorded during
+        the build, and either the resulting ``artifacts``, ``tags``, and build
+        ``timings`` or the ``error`` that caused the build to fail (and
+        ``timeout``, whether that error was a ``BuildTimeout``, and
+        ``transient``, whether it is likely to be transient - see
+        ``transient``). ``attempts`` counts builds of the sample - see
+        ``retry``.
+    """
+
+    record = _record(components, working, index)
+
+    identifier = record["identifier"]
+    project = record["directory"]
+
+    start = time.perf_counter()
+
+    stdout = os.path.join(project, "stdout.txt")
+    stderr = os.path.join(project, "stderr.txt")
+
+    collector = instrumentation.Collector()
+
+    with open(stdout, "wb") as stdout, open(stderr, "wb") as stderr:
+        try:
+            with collector, instrumentation.span(
+                "sample",
+                instrumentation.CATEGORY_SAMPLE,
+                identifier=identifier,
+                index=index,
+            ):
+                result = build.build(
+                    configuration(identifier, blueprint, components, transforms, loads),
+                    project,
+                    options=dict(
+                        options or {}, stdout=stdout, stderr=stderr, tail=TAIL
+                    ),
+                )
+        except Exception as e:
+            _fail(record, e)
+
+            record["duration"] = time.perf_counter() - start
+            record["spans"] = collector.spans
+
+            return record
+
+    record["artifacts"] = result.artifacts
+    record["tags"] = result.tags
+    record["timings"] = result.timings
+    record["duration"] = time.perf_counter() - start
+    record["spans"] = collector.spans
+
+    return record
+
+
+def _threaded(function, arguments, workers, prefetch):
+    """Apply a function to argument tuples in a pool of threads."""
+
+    pending = set()
+
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+
+        def submit():
+            try:
+                argument = next(arguments)
+            except StopIteration:
+                return False
+
+            pending.add(executor.submit(function, *argument))
+
+            return True
+
+        try:
+            while len(pending) < workers + prefetch and submit():
+                pass
+
+            while pending:
+                done, _ = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+
+                for future in done:
+                    pending.remove(future)
+                    result = future.result()
+
+                    submit()
+
+                    yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def execute(function, arguments, workers=1, prefetch=0, engine=ENGINE_PROCESS):
+    """Apply a function to argument tuples in parallel.
+
+    Results are yielded as soon as they are available, in completion order.
+    At most ``workers + prefetch`` calls are in flight or waiting to be
+    consumed at any time, so memory usage is bounded regardless of the number
+    of arguments.
+
+    Args:
+        function: A picklable function to apply.
+        arguments: An iterable of argument tuples.
+        workers (int): The number of concurrent calls. If ``1``, calls are
+            made sequentially in the current process.
+        prefetch (int): The number of additional results which may be
+            buffered ahead of the consumer.
+        engine (str): ``ENGINE_PROCESS`` to make calls in a pool of worker
+            processes or ``ENGINE_THREAD`` to make calls on threads of the
+            current process. Default: ``ENGINE_PROCESS``.
+
+    Returns:
+        A generator of function results.
+
+    Note:
+        With ``ENGINE_THREAD``, ``function`` must be thread-safe - building
+        samples with ``process`` is.
+    """
+
+    if engine not in ENGINES:
+        raise ValueError("unknown engine: {}".format(engine))
+
+    arguments = iter(arguments)
+
+    if workers == 1:
+        for argument in arguments:
+            yield function(*argument)
+
+        return
+
+    if engine == ENGINE_THREAD:
+        yield from _threaded(function, arguments, workers, prefetch)
+
+        return
+
+    results = queue.Queue()
+
+    with multiprocessing.Pool(workers) as pool:
+
+        def submit():
+            try:
+                argument = next(arguments)
+            except StopIteration:
+                return False
+
+            pool.apply_async(
+                function,
+                argument,
+                callback=lambda r: results.put((True, r)),
+                error_callback=lambda e: results.put((False, e)),
+            )
+
+            return True
+
+        pending = 0
+        while pending < workers + prefetch and submit():
+            pending += 1
+
+        while pending:
+            success, result = results.get()
+            pending -= 1
+
+            if not success:
+                raise result
+
+            if submit():
+                pending += 1
+
+            yield result
+
+
+class _Job(object):
+    """A single sample moving through the stages of ``pipeline``."""
+
+    def __init__(
+        self, blueprint, components, transforms, loads, working, index, options
+    ):
+        self.arguments = blueprint, components, transforms, loads
+        self.options = options or {}
+        self.record = _record(components, working, index)
+
+        self.collector = instrumentation.Collector()
+        self.elapsed = 0.0
+
+        self.blueprint = None
+        self.artifacts = None
+
+        self.logs = [
+            os.path.join(self.record["directory"], name)
+            for name in ("stdout.txt", "stderr.txt")
+        ]
+        for path in self.logs:
+            open(path, "wb").close()
+
+    def prepare(self, options):
+        self.blueprint = build.configure(
+            configuration(self.record["identifier"], *self.arguments)
+        )
+        self.blueprint.prepare(self.record["directory"])
+
+    def compile(self, options):
+        self.artifacts = self.blueprint.produce(self.record["directory"], options)
+
+    def transform(self, options):
+        self.blueprint.finish(self.artifacts)
+
+    def run(self, stage):
+        """Run a single stage, unless a previous stage failed."""
+
+        if self.record["error"]:
+            return
+
+        # Only time spent in stages counts toward the build timeout, not time
+        # spent waiting for a worker.
+        remaining = self.options.get("timeout")
+        if remaining is not None:
+            remaining = max(remaining - self.elapsed, 0)
+
+        with open(self.logs[0], "ab") as stdout, open(self.logs[1], "ab") as stderr:
+            options = dict(self.options, stdout=stdout, stderr=stderr, tail=TAIL)
+
+            start = time.perf_counter()
+
+            try:
+                with self.collector, utils.deadline(
+                    remaining, command=self.options.get("command_timeout")
+                ):
+                    getattr(self, stage)(options)
+            except Exception as e:
+                _fail(self.record, e)
+            finally:
+                self.elapsed += time.perf_counter() - start
+
+    def finish(self):
+        """Complete the sample record."""
+
+        record = self.record
+        spans = list(self.collector.spans)
+
+        stages = [s for s in spans if s["category"] == instrumentation.CATEGORY_STAGE]
+        if stages:
+            spans.append(
+                instrumentation.envelope(
+                    stages, "build", instrumentation.CATEGORY_BUILD
+                )
+            )
+            spans.append(
+                instrumentation.envelope(
+                    stages,
+                    "sample",
+                    instrumentation.CATEGORY_SAMPLE,
+                    identifier=record["identifier"],
+                    index=record["index"],
+                )
+            )
+
+        record["duration"] = self.elapsed
+        record["spans"] = spans
+
+        if not record["error"]:
+            result = build.result(self.blueprint, self.artifacts, spans)
+
+            record["artifacts"] = result.artifacts
+            record["tags"] = result.tags
+            record["timings"] = result.timings
+
+        return record
+
+
+def stage_workers(workers=None):
+    """The number of workers for each stage of ``pipeline``.
+
+    Args:
+        workers (dict): The number of workers for some stages, by name.
+
+    Returns:
+        A dictionary of the number of workers for every stage in ``STAGES``
+        - the number of CPUs for ``STAGE_COMPILE`` and half the number of CPUs
+        for other stages unless given in ``workers``.
+
+    Raises:
+        ValueError: If ``workers`` includes an unknown stage or a number of
+            workers less than one.
+    """
+
+    cpus = os.cpu_count() or 1
+
+    sizes = {stage: max(cpus // 2, 1) for stage in STAGES}
+    sizes[STAGE_COMPILE] = cpus
+
+    for stage, count in (workers or {}).items():
+        if stage not in STAGES:
+            raise ValueError("unknown stage: {}".format(stage))
+        if count < 1:
+            raise ValueError(
+                "{} stage requires at least one worker (got {})".format(stage, count)
+            )
+
+        sizes[stage] = count
+
+    return sizes
+
+
+def pipeline(arguments, workers=None, prefetch=0):
+    """Build samples in a pipeline of stages with separate worker pools.
+
+    Each sample passes through the ``STAGES`` in order, each of which has its
+    own pool of worker threads, so that different stages of different samples
+    overlap - e.g., while one sample compiles, the next is configured and the
+    last is transformed. At most ``sum(workers) + prefetch`` samples are in
+    progress or waiting to be consumed at any time, so a slow stage applies
+    backpressure to the stages before it and memory usage is bounded.
+
+    Args:
+        arguments: An iterable of argument tuples for ``process``.
+        workers (dict): The number of workers for each stage, by name - see
+            ``stage_workers``.
+        prefetch (int): The number of additional results which may be
+            buffered ahead of the consumer.
+
+    Returns:
+        A generator of sample records (see ``process``) in completion order.
+    """
+
+    sizes = stage_workers(workers)
+
+    arguments = iter(arguments)
+
+    pools = {
+        stage: concurrent.futures.ThreadPoolExecutor(
+            sizes[stage], thread_name_prefix="helix-{}".format(stage)
+        )
+        for stage in STAGES
+    }
+
+    results = queue.Queue()
+    closed = threading.Event()
+
+    def advance(job, position):
+        if position == len(STAGES) or job.record["error"] or closed.is_set():
+            results.put(job)
+            return
+
+        stage = STAGES[position]
+
+        def run():
+            try:
+                if not closed.is_set():
+                    job.run(stage)
+            finally:
+                advance(job, position + 1)
+
+        pools[stage].submit(run)
+
+    def submit():
+        try:
+            argument = next(arguments)
+        except StopIteration:
+            return False
+
+        advance(_Job(*argument), 0)
+
+        return True
+
+    pending = 0
+
+    try:
+        while pending < sum(sizes.values()) + prefetch and submit():
+            pending += 1
+
+        while pending:
+            job = results.get()
+            pending -= 1
+
+            if submit():
+                pending += 1
+
+            yield job.finish()
+    finally:
+        closed.set()
+
+        for stage in STAGES:
+            pools[stage].shutdown(wait=True)
+
+
+class RetryPolicy(object):
+    """When and how often to retry transient build failures.
+
+    Args:
+        attempts (int): The maximum number of times to build each sample.
+        backoff (float): The minimum delay in seconds before the first retry.
+        factor (float): The factor by which the delay increases with each
+            further retry.
+    """
+
+    def __init__(self, attempts=3, backoff=1.0, factor=2.0):
+        if attempts < 1:
+            raise ValueError("attempts must be at least one (got {})".format(attempts))
+
+        self.attempts = attempts
+        self.backoff = backoff
+        self.factor = factor
+
+    def retryable(self, record):
+        """Check if a failed sample should be retried.
+
+        Args:
+            record (dict): A sample record, as returned by ``process``.
+
+        Returns:
+            ``True`` if the sample failed transiently and has attempts left.
+        """
+
+        return bool(
+            record["error"]
+            and record.get("transient")
+            and record.get("attempts", 1) < self.attempts
+        )
+
+    def delay(self, attempt):
+        """The minimum delay in seconds before a given attempt.
+
+        Args:
+            attempt (int): The attempt number - the first retry is attempt
+                ``2``.
+
+        Returns:
+            The delay in seconds.
+        """
+
+        return self.backoff * self.factor ** max(attempt - 2, 0)
+
+
+def _index(argument):
+    """The plan ``index`` of a ``process`` argument tuple."""
+
+    return inspect.signature(process).bind(*argument).arguments.get("index")
+
+
+def retry(build, arguments, policy):
+    """Build samples, retrying transient failures.
+
+    Retries have low priority: samples which failed transiently are only
+    built again once every sample of the previous attempt has been built,
+    and no sooner than ``policy.delay`` after their failure, so they never
+    hold up fresh work. The build directories of retried attempts are
+    removed.
+
+    Args:
+        build: A function taking an iterable of argument tuples for
+            ``process`` and returning a generator of sample records - e.g.,
+            ``lambda a: execute(process, a, workers=4)``.
+        arguments: An iterable of argument tuples for ``process``, each with
+            a distinct ``index``.
+        policy (RetryPolicy): The retry policy.
+
+    Raises:
+        ValueError: if an argument tuple has no ``index`` or shares it with
+            another.
+
+    Returns:
+        A generator of the final record of every sample, with the number of
+        ``attempts`` made.
+    """
+
+    attempt = 1
+    pending = arguments
+
+    while pending:
+        plan = {}
+
+        def track(arguments):
+            for argument in arguments:
+                index = _index(argument)
+
+                if index is None or index in plan:
+                    raise ValueError(
+                        "samples must have a distinct index to be retried (got "
+                        "{!r})".format(index)
+                    )
+
+                plan[index] = argument
+                yield argument
+
+        retries = []
+        failed = 0
+
+        for record in build(track(pending)):
+            record["attempts"] = attempt
+
+            if policy.retryable(record):
+                retries.append(plan[record["index"]])
+                failed = time.monotonic()
+
+                shutil.rmtree(record["directory"], ignore_errors=True)
+            else:
+                yield record
+
+        attempt += 1
+        pending = retries
+
+        if pending:
+            time.sleep(max(failed + policy.delay(attempt) - time.monotonic(), 0))
+
+
+def _read(blueprint, components, transforms, loads, working, cleanup, options):
+    """Build a single sample and read its artifacts into memory."""
+
+    record = process(blueprint, components, transforms, loads, working, options=options)
+
+    artifacts = []
+    if not record["error"]:
+        for artifact in record["artifacts"]:
+            with open(artifact, "rb") as f:
+                artifacts.append(f.read())
+
+    if cleanup:
+        shutil.rmtree(record["directory"], ignore_errors=True)
+
+    if record["error"]:
+        return None
+
+    return artifacts, record["tags"], record["components"]
+
+
+def stream(
+    blueprint,
+    samples,
+    transforms=None,
+    loads=None,
+    workers=1,
+    prefetch=None,
+    working=None,
+    cleanup=True,
+    options=None,
+    engine=ENGINE_PROCESS,
+):
+    """Build samples and yield their artifacts in memory as they complete.
+
+    This allows datasets to be consumed directly (e.g., by an online learning
+    process) without first writing the whole dataset to disk. With
+    ``cleanup`` enabled, each sample's scratch directory is removed as soon as
+    its artifacts have been read, so disk usage is constant regardless of the
+    number of samples generated.
+
+    Args:
+        blueprint: A Blueprint name or class.
+        samples: An iterable of samples, each a list of Component
+            specifications - e.g., the output of one of the sampling
+            strategies in this module.
+        transforms (list): Transform specifications to apply to all samples.
+        loads (list): Optional files from which to load additional Components.
+        workers (int): The number of parallel workers to use.
+        prefetch (int): The number of completed samples which may be buffered
+            ahead of the consumer. Default: ``workers``.
+        working (str): A scratch directory in which to build samples. If not
+            provided, a temporary directory is used and removed, along with
+            everything in it, when the stream is exhausted or closed.
+        cleanup (bool): If ``True``, remove scratch directories as soon as
+            their artifacts have been read. To keep scratch directories, also
+            provide ``working``.
+        options (dict): Additional build options (e.g., ``timeout``) - see
+            ``build.build``.
+        engine (str): The execution engine - see ``execute``.
+
+    Returns:
+        A generator of ``(artifacts, tags, plan)`` tuples for each sample that
+        built successfully, where ``artifacts`` is a list of artifact contents
+        as bytes and ``plan`` is the list of Component specifications included
+        in the sample. Failed samples are skipped.
+
+    Example:
+        Streaming random samples of a few Components::
+
+            samples = dataset.rand(["minimal-example", ...], 1000, 3)
+
+            for artifacts, tags, plan in dataset.stream("cmake-cpp", samples):
+                ...
+    """
+
+    transforms = transforms or []
+    prefetch = workers if prefetch is None else prefetch
+
+    temporary = working is None
+    if temporary:
+        working = tempfile.mkdtemp()
+
+    arguments = (
+        (blueprint, sample, transforms, loads, working, cleanup, options)
+        for sample in samples
+    )
+
+    try:
+        for result in execute(
+            _read, arguments, workers=workers, prefetch=prefetch, engine=engine
+        ):
+            if result is not None:
+                yield result
+    finally:
+        if temporary:
+            shutil.rmtree(working, ignore_errors=True)
+
+
+def preflight(
+    blueprint,
+    components,
+    loads=None,
+    workers=1,
+    working=None,
+    options=None,
+    engine=ENGINE_PROCESS,
+    callback=None,
+):
+    """Build each distinct Component alone to find those which cannot build.
+
+    A Component which fails to build (e.g., because of a missing header or a
+    bad configuration) fails every sample which includes it, so checking each
+    Component once before planning a dataset avoids wasting builds on samples
+    which can never succeed. Transforms are not applied.
+
+    Args:
+        blueprint: A Blueprint name or class.
+        components (list): Component specification strings or classes -
+            duplicate specifications are built once.
+        loads (list): Optional files from which to load additional Components.
+        workers (int): The number of parallel workers to use.
+        working (str): A scratch directory in which to build. If not provided,
+            a temporary directory is used. Build directories are removed.
+        options (dict): Additional build options (e.g., ``timeout``) - see
+            ``build.build``.
+        engine (str): The execution engine - see ``execute``.
+        callback: An optional function called with each sample record (see
+            ``process``) as it completes.
+
+    Returns:
+        A dictionary of the error of each Component which failed to build, by
+        specification (see ``specification``).
+    """
+
+    distinct = {}
+    for c in components:
+        distinct.setdefault(specification(c), c)
+
+    temporary = working is None
+    if temporary:
+        working = tempfile.mkdtemp()
+
+    arguments = (
+        (blueprint, [c], [], loads, working, index, options)
+        for index, c in enumerate(distinct.values())
+    )
+
+    failures = {}
+
+    try:
+        for record in execute(process, arguments, workers=workers, engine=engine):
+            if record["error"]:
+                failures[specification(record["components"][0])] = record["error"]
+
+            if callback:
+                callback(record)
+
+            shutil.rmtree(record["directory"], ignore_errors=True)
+    finally:
+        if temporary:
+            shutil.rmtree(working, ignore_errors=True)
+
+    return failures
+
+
+def bisect(
+    blueprint,
+    components,
+    transforms=None,
+    loads=None,
+    working=None,
+    options=None,
+    cache=None,
+):
+    """Find a minimal combination of Components which fails to build.
+
+    Subsets of a failing sample's Components are rebuilt, delta debugging
+    style, until no Component may be removed without the build succeeding.
+    Each Component of the result is then needed for the failure - e.g., a
+    single Component which never builds, or a pair which conflict.
+
+    Args:
+        blueprint: A Blueprint name or class.
+        components (list): The Component specifications of a failed sample.
+        transforms (list): Transform specifications to apply to all builds.
+        loads (list): Optional files from which to load additional Components.
+        working (str): A scratch directory in which to build. If not provided,
+            a temporary directory is used. Build directories are removed.
+        options (dict): Additional build options (e.g., ``timeout``) - see
+            ``build.build``.
+        cache (dict): Optional build results, shared between calls (and
+            threads) to avoid rebuilding the same combinations. Keys are
+            sorted tuples of Component specifications and values the build
+            error, or ``None`` if the combination built.
+
+    Returns:
+        A tuple of the minimal failing list of Components and its error, or
+        ``(None, None)`` if ``components`` builds successfully.
+    """
+
+    cache = {} if cache is None else cache
+
+    temporary = working is None
+    if temporary:
+        working = tempfile.mkdtemp()
+
+    def error(subset):
+        key = tuple(sorted(specification(c) for c in subset))
+
+        if key not in cache:
+            record = process(
+                blueprint, subset, transforms or [], loads, working, options=options
+            )
+            shutil.rmtree(record["directory"], ignore_errors=True)
+
+            cache[key] = record["error"]
+
+        return cache[key]
+
+    try:
+        failing = list(components)
+
+        if error(failing) is None:
+            return None, None
+
+        granularity = 2
+
+        while len(failing) >= 2:
+            size = math.ceil(len(failing) / granularity)
+            chunks = [failing[i : i + size] for i in range(0, len(failing), size)]
+
+            reduced = False
+
+            for chunk in chunks:
+                if error(chunk) is not None:
+                    failing, granularity, reduced = chunk, 2, True
+                    break
+
+            if not reduced and len(chunks) > 2:
+                for index in range(len(chunks)):
+                    complement = [
+                        c for i, chunk in enumerate(chunks) if i != index for c in chunk
+                    ]
+
+                    if error(complement) is not None:
+                        failing = complement
+                        granularity = max(granularity - 1, 2)
+                        reduced = True
+                        break
+
+            if not reduced:
+                if granularity >= len(failing):
+                    break
+
+                granularity = min(granularity * 2, len(failing))
+
+        return failing, error(failing)
+    finally:
+        if temporary:
+            shutil.rmtree(working, ignore_errors=True)
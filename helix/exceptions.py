@@ -29,6 +29,10 @@ class BuildFailure(Exception):
     """Raised when a Blueprint build fails."""
 
 
+class BuildTimeout(BuildFailure):
+    """Raised when a build or a command runs out of time."""
+
+
 class MissingDependency(Exception):
     """Raised when a dependency cannot be found."""
 
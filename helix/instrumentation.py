@@ -0,0 +1,341 @@
+"""Build instrumentation.
+
+Timed spans are recorded around each stage of a build (Component
+configuration, generation, Transforms, compilation) and around every
+subprocess. Spans are delivered to any ``Collector`` active in the current
+thread, so callers may observe builds without modifying Blueprints.
+"""
+
+import os
+import json
+import time
+import threading
+import contextlib
+
+CATEGORY_BUILD = "build"
+"""An entire build with ``build.build``."""
+
+CATEGORY_SAMPLE = "sample"
+"""A single dataset sample with ``dataset.process``."""
+
+CATEGORY_STAGE = "stage"
+"""A stage of ``build.build`` or ``Blueprint.build``."""
+
+CATEGORY_TRANSFORM = "transform"
+"""The application of a single Transform."""
+
+CATEGORY_SUBPROCESS = "subprocess"
+"""A single subprocess invocation with ``utils.run``."""
+
+_local = threading.local()
+
+
+def _collectors():
+    if not hasattr(_local, "collectors"):
+        _local.collectors = []
+
+    return _local.collectors
+
+
+class Collector(object):
+    """Collects spans recorded in the current thread while active.
+
+    Collectors are context managers and may be nested - spans are delivered to
+    every active Collector. Collected spans are safe to read from other
+    threads.
+
+    Example:
+        Collecting spans for a single build::
+
+            with instrumentation.Collector() as collector:
+                build.build(configuration, output)
+
+            for span in collector.spans:
+                ...
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def add(self, span):
+        """Add a single span.
+
+        Override this to observe spans as they are recorded.
+
+        Args:
+            span (dict): A span, as recorded by ``span``.
+        """
+
+        with self.lock:
+            self.spans.append(span)
+
+    def __enter__(self):
+        _collectors().append(self)
+        return self
+
+    def __exit__(self, *args):
+        _collectors().remove(self)
+
+
+def charge(seconds):
+    """Charge CPU time used by a subprocess to the current thread.
+
+    Process-wide children times include every subprocess waited for by any
+    thread, so ``utils.run`` charges the resource usage of each subprocess it
+    waits for to its own thread instead, to be included in the ``children``
+    time of enclosing spans.
+
+    Args:
+        seconds (float): User and system CPU time used by the subprocess.
+    """
+
+    _local.children = getattr(_local, "children", 0.0) + seconds
+
+
+def _cpu():
+    return time.thread_time(), getattr(_local, "children", 0.0)
+
+
+@contextlib.contextmanager
+def span(name, category, **details):
+    """Time a block of code.
+
+    If no Collector is active in the current thread this does nothing.
+
+    Args:
+        name (str): The name of the span.
+        category (str): The span category - see ``CATEGORY_*``.
+        **details: Additional JSON-serializable details to include.
+
+    Yields:
+        The span dictionary, which may be updated with additional details
+        before the block completes. On completion it includes the ``start``
+        time (seconds since the epoch), ``wall`` time, and ``cpu`` time used by
+        this thread and by ``children`` - subprocesses run and waited for by
+        this thread (seconds).
+    """
+
+    collectors = list(_collectors())
+
+    record = {
+        "name": name,
+        "category": category,
+        "details": details,
+        "process": os.getpid(),
+        "thread": threading.get_ident(),
+        "start": time.time(),
+    }
+
+    if not collectors:
+        yield record
+        return
+
+    cpu, children = _cpu()
+    start = time.perf_counter()
+
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = str(e) or type(e).__name__
+        raise
+    finally:
+        record["wall"] = time.perf_counter() - start
+
+        end, ended = _cpu()
+        record["cpu"] = end - cpu
+        record["children"] = ended - children
+
+        for collector in collectors:
+            collector.add(record)
+
+
+def envelope(spans, name, category, **details):
+    """Create a span enclosing spans recorded separately.
+
+    This is useful when the parts of a single operation are recorded at
+    different times or on different threads (e.g., the stages of a pipelined
+    build), so that it cannot be timed with ``span``.
+
+    Args:
+        spans (list): The enclosed spans, which must not overlap.
+        name (str): The name of the span.
+        category (str): The span category - see ``CATEGORY_*``.
+        **details: Additional JSON-serializable details to include.
+
+    Returns:
+        A span dictionary from the start of the first enclosed span to the end
+        of the last, with the total ``cpu`` and ``children`` time of the
+        enclosed spans.
+    """
+
+    first = min(spans, key=lambda s: s["start"])
+    end = max(s["start"] + s["wall"] for s in spans)
+
+    record = {
+        "name": name,
+        "category": category,
+        "details": details,
+        "process": first["process"],
+        "thread": first["thread"],
+        "start": first["start"],
+        "wall": end - first["start"],
+        "cpu": sum(s["cpu"] for s in spans),
+        "children": sum(s["children"] for s in spans),
+    }
+
+    errors = [s["error"] for s in spans if "error" in s]
+    if errors:
+        record["error"] = errors[-1]
+
+    return record
+
+
+def summarize(spans):
+    """Summarize the spans of a single build.
+
+    Args:
+        spans (list): Spans collected during a build.
+
+    Returns:
+        A JSON-serializable dictionary of total ``wall`` and ``cpu`` time,
+        ``stages`` (by name), ``transforms`` (in order applied), and
+        ``subprocesses`` (count and total times) with the ``wall`` and ``cpu``
+        times (including children) of each.
+    """
+
+    def times(span):
+        return {"wall": span["wall"], "cpu": span["cpu"] + span["children"]}
+
+    summary = {
+        "wall": None,
+        "cpu": None,
+        "stages": {},
+        "transforms": [],
+        "subprocesses": {"count": 0, "wall": 0.0, "cpu": 0.0},
+    }
+
+    for span in spans:
+        if span["category"] == CATEGORY_BUILD:
+            summary.update(times(span))
+        elif span["category"] == CATEGORY_STAGE:
+            summary["stages"][span["name"]] = times(span)
+        elif span["category"] == CATEGORY_TRANSFORM:
+            transform = times(span)
+            transform["name"] = span["name"]
+            transform.update(span["details"])
+
+            summary["transforms"].append(transform)
+        elif span["category"] == CATEGORY_SUBPROCESS:
+            summary["subprocesses"]["count"] += 1
+            summary["subprocesses"]["wall"] += span["wall"]
+            summary["subprocesses"]["cpu"] += span["children"]
+
+    return summary
+
+
+def accounting(spans):
+    """Extract subprocess resource accounting from spans.
+
+    Args:
+        spans (list): Collected spans.
+
+    Returns:
+        A list of JSON-serializable dictionaries, one per subprocess
+        invocation, including the ``cmd``, ``cwd``, ``start`` time, ``wall``
+        time, exit ``status`` and, where supported, ``user`` and ``sys`` CPU
+        time and ``maxrss`` (bytes).
+    """
+
+    entries = []
+
+    for span in spans:
+        if span["category"] != CATEGORY_SUBPROCESS:
+            continue
+
+        entry = {"start": span["start"], "wall": span["wall"]}
+        entry.update(span["details"])
+
+        entries.append(entry)
+
+    return entries
+
+
+def write(f, entries):
+    """Append entries to an open file as JSON lines.
+
+    Args:
+        f (file): A text file open for writing.
+        entries (list): JSON-serializable dictionaries to write.
+    """
+
+    for entry in entries:
+        f.write(json.dumps(entry, sort_keys=True))
+        f.write("\n")
+
+
+def export(path, entries):
+    """Write entries to a file as JSON lines.
+
+    Args:
+        path (str): The path to write.
+        entries (list): JSON-serializable dictionaries to write.
+    """
+
+    with open(path, "w") as f:
+        write(f, entries)
+
+
+def trace(spans):
+    """Convert spans to a Chrome trace.
+
+    Each span is converted to a complete event on the track of the process and
+    thread which recorded it, so parallel builds appear on their own worker's
+    track. The result may be viewed with ``chrome://tracing`` or Perfetto.
+
+    Args:
+        spans (list): Collected spans.
+
+    Returns:
+        A JSON-serializable Chrome trace event format dictionary.
+    """
+
+    events = []
+    threads = {}
+
+    for span in sorted(spans, key=lambda s: s["start"]):
+        process = span["process"]
+        key = (process, span["thread"])
+
+        if key not in threads:
+            threads[key] = len([k for k in threads if k[0] == process])
+
+            if threads[key] == 0:
+                events.append(
+                    {
+                        "name": "process_name",
+                        "ph": "M",
+                        "pid": process,
+                        "args": {"name": "helix ({})".format(process)},
+                    }
+                )
+
+        arguments = dict(span["details"])
+        for name in ("cpu", "children", "error"):
+            if name in span:
+                arguments[name] = span[name]
+
+        events.append(
+            {
+                "name": span["name"],
+                "cat": span["category"],
+                "ph": "X",
+                "ts": span["start"] * 1e6,
+                "dur": span["wall"] * 1e6,
+                "pid": process,
+                "tid": threads[(process, span["thread"])],
+                "args": arguments,
+            }
+        )
+
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
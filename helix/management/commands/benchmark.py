@@ -0,0 +1,260 @@
+import json
+
+from ... import benchmark
+
+from .. import utils as mutils
+
+SUPERLINEAR = 1.5
+"""Scaling exponents above which micro-benchmarks are highlighted."""
+
+
+class Command(mutils.CommandBase):
+    """Benchmark helix.
+
+    .. code-block:: none
+
+        usage: helix benchmark [-h] {builds,micro} ...
+
+        positional arguments:
+          {builds,micro}
+            builds    benchmark standard end-to-end build scenarios
+            micro     benchmark core primitives at increasing input sizes
+
+        optional arguments:
+          -h, --help  show this help message and exit
+
+    .. code-block:: none
+
+        usage: helix benchmark builds [-h] [-s [SCENARIOS [SCENARIOS ...]]] [-r REPEAT] [-n COMPONENT_COUNT] [-o file] [-b file]
+                                      [--threshold THRESHOLD]
+
+        optional arguments:
+          -h, --help            show this help message and exit
+          -s [SCENARIOS [SCENARIOS ...]], --scenarios [SCENARIOS [SCENARIOS ...]]
+                                scenario(s) to run (default: all)
+          -r REPEAT, --repeat REPEAT
+                                number of measured builds per scenario (default: 3)
+          -n COMPONENT_COUNT, --component-count COMPONENT_COUNT
+                                number of components in the many component scenario (default: 20)
+          -o file, --output file
+                                write results to a given file (for use as a baseline)
+          -b file, --baseline file
+                                compare results against a given baseline file
+          --threshold THRESHOLD
+                                allowed relative regression from the baseline (default: 0.1)
+
+    .. code-block:: none
+
+        usage: helix benchmark micro [-h] [-s [BENCHMARKS [BENCHMARKS ...]]] [--sizes SIZES [SIZES ...]] [-o file] [-b file]
+                                     [--threshold THRESHOLD]
+
+        optional arguments:
+          -h, --help            show this help message and exit
+          -s [BENCHMARKS [BENCHMARKS ...]], --benchmarks [BENCHMARKS [BENCHMARKS ...]]
+                                benchmark(s) to run (default: all)
+          --sizes SIZES [SIZES ...]
+                                input sizes (default: 10 100 1000)
+          -o file, --output file
+                                write results to a given file (for use as a baseline)
+          -b file, --baseline file
+                                compare results against a given baseline file
+          --threshold THRESHOLD
+                                allowed relative regression from the baseline (default: 0.1)
+    """
+
+    name = "benchmark"
+    help = "benchmark helix build performance"
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest="subcommand")
+        subparsers.required = True
+
+        def common(subparser):
+            subparser.add_argument(
+                "-o",
+                "--output",
+                metavar="file",
+                type=str,
+                help="write results to a given file (for use as a baseline)",
+            )
+            subparser.add_argument(
+                "-b",
+                "--baseline",
+                metavar="file",
+                type=str,
+                help="compare results against a given baseline file",
+            )
+            subparser.add_argument(
+                "--threshold",
+                type=float,
+                default=0.1,
+                help="allowed relative regression from the baseline (default: 0.1)",
+            )
+
+        builds_parser = subparsers.add_parser(
+            "builds", help="benchmark standard end-to-end build scenarios"
+        )
+        builds_parser.add_argument(
+            "-s",
+            "--scenarios",
+            help="scenario(s) to run (default: all)",
+            nargs="*",
+            default=[],
+        )
+        builds_parser.add_argument(
+            "-r",
+            "--repeat",
+            type=int,
+            default=3,
+            help="number of measured builds per scenario (default: 3)",
+        )
+        builds_parser.add_argument(
+            "-n",
+            "--component-count",
+            type=int,
+            default=20,
+            help="number of components in the many component scenario (default: 20)",
+        )
+        common(builds_parser)
+
+        micro_parser = subparsers.add_parser(
+            "micro", help="benchmark core primitives at increasing input sizes"
+        )
+        micro_parser.add_argument(
+            "-s",
+            "--benchmarks",
+            help="benchmark(s) to run (default: all)",
+            nargs="*",
+            default=[],
+        )
+        micro_parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[10, 100, 1000],
+            help="input sizes (default: 10 100 1000)",
+        )
+        common(micro_parser)
+
+    def builds(self, options):
+        scenarios = benchmark.scenarios(components=options["component_count"])
+
+        if options["scenarios"]:
+            unknown = set(options["scenarios"]) - set(scenarios)
+            if unknown:
+                mutils.print(
+                    "unknown scenario(s): {} (available: {})".format(
+                        ", ".join(sorted(unknown)), ", ".join(scenarios)
+                    ),
+                    color=mutils.Color.red,
+                )
+                exit(1)
+
+            scenarios = {n: scenarios[n] for n in options["scenarios"]}
+
+        def report(name, result):
+            if result["status"] == benchmark.STATUS_SUCCESS:
+                stages = " ".join(
+                    "{}={:.3f}s".format(stage, wall)
+                    for stage, wall in result["stages"].items()
+                )
+
+                print(
+                    "{} {:<32} {:8.2f} samples/s {:8.1f} MB peak RSS  {}".format(
+                        mutils.format("✓", color=mutils.Color.green),
+                        name,
+                        result["rate"],
+                        result["maxrss"] / 1024 / 1024,
+                        stages,
+                    )
+                )
+            else:
+                print(
+                    "{} {:<32} {}: {}".format(
+                        mutils.format(
+                            (
+                                "-"
+                                if result["status"] == benchmark.STATUS_SKIPPED
+                                else "✗"
+                            ),
+                            color=(
+                                mutils.Color.yellow
+                                if result["status"] == benchmark.STATUS_SKIPPED
+                                else mutils.Color.red
+                            ),
+                        ),
+                        name,
+                        result["status"],
+                        result["error"],
+                    )
+                )
+
+        return benchmark.run(scenarios, repeat=options["repeat"], callback=report)
+
+    def micro(self, options):
+        unknown = set(options["benchmarks"]) - set(benchmark.MICRO)
+        if unknown:
+            mutils.print(
+                "unknown benchmark(s): {} (available: {})".format(
+                    ", ".join(sorted(unknown)), ", ".join(benchmark.MICRO)
+                ),
+                color=mutils.Color.red,
+            )
+            exit(1)
+
+        def report(name, result):
+            times = " ".join(
+                "{}={:.2e}s".format(size, t)
+                for size, t in zip(result["sizes"], result["times"])
+            )
+
+            scaling = result["exponent"]
+            if scaling is None:
+                scaling = "-"
+            elif scaling > SUPERLINEAR:
+                scaling = mutils.format(
+                    "n^{:.2f}".format(scaling), color=mutils.Color.yellow
+                )
+            else:
+                scaling = "n^{:.2f}".format(scaling)
+
+            print("{:<24} {:>8}  {}".format(name, scaling, times))
+
+        return benchmark.micro(
+            sizes=options["sizes"], benchmarks=options["benchmarks"], callback=report
+        )
+
+    def handle(self, *args, **options):
+        if options["subcommand"] == "builds":
+            results = self.builds(options)
+            compare = benchmark.compare
+        elif options["subcommand"] == "micro":
+            results = self.micro(options)
+            compare = benchmark.compare_micro
+        else:
+            raise Exception("unknown command: {}".format(options["subcommand"]))
+
+        if options.get("output"):
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+
+        if options.get("baseline"):
+            with open(options["baseline"], "r") as f:
+                baseline = json.load(f)
+
+            regressions = compare(results, baseline, threshold=options["threshold"])
+
+            if regressions:
+                for name, metric, previous, current in regressions:
+                    mutils.print(
+                        "regression: {} {}: {} -> {}".format(
+                            name, metric, previous, current
+                        ),
+                        color=mutils.Color.red,
+                    )
+                exit(1)
+
+            mutils.print(
+                "no regressions from baseline {}".format(options["baseline"]),
+                color=mutils.Color.green,
+            )
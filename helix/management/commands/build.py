@@ -4,9 +4,20 @@ import json
 from ... import build
 from ... import utils
 from ... import exceptions
+from ... import instrumentation
 
 from .. import utils as mutils
 
+FAILURES = (
+    exceptions.ConfigurationError,
+    exceptions.EntrypointNotFound,
+    exceptions.BlueprintNotSane,
+    exceptions.NotInstalled,
+    exceptions.MissingDependency,
+    exceptions.BuildFailure,
+)
+"""Exceptions reported as build failures rather than errors."""
+
 
 class Command(mutils.CommandBase):
     """Build a blueprint with a set of components and transforms.
@@ -27,23 +38,49 @@ class Command(mutils.CommandBase):
     name = "build"
     help = "build a blueprint with a set of components and transforms"
 
+    def common(self, subparser):
+        """Add arguments shared by all build subcommands."""
+
+        subparser.add_argument(
+            "-l",
+            "--load",
+            metavar="file",
+            type=str,
+            help="load additional component(s) from a given file",
+        )
+        subparser.add_argument(
+            "--accounting",
+            metavar="file",
+            type=str,
+            help="write subprocess resource accounting to a given file",
+        )
+        subparser.add_argument(
+            "--trace",
+            metavar="file",
+            type=str,
+            help="write a Chrome trace of the build to a given file",
+        )
+        subparser.add_argument(
+            "--timeout",
+            metavar="SECONDS",
+            type=float,
+            help="time limit for the whole build in seconds (default: none)",
+        )
+        subparser.add_argument(
+            "--command-timeout",
+            metavar="SECONDS",
+            type=float,
+            help="time limit for each command in seconds (default: none)",
+        )
+
     def add_arguments(self, parser):
         subparsers = parser.add_subparsers(dest="subcommand")
         subparsers.required = True
 
-        def common(subparser):
-            subparser.add_argument(
-                "-l",
-                "--load",
-                metavar="file",
-                type=str,
-                help="load additional component(s) from a given file",
-            )
-
         blueprint_parser = subparsers.add_parser(
             "blueprint", help="manually specify blueprint, components, and transforms"
         )
-        common(blueprint_parser)
+        self.common(blueprint_parser)
         blueprint_parser.add_argument("blueprint", help="blueprint (by name)")
         blueprint_parser.add_argument(
             "-c", "--components", help="component(s) (by name)", nargs="*", default=[]
@@ -63,7 +100,7 @@ class Command(mutils.CommandBase):
         json_parser = subparsers.add_parser(
             "json", help="build from a json configuration file"
         )
-        common(json_parser)
+        self.common(json_parser)
         json_parser.add_argument("input", help="input json file")
         json_parser.add_argument("output", help="output file or directory")
         json_parser.add_argument(
@@ -74,7 +111,9 @@ class Command(mutils.CommandBase):
             default=False,
         )
 
-    def handle(self, *args, **options):
+    def configuration(self, options):
+        """Build a configuration dictionary from parsed arguments."""
+
         if options["subcommand"] == "blueprint":
             configuration = {
                 "name": os.path.basename(options["output"]),
@@ -107,22 +146,45 @@ class Command(mutils.CommandBase):
                         specification["class"] = c
                         specification.pop("name")
 
-        try:
-            artifacts, tags = build.build(
-                configuration,
-                options["output"],
-                options={"propagate": options["verbose"]},
+        return configuration
+
+    def build_options(self, options):
+        """Build options from parsed arguments."""
+
+        return {
+            "propagate": options["verbose"],
+            "timeout": options.get("timeout"),
+            "command_timeout": options.get("command_timeout"),
+        }
+
+    def export(self, spans, options):
+        """Write requested accounting and trace files."""
+
+        if options.get("accounting"):
+            instrumentation.export(
+                options["accounting"], instrumentation.accounting(spans)
             )
-        except (
-            exceptions.ConfigurationError,
-            exceptions.EntrypointNotFound,
-            exceptions.BlueprintNotSane,
-            exceptions.NotInstalled,
-            exceptions.MissingDependency,
-            exceptions.BuildFailure,
-        ) as e:
+        if options.get("trace"):
+            with open(options["trace"], "w") as f:
+                json.dump(instrumentation.trace(spans), f)
+
+    def handle(self, *args, **options):
+        configuration = self.configuration(options)
+
+        collector = instrumentation.Collector()
+
+        try:
+            with collector:
+                artifacts, tags = build.build(
+                    configuration,
+                    options["output"],
+                    options=self.build_options(options),
+                )
+        except FAILURES as e:
             mutils.print(e, color=mutils.Color.red)
             exit(1)
+        finally:
+            self.export(collector.spans, options)
 
         print("Tags: ")
         for tag in tags:
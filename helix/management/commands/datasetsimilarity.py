@@ -1,134 +1,23 @@
 import os
-import math
-import copy
-import uuid
 import json
 import random
-import traceback
-import multiprocessing
+import shutil
+import sqlite3
+import tempfile
+import threading
 
-from ... import build
+from ... import costs
 from ... import utils
+from ... import dataset
+from ... import storage
+from ... import manifest
+from ... import quarantine
+from ... import instrumentation
 from ... import exceptions
 
 from .. import utils as mutils
-
-
-class SamplingError(Exception):
-    """Raised when there is a problem generating a sample list."""
-
-
-def simple(collection, samples, components):
-    """A single component per sample for every component.
-
-    Note:
-        This simply ignores the requested number of samples and components and
-        returns a single sample with a single component for every component in
-        the collection.
-    """
-
-    return [[c] for c in collection]
-
-
-def rand(collection, samples, components):
-    """A completely random dataset - may contain exact duplicates."""
-
-    options = []
-
-    for _ in range(samples):
-        options.append(random.sample(collection, components))
-
-    return options
-
-
-def walk(collection, samples, components):
-    """A sample walk with random permutations for increased similarity.
-
-    Generates a dataset by randomly replacing a random number of components
-    from one build to the next to inject aditional similarity over a simple
-    random strategy.
-    """
-
-    CHANGE = 0.02
-
-    options = []
-
-    for _ in range(samples):
-        if options:
-            sample = copy.deepcopy(options[-1])
-
-            change = random.randint(0, math.ceil(components * CHANGE))
-            for _ in range(change):
-                changed = random.randint(0, components - 1)
-                sample[changed] = random.choice(collection)
-
-            options.append(sample)
-        else:
-            options.append(random.sample(collection, components))
-
-    return options
-
-
-def process(blueprint, components, transforms, loads, working):
-    identifier = uuid.uuid4()
-
-    configuration = {
-        "name": identifier.hex,
-        "blueprint": {"name": blueprint},
-    }
-
-    configuration["components"] = [utils.parse(c) for c in components]
-
-    if loads:
-        loaded = mutils.load(*loads)
-
-        for specification in configuration["components"]:
-            name = specification["name"]
-
-            for c in loaded:
-                if c().name == name:
-                    specification["class"] = c
-                    specification.pop("name")
-
-    configuration["transforms"] = [utils.parse(t) for t in transforms]
-
-    project = os.path.join(working, identifier.hex)
-
-    os.makedirs(project)
-
-    stdout = os.path.join(project, "stdout.txt")
-    stderr = os.path.join(project, "stderr.txt")
-
-    with open(stdout, "wb") as stdout, open(stderr, "wb") as stderr:
-        try:
-            _, tags = build.build(
-                configuration,
-                os.path.join(working, identifier.hex),
-                options={
-                    "stdout": stdout,
-                    "stderr": stderr,
-                },
-            )
-        except Exception as e:
-            print(
-                "{} {}: {}".format(
-                    mutils.format("✗", color=mutils.Color.red), identifier.hex, e
-                )
-            )
-
-            with open(os.path.join(project, "exception.txt"), "w") as f:
-                traceback.print_exc(file=f)
-
-            return {}
-
-    print(
-        "{} {}".format(
-            mutils.format("✓", color=mutils.Color.green),
-            identifier.hex,
-        )
-    )
-
-    return {identifier.hex: tags}
+from .. import progress
+from .. import metrics
 
 
 class Command(mutils.CommandBase):
@@ -137,7 +26,15 @@ class Command(mutils.CommandBase):
     .. code-block:: none
 
         usage: helix dataset-similarity [-h] [-c [COMPONENTS [COMPONENTS ...]]] [-l [file [file ...]]] [-t [TRANSFORMS [TRANSFORMS ...]]] [-s SAMPLE_COUNT]
-                                        [-m MAXIMUM_SAMPLES] [-n COMPONENT_COUNT] [-w WORKERS] [-v]
+                                        [-m MAXIMUM_SAMPLES] [-n COMPONENT_COUNT] [-w WORKERS] [--engine {process,thread,pipeline}]
+                                        [--stage-workers STAGE=N [STAGE=N ...]] [--schedule {cost,plan}] [--costs file]
+                                        [--estimate [N]] [--preflight {exclude,abort}] [--quarantine file] [--bisect]
+                                        [--retries N] [--retry-backoff SECONDS]
+                                        [--timeout SECONDS] [--command-timeout SECONDS] [--storage {directory,content,sharded,delta}]
+                                        [--shard-size MB] [--compression {none,deflate,zstd}] [--keyframe-interval N]
+                                        [--scratch SCRATCH] [--retention {none,failure,all}] [--progress {auto,tty,json,none}]
+                                        [--metrics-port PORT] [--accounting file]
+                                        [--trace file]
                                         {simple,random,walk} output
 
         positional arguments:
@@ -160,6 +57,40 @@ class Command(mutils.CommandBase):
                                 number of components per sample
           -w WORKERS, --workers WORKERS
                                 number of parallel workers to use (default: <count(CPUs)/2>)
+          --engine {process,thread,pipeline}
+                                build samples in worker processes, on threads of a single process, or in pipelined stages (default: process)
+          --stage-workers STAGE=N [STAGE=N ...]
+                                number of workers per stage (prepare, compile, transform) for the pipeline engine (default: <count(CPUs)> to compile, <count(CPUs)/2> otherwise)
+          --schedule {cost,plan}
+                                build samples with the longest expected build time first (requires --costs) or in plan order (default: plan)
+          --costs file          record and estimate build costs in a given file (e.g., ~/.helix/costs.sqlite - default: disabled)
+          --estimate [N]        project build time, disk usage, and failure rates by building N random samples (default: 10, 0 for past
+                                builds only) rather than building the dataset
+          --preflight {exclude,abort}
+                                build each component alone first and exclude failing components or abort (default: disabled)
+          --quarantine file     exclude components listed in a given file and add components which fail preflight or bisection to it
+          --bisect              find the minimal failing combination of components of each failed sample after building
+          --retries N           number of times to retry samples which fail transiently (default: 0)
+          --retry-backoff SECONDS
+                                delay before the first retry, doubled for each further retry (default: 1)
+          --timeout SECONDS     time limit for each sample build in seconds (default: none)
+          --command-timeout SECONDS
+                                time limit for each command in seconds (default: none)
+          --storage {directory,content,sharded,delta}
+                                artifact storage mode (default: directory)
+          --shard-size MB       maximum shard size for sharded storage (default: 1024)
+          --compression {none,deflate,zstd}
+                                per-artifact compression for sharded storage (default: none)
+          --keyframe-interval N
+                                maximum delta chain length for delta storage (default: 16)
+          --scratch SCRATCH     directory in which to build samples (default: output)
+          --retention {none,failure,all}
+                                build intermediates to keep in the output directory (default: all)
+          --progress {auto,tty,json,none}
+                                progress reporting mode (default: auto)
+          --metrics-port PORT   serve metrics on localhost at a given port (default: disabled)
+          --accounting file     write subprocess resource accounting to a given file
+          --trace file          write a Chrome trace of dataset generation to a given file
     """
 
     name = "dataset-similarity"
@@ -229,18 +160,463 @@ class Command(mutils.CommandBase):
             default=round(os.cpu_count() / 2),
             help="number of parallel workers to use (default: <count(CPUs)/2>)",
         )
+        parser.add_argument(
+            "--engine",
+            type=str,
+            choices=dataset.ENGINES + (dataset.ENGINE_PIPELINE,),
+            default=dataset.ENGINE_PROCESS,
+            help="build samples in worker processes, on threads of a single process, or in pipelined stages (default: process)",
+        )
+        parser.add_argument(
+            "--stage-workers",
+            metavar="STAGE=N",
+            nargs="+",
+            default=[],
+            help="number of workers per stage (prepare, compile, transform) for the pipeline engine (default: <count(CPUs)> to compile, <count(CPUs)/2> otherwise)",
+        )
+        parser.add_argument(
+            "--schedule",
+            type=str,
+            choices=["cost", "plan"],
+            default="plan",
+            help="build samples with the longest expected build time first (requires --costs) or in plan order (default: plan)",
+        )
+        parser.add_argument(
+            "--costs",
+            metavar="file",
+            type=str,
+            default=None,
+            help="record and estimate build costs in a given file (e.g., ~/.helix/costs.sqlite - default: disabled)",
+        )
+        parser.add_argument(
+            "--estimate",
+            metavar="N",
+            type=int,
+            nargs="?",
+            const=10,
+            default=None,
+            help="project build time, disk usage, and failure rates by building N random samples (default: 10, 0 for past builds only) rather than building the dataset",
+        )
+        parser.add_argument(
+            "--preflight",
+            type=str,
+            choices=["exclude", "abort"],
+            default=None,
+            help="build each component alone first and exclude failing components or abort (default: disabled)",
+        )
+        parser.add_argument(
+            "--quarantine",
+            metavar="file",
+            type=str,
+            default=None,
+            help="exclude components listed in a given file and add components which fail preflight or bisection to it",
+        )
+        parser.add_argument(
+            "--bisect",
+            action="store_true",
+            help="find the minimal failing combination of components of each failed sample after building",
+        )
+        parser.add_argument(
+            "--retries",
+            metavar="N",
+            type=int,
+            default=0,
+            help="number of times to retry samples which fail transiently (default: 0)",
+        )
+        parser.add_argument(
+            "--retry-backoff",
+            metavar="SECONDS",
+            type=float,
+            default=1.0,
+            help="delay before the first retry, doubled for each further retry (default: 1)",
+        )
+        parser.add_argument(
+            "--timeout",
+            metavar="SECONDS",
+            type=float,
+            default=None,
+            help="time limit for each sample build in seconds (default: none)",
+        )
+        parser.add_argument(
+            "--command-timeout",
+            metavar="SECONDS",
+            type=float,
+            default=None,
+            help="time limit for each command in seconds (default: none)",
+        )
+        parser.add_argument(
+            "--storage",
+            type=str,
+            choices=["directory", "content", "sharded", "delta"],
+            default="directory",
+            help="artifact storage mode (default: directory)",
+        )
+        parser.add_argument(
+            "--shard-size",
+            metavar="MB",
+            type=int,
+            default=1024,
+            help="maximum shard size for sharded storage (default: 1024)",
+        )
+        parser.add_argument(
+            "--compression",
+            type=str,
+            choices=[
+                storage.COMPRESSION_NONE,
+                storage.COMPRESSION_DEFLATE,
+                storage.COMPRESSION_ZSTD,
+            ],
+            default=storage.COMPRESSION_NONE,
+            help="per-artifact compression for sharded storage (default: none)",
+        )
+        parser.add_argument(
+            "--keyframe-interval",
+            metavar="N",
+            type=int,
+            default=16,
+            help="maximum delta chain length for delta storage (default: 16)",
+        )
+        parser.add_argument(
+            "--scratch",
+            type=str,
+            default=None,
+            help="directory in which to build samples (default: output)",
+        )
+        parser.add_argument(
+            "--retention",
+            type=str,
+            choices=[
+                storage.RETENTION_NONE,
+                storage.RETENTION_FAILURE,
+                storage.RETENTION_ALL,
+            ],
+            default=storage.RETENTION_ALL,
+            help="build intermediates to keep in the output directory (default: all)",
+        )
+        parser.add_argument(
+            "--progress",
+            type=str,
+            choices=[
+                progress.MODE_AUTO,
+                progress.MODE_TTY,
+                progress.MODE_JSON,
+                progress.MODE_NONE,
+            ],
+            default=progress.MODE_AUTO,
+            help="progress reporting mode (default: auto)",
+        )
+        parser.add_argument(
+            "--metrics-port",
+            metavar="PORT",
+            type=int,
+            default=None,
+            help="serve metrics on localhost at a given port (default: disabled)",
+        )
+        parser.add_argument(
+            "--accounting",
+            metavar="file",
+            type=str,
+            default=None,
+            help="write subprocess resource accounting to a given file",
+        )
+        parser.add_argument(
+            "--trace",
+            metavar="file",
+            type=str,
+            default=None,
+            help="write a Chrome trace of dataset generation to a given file",
+        )
+
+    def build(self, arguments, workers, stages, engine):
+        """Build samples with a given engine, yielding their records."""
+
+        if engine == dataset.ENGINE_PIPELINE:
+            return dataset.pipeline(arguments, workers=stages)
+
+        return dataset.execute(dataset.process, arguments, workers, engine=engine)
+
+    def estimate(self, arguments, model, workers, stages, scratch, options):
+        """Project the cost of building a dataset and report it."""
+
+        subset = random.sample(arguments, min(options["estimate"], len(arguments)))
+
+        footprints = []
+
+        if subset:
+            print(
+                "building {} of {} samples to estimate build costs".format(
+                    mutils.format(len(subset), style=mutils.Style.bold),
+                    mutils.format(len(arguments), style=mutils.Style.bold),
+                )
+            )
+
+            working = tempfile.mkdtemp(dir=scratch)
+            subset = [a[:4] + (working,) + a[5:] for a in subset]
+
+            try:
+                for record in self.build(subset, workers, stages, options["engine"]):
+                    model.add(record)
+                    footprints.append((record, costs.footprint(record)))
+
+                    print(
+                        "{} {}{}".format(
+                            (
+                                mutils.format("✗", color=mutils.Color.red)
+                                if record["error"]
+                                else mutils.format("✓", color=mutils.Color.green)
+                            ),
+                            record["identifier"],
+                            ": {}".format(record["error"]) if record["error"] else "",
+                        )
+                    )
+            finally:
+                shutil.rmtree(working, ignore_errors=True)
+
+        # With the pipeline engine, builds are limited by compile workers.
+        parallelism = stages[dataset.STAGE_COMPILE] if stages else workers
+
+        projection = costs.project(
+            model,
+            [(a[1], a[2]) for a in arguments],
+            parallelism,
+            footprints=footprints,
+            retention=options["retention"],
+        )
+
+        model.close()
+
+        def size(value):
+            return "unknown" if value is None else progress.size(value)
+
+        print(
+            "projected costs of {} samples with {} workers:".format(
+                mutils.format(len(arguments), style=mutils.Style.bold),
+                mutils.format(workers, style=mutils.Style.bold),
+            )
+        )
+        print(
+            "  build time     {} (total {})".format(
+                progress.duration(projection["wall"]),
+                progress.duration(projection["cpu"]),
+            )
+        )
+        print("  artifacts      {}".format(size(projection["artifacts"])))
+        print(
+            "  intermediates  {} (retention: {})".format(
+                size(projection["intermediates"]), options["retention"]
+            )
+        )
+        print("  scratch        {}".format(size(projection["scratch"])))
+        print(
+            "  failures       {:.0f} ({:.1%})".format(
+                projection["failures"],
+                projection["failures"] / len(arguments) if arguments else 0,
+            )
+        )
+
+        unknown = [n for n, (r, _, _) in projection["components"].items() if r is None]
+        failing = sorted(
+            (
+                (n, c)
+                for n, c in projection["components"].items()
+                if c[0] is not None and c[2]
+            ),
+            key=lambda c: c[1][0],
+            reverse=True,
+        )
+
+        if failing:
+            print("component failure rates:")
+
+            for name, (rate, attempts, failures) in failing:
+                print(
+                    "  {} {} {:.1%} ({}/{})".format(
+                        mutils.format("✗", color=mutils.Color.red),
+                        name,
+                        rate,
+                        failures,
+                        attempts,
+                    )
+                )
+
+        if unknown:
+            mutils.print(
+                "{} of {} components have no build history".format(
+                    len(unknown), len(projection["components"])
+                ),
+                color=mutils.Color.yellow,
+            )
+
+        return projection
+
+    def preflight(
+        self, blueprint, components, workers, scratch, limits, quarantined, options
+    ):
+        """Build each component alone and exclude those which fail."""
+
+        print(
+            "checking {} components".format(
+                mutils.format(len(set(components)), style=mutils.Style.bold)
+            )
+        )
+
+        def report(record):
+            if record["error"]:
+                print(
+                    "{} {}: {}".format(
+                        mutils.format("✗", color=mutils.Color.red),
+                        dataset.specification(record["components"][0]),
+                        record["error"],
+                    )
+                )
+
+        # Preflight builds are independent, so pipelining does not apply.
+        engine = options["engine"]
+        if engine not in dataset.ENGINES:
+            engine = dataset.ENGINE_THREAD
+
+        working = tempfile.mkdtemp(dir=scratch)
+
+        try:
+            failures = dataset.preflight(
+                blueprint,
+                components,
+                loads=options.get("load"),
+                workers=workers,
+                working=working,
+                options=limits,
+                engine=engine,
+                callback=report,
+            )
+        finally:
+            shutil.rmtree(working, ignore_errors=True)
+
+        if quarantined is not None and failures:
+            for component, error in failures.items():
+                quarantined.add(component, error)
+
+            quarantined.save()
+
+        if failures and options["preflight"] == "abort":
+            mutils.print(
+                "{} component(s) failed to build".format(len(failures)),
+                color=mutils.Color.red,
+            )
+            exit(1)
+
+        if failures:
+            mutils.print(
+                "excluding {} component(s) which failed to build".format(len(failures)),
+                color=mutils.Color.yellow,
+            )
+
+        return [c for c in components if dataset.specification(c) not in failures]
+
+    def bisect(
+        self,
+        blueprint,
+        transforms,
+        failed,
+        workers,
+        scratch,
+        limits,
+        quarantined,
+        output,
+        options,
+    ):
+        """Find minimal failing combinations of components and report them."""
+
+        distinct = {}
+        for record in failed:
+            key = tuple(sorted(dataset.specification(c) for c in record["components"]))
+            distinct.setdefault(key, []).append(record)
+
+        print(
+            "bisecting {} distinct failures".format(
+                mutils.format(len(distinct), style=mutils.Style.bold)
+            )
+        )
+
+        # Known failures seed the cache, which is shared between threads.
+        cache = {key: records[0]["error"] for key, records in distinct.items()}
+
+        def bisect(key, *arguments):
+            return key, dataset.bisect(*arguments)
+
+        working = tempfile.mkdtemp(dir=scratch)
+
+        arguments = [
+            (
+                key,
+                blueprint,
+                records[0]["components"],
+                transforms,
+                options.get("load"),
+                working,
+                limits,
+                cache,
+            )
+            for key, records in distinct.items()
+        ]
+
+        combinations = {}
+
+        try:
+            for key, (minimal, error) in dataset.execute(
+                bisect, arguments, workers, engine=dataset.ENGINE_THREAD
+            ):
+                if minimal is None:
+                    continue
+
+                combination = tuple(sorted(dataset.specification(c) for c in minimal))
+                entry = combinations.setdefault(
+                    combination,
+                    {"components": list(combination), "error": error, "samples": []},
+                )
+                entry["samples"] += [r["identifier"] for r in distinct[key]]
+        finally:
+            shutil.rmtree(working, ignore_errors=True)
+
+        report = sorted(
+            combinations.values(), key=lambda c: len(c["samples"]), reverse=True
+        )
+
+        with open(os.path.join(output, "bisection.json"), "w") as f:
+            json.dump(report, f, indent=2)
+
+        for entry in report:
+            print(
+                "{} {} ({} samples): {}".format(
+                    mutils.format("✗", color=mutils.Color.red),
+                    " + ".join(entry["components"]),
+                    len(entry["samples"]),
+                    entry["error"],
+                )
+            )
+
+        if quarantined is not None and report:
+            for entry in report:
+                quarantined.combine(entry["components"], entry["error"])
+
+            quarantined.save()
+
+        return report
 
     def handle(self, *args, **options):
         output = os.path.abspath(os.path.expanduser(options["output"]))
+        scratch = os.path.abspath(
+            os.path.expanduser(options.get("scratch", options["output"]))
+        )
 
-        if os.path.isdir(output):
-            pass
-        else:
-            try:
-                os.makedirs(output)
-            except Exception as e:
-                mutils.print(e, color=mutils.Color.red)
-                exit(1)
+        for directory in (output, scratch):
+            if os.path.isdir(directory):
+                pass
+            else:
+                try:
+                    os.makedirs(directory)
+                except Exception as e:
+                    mutils.print(e, color=mutils.Color.red)
+                    exit(1)
 
         components = options.get("components")
 
@@ -284,11 +660,11 @@ class Command(mutils.CommandBase):
             exit(1)
 
         if options["strategy"] == "simple":
-            strategy = simple
+            strategy = dataset.simple
         elif options["strategy"] == "random":
-            strategy = rand
+            strategy = dataset.rand
         elif options["strategy"] == "walk":
-            strategy = walk
+            strategy = dataset.walk
         else:
             mutils.print(
                 "unknown generation strategy: {}".format(options["strategy"]),
@@ -296,22 +672,93 @@ class Command(mutils.CommandBase):
             )
             exit(1)
 
+        workers = options["workers"]
+        stages = None
+
+        if options["engine"] == dataset.ENGINE_PIPELINE:
+            try:
+                stages = {}
+                for specification in options["stage_workers"]:
+                    stage, _, count = specification.partition("=")
+                    stages[stage] = int(count)
+
+                stages = dataset.stage_workers(stages)
+            except ValueError as e:
+                mutils.print(
+                    "invalid stage workers: {} (expected STAGE=N with STAGE one of {})".format(
+                        e, ", ".join(dataset.STAGES)
+                    ),
+                    color=mutils.Color.red,
+                )
+                exit(1)
+
+            workers = sum(stages.values())
+
+        limits = {
+            "timeout": options.get("timeout"),
+            "command_timeout": options.get("command_timeout"),
+        }
+
+        if options.get("quarantine"):
+            try:
+                quarantined = quarantine.Quarantine(options["quarantine"])
+            except (OSError, ValueError) as e:
+                mutils.print(e, color=mutils.Color.red)
+                exit(1)
+
+            excluded = [c for c in components if quarantined.excludes(c)]
+            if excluded:
+                mutils.print(
+                    "excluding {} quarantined component(s): {}".format(
+                        len(excluded), ", ".join(excluded)
+                    ),
+                    color=mutils.Color.yellow,
+                )
+
+            components = quarantined.filter(components)
+        else:
+            quarantined = None
+
+        if options.get("preflight"):
+            components = self.preflight(
+                blueprint, components, workers, scratch, limits, quarantined, options
+            )
+
+        count = options.get("component_count")
+        exclusions = options.get("quarantine") or options.get("preflight")
+
+        if exclusions and strategy is not dataset.simple and len(components) < count:
+            mutils.print(
+                "only {} component(s) remain after exclusions, fewer than the {} "
+                "required per sample (see --component-count)".format(
+                    len(components), count
+                ),
+                color=mutils.Color.red,
+            )
+            exit(1)
+
         try:
             samples = strategy(
                 components,
                 samples=options.get("sample_count"),
-                components=options.get("component_count"),
+                components=count,
             )
-        except SamplingError as e:
+        except dataset.SamplingError as e:
             mutils.print(e, color=mutils.Color.red)
             exit(1)
 
-        print(
-            "building {} samples with {} workers".format(
-                mutils.format(len(samples), style=mutils.Style.bold),
-                mutils.format(options["workers"], style=mutils.Style.bold),
-            )
-        )
+        if quarantined is not None and quarantined.combinations:
+            allowed = [s for s in samples if quarantined.allows(s)]
+
+            if len(allowed) < len(samples):
+                mutils.print(
+                    "excluding {} sample(s) with quarantined combinations".format(
+                        len(samples) - len(allowed)
+                    ),
+                    color=mutils.Color.yellow,
+                )
+
+            samples = allowed
 
         arguments = [
             (
@@ -319,27 +766,236 @@ class Command(mutils.CommandBase):
                 sample,
                 transforms,
                 options.get("load"),
-                output,
+                scratch,
+                index,
+                limits,
             )
-            for sample in samples
+            for index, sample in enumerate(samples)
         ]
 
-        if options["workers"] == 1:
-            results = [process(*a) for a in arguments]
-        else:
-            with multiprocessing.Pool(options["workers"]) as pool:
-                results = pool.starmap(process, arguments)
+        if options["schedule"] == "cost" and not options.get("costs"):
+            mutils.print(
+                "cost scheduling requires a cost model (see --costs)",
+                color=mutils.Color.red,
+            )
+            exit(1)
+
+        model = None
+        if options.get("costs"):
+            try:
+                model = costs.CostModel(os.path.expanduser(options["costs"]))
+            except (OSError, sqlite3.Error) as e:
+                mutils.print(e, color=mutils.Color.red)
+                exit(1)
+
+        if options["schedule"] == "cost":
+            if options["storage"] == "delta" or options["strategy"] == "walk":
+                mutils.print(
+                    "cost scheduling builds samples out of plan order, so fewer "
+                    "consecutive samples share Components",
+                    color=mutils.Color.yellow,
+                )
+
+            arguments = model.order(arguments, key=lambda a: (a[1], a[2]))
+
+        if options.get("estimate") is not None:
+            if model is None:
+                # Estimate from the subset builds alone.
+                model = costs.CostModel(":memory:")
+
+            return self.estimate(arguments, model, workers, stages, scratch, options)
+
+        print(
+            "building {} samples with {} workers".format(
+                mutils.format(len(samples), style=mutils.Style.bold),
+                mutils.format(workers, style=mutils.Style.bold),
+            )
+        )
+
+        try:
+            if options["storage"] == "content":
+                store = storage.ContentAddressedStore(output, options["retention"])
+            elif options["storage"] == "sharded":
+                store = storage.ShardedStore(
+                    output,
+                    options["retention"],
+                    size=options["shard_size"] * 1024 * 1024,
+                    compression=options["compression"],
+                )
+            elif options["storage"] == "delta":
+                store = storage.DeltaStore(
+                    output, options["retention"], keyframe=options["keyframe_interval"]
+                )
+            else:
+                store = storage.DirectoryStore(output, options["retention"])
+        except exceptions.MissingDependency as e:
+            mutils.print(e, color=mutils.Color.red)
+            exit(1)
+
+        index = manifest.Manifest(os.path.join(output, manifest.Manifest.FILENAME))
+
+        accounting = None
+        if options.get("accounting"):
+            try:
+                accounting = open(options["accounting"], "w")
+            except OSError as e:
+                mutils.print(e, color=mutils.Color.red)
+                exit(1)
 
-        results = [r for r in results if r]
-        if "maximum_samples" in options:
-            results = results[: options["maximum_samples"]]
+        maximum = options.get("maximum_samples")
 
         labels = {}
-        for result in results:
-            labels.update(result)
+        artifacts = {}
+        spans = []
+        failed = []
+
+        parent = instrumentation.Collector()
+        stage = instrumentation.CATEGORY_STAGE
+
+        reporter = progress.Progress(len(samples), workers, mode=options["progress"])
+
+        monitor = metrics.Metrics(workers)
 
-        with open(os.path.join(output, "labels.json"), "w") as f:
-            json.dump(labels, f)
+        if options.get("metrics_port") is not None:
+            try:
+                host, port = monitor.serve(options["metrics_port"])
+            except OSError as e:
+                mutils.print(e, color=mutils.Color.red)
+                exit(1)
+
+            print("serving metrics at http://{}:{}/metrics".format(host, port))
+
+        # Once enough samples have been built, no more samples are started -
+        # those still in progress are drained and discarded.
+        done = threading.Event()
+
+        def limit(arguments):
+            for argument in arguments:
+                if done.is_set():
+                    return
+
+                yield argument
+
+        def build(arguments):
+            return self.build(limit(arguments), workers, stages, options["engine"])
+
+        if options["retries"] > 0:
+            records = dataset.retry(
+                build,
+                arguments,
+                dataset.RetryPolicy(
+                    attempts=options["retries"] + 1, backoff=options["retry_backoff"]
+                ),
+            )
+        else:
+            records = build(arguments)
+
+        for record in records:
+            if model is not None:
+                model.add(record)
+
+            if done.is_set():
+                with parent, instrumentation.span(
+                    "store", stage, identifier=record["identifier"]
+                ):
+                    store.discard(record)
+
+                continue
+
+            if accounting is not None:
+                entries = instrumentation.accounting(record["spans"])
+                for entry in entries:
+                    entry["sample"] = record["identifier"]
+
+                instrumentation.write(accounting, entries)
+                accounting.flush()
+
+            if options.get("trace"):
+                spans += record["spans"]
+
+            if record["error"]:
+                if not record["timeout"]:
+                    failed.append(record)
+
+                reporter.log(
+                    "{} {}: {}".format(
+                        mutils.format(
+                            "✗",
+                            color=(
+                                mutils.Color.yellow
+                                if record["timeout"]
+                                else mutils.Color.red
+                            ),
+                        ),
+                        record["identifier"],
+                        record["error"],
+                    )
+                )
+                reporter.update(record)
+
+                with parent, instrumentation.span(
+                    "store", stage, identifier=record["identifier"]
+                ):
+                    store.fail(record)
+                    index.add(record)
+
+                monitor.update(record)
+
+                continue
+
+            reporter.log(
+                "{} {}".format(
+                    mutils.format("✓", color=mutils.Color.green),
+                    record["identifier"],
+                )
+            )
+            reporter.update(record)
+
+            with parent, instrumentation.span(
+                "store", stage, identifier=record["identifier"]
+            ):
+                labels[record["identifier"]] = record["tags"]
+                artifacts[record["identifier"]] = store.add(record)
+                index.add(record, artifacts[record["identifier"]])
+
+            monitor.update(record, artifacts[record["identifier"]])
+
+            if maximum is not None and len(labels) >= maximum:
+                done.set()
+
+        records.close()
+        reporter.close()
+
+        try:
+            with parent, instrumentation.span("label", stage):
+                store.close()
+                index.close()
+
+                with open(os.path.join(output, "labels.json"), "w") as f:
+                    json.dump(labels, f)
+
+                with open(os.path.join(output, "artifacts.json"), "w") as f:
+                    json.dump(artifacts, f)
+        finally:
+            # Labels are written first - failing to record build costs should
+            # not lose the dataset.
+            if model is not None:
+                try:
+                    model.close()
+                except (OSError, sqlite3.Error) as e:
+                    mutils.print(
+                        "failed to record build costs: {}".format(e),
+                        color=mutils.Color.yellow,
+                    )
+
+        if accounting is not None:
+            accounting.close()
+
+        if options.get("trace"):
+            with open(options["trace"], "w") as f:
+                json.dump(instrumentation.trace(spans + parent.spans), f)
+
+        monitor.close()
 
         print(
             "built {} samples in {}".format(
@@ -347,3 +1003,16 @@ class Command(mutils.CommandBase):
                 mutils.format(output, style=mutils.Style.bold),
             )
         )
+
+        if options.get("bisect") and failed:
+            self.bisect(
+                blueprint,
+                transforms,
+                failed,
+                workers,
+                scratch,
+                limits,
+                quarantined,
+                output,
+                options,
+            )
@@ -0,0 +1,203 @@
+import os
+import pstats
+import cProfile
+
+from ... import build
+from ... import utils
+from ... import component
+from ... import instrumentation
+
+from .. import utils as mutils
+
+from . import build as command
+
+
+def key(function):
+    """The profiler key of a given Python function."""
+
+    code = getattr(function, "__func__", function).__code__
+
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+HOTSPOTS = [
+    ("entrypoint loading", utils.load),
+    ("dependency checks", utils.Dependable.installed),
+    ("component finalize", component.Component.finalize),
+    ("substitution", utils.substitute),
+    ("template I/O", utils.source),
+    ("subprocesses", utils.run),
+]
+"""Labeled Python functions whose cumulative time is reported."""
+
+BLOCKING = ("posix.wait", "posix.read", "acquire", "select", "poll")
+"""Builtins which block on subprocesses - excluded from Python hot spots."""
+
+
+class Command(command.Command):
+    """Profile a single build.
+
+    Accepts the same arguments as ``build``.
+
+    .. code-block:: none
+
+        usage: helix profile [-h] {blueprint,json} ...
+
+        positional arguments:
+          {blueprint,json}
+            blueprint       manually specify blueprint, components, and transforms
+            json            build from a json configuration file
+
+        optional arguments:
+          -h, --help        show this help message and exit
+
+        additional optional arguments (both subcommands):
+          --pstats file     save profiler statistics to a given file
+          --limit N         number of Python functions to report (default: 20)
+    """
+
+    name = "profile"
+    help = "profile a build with a set of components and transforms"
+
+    def common(self, subparser):
+        super().common(subparser)
+
+        subparser.add_argument(
+            "--pstats",
+            metavar="file",
+            type=str,
+            help="save profiler statistics to a given file",
+        )
+        subparser.add_argument(
+            "--limit",
+            metavar="N",
+            type=int,
+            default=20,
+            help="number of Python functions to report (default: 20)",
+        )
+
+    def location(self, filename):
+        """Shorten a source filename for display."""
+
+        root = os.path.dirname(os.path.dirname(utils.__file__))
+
+        if filename.startswith(root + os.sep):
+            return os.path.relpath(filename, root)
+
+        return os.path.basename(filename)
+
+    def report(self, stats, spans, limit):
+        """Print a ranked breakdown of build time."""
+
+        def seconds(value):
+            return "{:8.3f}s".format(value)
+
+        timings = instrumentation.summarize(spans)
+        total = timings["wall"] or stats.total_tt
+        external = timings["subprocesses"]
+
+        def percent(value):
+            return "{:6.1%}".format(value / total if total else 0)
+
+        mutils.print("Build", style=mutils.Style.bold)
+        print("  total    {}".format(seconds(total)))
+        print(
+            "  external {} {} ({} subprocesses)".format(
+                seconds(external["wall"]), percent(external["wall"]), external["count"]
+            )
+        )
+        print(
+            "  python   {} {}".format(
+                seconds(total - external["wall"]), percent(total - external["wall"])
+            )
+        )
+
+        mutils.print("Stages", style=mutils.Style.bold)
+        for name, stage in timings["stages"].items():
+            print(
+                "  {:<24} {} {}".format(
+                    name, seconds(stage["wall"]), percent(stage["wall"])
+                )
+            )
+
+        mutils.print("External Tools", style=mutils.Style.bold)
+        tools = {}
+        for span in spans:
+            if span["category"] != instrumentation.CATEGORY_SUBPROCESS:
+                continue
+
+            tool = tools.setdefault(span["name"], {"count": 0, "wall": 0.0, "cpu": 0.0})
+            tool["count"] += 1
+            tool["wall"] += span["wall"]
+            tool["cpu"] += span["children"]
+
+        for name, tool in sorted(tools.items(), key=lambda t: -t[1]["wall"]):
+            print(
+                "  {:<24} {} {} {:>5} calls {} cpu".format(
+                    name,
+                    seconds(tool["wall"]),
+                    percent(tool["wall"]),
+                    tool["count"],
+                    seconds(tool["cpu"]),
+                )
+            )
+
+        mutils.print("Hot Spots (cumulative, may overlap)", style=mutils.Style.bold)
+        hotspots = []
+        for label, function in HOTSPOTS:
+            _, calls, _, cumulative, _ = stats.stats.get(key(function), (0, 0, 0, 0, 0))
+            hotspots.append((cumulative, calls, label))
+
+        for cumulative, calls, label in sorted(hotspots, reverse=True):
+            print(
+                "  {:<24} {} {} {:>5} calls".format(
+                    label, seconds(cumulative), percent(cumulative), calls
+                )
+            )
+
+        mutils.print("Python Functions (by internal time)", style=mutils.Style.bold)
+        functions = [
+            (value[2], value[1], function)
+            for function, value in stats.stats.items()
+            if not any(b in function[2] for b in BLOCKING)
+        ]
+
+        for internal, calls, (filename, line, name) in sorted(functions, reverse=True)[
+            :limit
+        ]:
+            location = "{}:{}({})".format(self.location(filename), line, name)
+            print("  {} {:>7} calls  {}".format(seconds(internal), calls, location))
+
+    def handle(self, *args, **options):
+        configuration = self.configuration(options)
+
+        profiler = cProfile.Profile()
+        collector = instrumentation.Collector()
+        failure = None
+
+        try:
+            with collector:
+                profiler.enable()
+                try:
+                    build.build(
+                        configuration,
+                        options["output"],
+                        options=self.build_options(options),
+                    )
+                finally:
+                    profiler.disable()
+        except command.FAILURES as e:
+            failure = e
+        finally:
+            self.export(collector.spans, options)
+
+        stats = pstats.Stats(profiler)
+
+        if options.get("pstats"):
+            stats.dump_stats(options["pstats"])
+
+        self.report(stats, collector.spans, options["limit"])
+
+        if failure is not None:
+            mutils.print(failure, color=mutils.Color.red)
+            exit(1)
@@ -0,0 +1,222 @@
+"""Metrics for long-running commands.
+
+Metrics are rendered in the Prometheus text exposition format and may be
+served over HTTP on localhost for scraping.
+"""
+
+import time
+import bisect
+import threading
+import http.server
+
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, float("inf"))
+"""Latency histogram bucket upper bounds (seconds)."""
+
+
+def _value(value):
+    if value == float("inf"):
+        return "+Inf"
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram(object):
+    """A cumulative latency histogram."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        """Render this histogram as exposition format lines."""
+
+        def label(**extra):
+            pairs = sorted(dict(labels, **extra).items())
+
+            if not pairs:
+                return ""
+
+            return "{{{}}}".format(",".join('{}="{}"'.format(k, v) for k, v in pairs))
+
+        lines = []
+
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(
+                "{}_bucket{} {}".format(name, label(le=_value(bound)), cumulative)
+            )
+
+        lines.append("{}_sum{} {}".format(name, label(), _value(self.sum)))
+        lines.append("{}_count{} {}".format(name, label(), self.count))
+
+        return lines
+
+
+class Metrics(object):
+    """Dataset generation metrics.
+
+    Args:
+        workers (int): The number of parallel workers.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.start = time.monotonic()
+        self.lock = threading.Lock()
+
+        self.built = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.written = 0
+        self.busy = 0.0
+        self.cpu = 0.0
+
+        self.samples = Histogram()
+        self.stages = {}
+
+        self.server = None
+
+    def update(self, record, artifacts=None):
+        """Record a finished sample.
+
+        Args:
+            record (dict): A sample record, as returned by ``dataset.process``.
+            artifacts (list): Artifact descriptions, as returned by
+                ``storage.Store.add``, for successful samples.
+        """
+
+        with self.lock:
+            if record["error"]:
+                self.failed += 1
+                if record.get("timeout"):
+                    self.timeouts += 1
+            else:
+                self.built += 1
+
+            if record.get("duration") is not None:
+                self.busy += record["duration"]
+                self.samples.observe(record["duration"])
+
+            timings = record.get("timings")
+            if timings:
+                for name, stage in timings["stages"].items():
+                    self.stages.setdefault(name, Histogram()).observe(stage["wall"])
+
+                self.cpu += timings["subprocesses"]["cpu"]
+
+            for artifact in artifacts or []:
+                self.written += artifact["size"]
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            The rendered metrics as a string.
+        """
+
+        with self.lock:
+            elapsed = time.monotonic() - self.start
+            utilization = self.busy / (elapsed * self.workers) if elapsed else 0.0
+
+            lines = [
+                "# HELP helix_samples_built_total Samples built successfully.",
+                "# TYPE helix_samples_built_total counter",
+                "helix_samples_built_total {}".format(self.built),
+                "# HELP helix_samples_failed_total Samples which failed to build.",
+                "# TYPE helix_samples_failed_total counter",
+                "helix_samples_failed_total {}".format(self.failed),
+                "# HELP helix_samples_timed_out_total Failed samples which ran out "
+                "of time.",
+                "# TYPE helix_samples_timed_out_total counter",
+                "helix_samples_timed_out_total {}".format(self.timeouts),
+                "# HELP helix_sample_duration_seconds Per-sample build time.",
+                "# TYPE helix_sample_duration_seconds histogram",
+            ]
+            lines += self.samples.render("helix_sample_duration_seconds", {})
+
+            lines += [
+                "# HELP helix_stage_duration_seconds Per-stage build time.",
+                "# TYPE helix_stage_duration_seconds histogram",
+            ]
+            for name in sorted(self.stages):
+                lines += self.stages[name].render(
+                    "helix_stage_duration_seconds", {"stage": name}
+                )
+
+            lines += [
+                "# HELP helix_subprocess_cpu_seconds_total Subprocess CPU time.",
+                "# TYPE helix_subprocess_cpu_seconds_total counter",
+                "helix_subprocess_cpu_seconds_total {}".format(_value(self.cpu)),
+                "# HELP helix_written_bytes_total Artifact bytes written.",
+                "# TYPE helix_written_bytes_total counter",
+                "helix_written_bytes_total {}".format(self.written),
+                "# HELP helix_workers Parallel workers.",
+                "# TYPE helix_workers gauge",
+                "helix_workers {}".format(self.workers),
+                "# HELP helix_worker_busy_seconds_total Time workers spent building.",
+                "# TYPE helix_worker_busy_seconds_total counter",
+                "helix_worker_busy_seconds_total {}".format(_value(self.busy)),
+                "# HELP helix_worker_utilization Fraction of worker time spent "
+                "building since start.",
+                "# TYPE helix_worker_utilization gauge",
+                "helix_worker_utilization {}".format(_value(utilization)),
+            ]
+
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve metrics over HTTP in a background thread.
+
+        Metrics are served at ``/metrics``.
+
+        Args:
+            port (int): The port on which to listen - ``0`` selects a free
+                port.
+            host (str): The address on which to listen.
+
+        Returns:
+            The address ``(host, port)`` on which metrics are served.
+        """
+
+        metrics = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+
+                body = metrics.render().encode("utf-8")
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+
+        return self.server.server_address[:2]
+
+    def close(self):
+        """Stop serving metrics."""
+
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,226 @@
+"""Progress reporting for long-running commands."""
+
+import sys
+import json
+import time
+import collections
+
+from . import utils as mutils
+
+MODE_AUTO = "auto"
+"""Report in place on a TTY, otherwise with JSON lines."""
+
+MODE_TTY = "tty"
+"""Report on a single line, updated in place."""
+
+MODE_JSON = "json"
+"""Report with periodic JSON status lines."""
+
+MODE_NONE = "none"
+"""Do not report progress."""
+
+
+def percentile(values, p):
+    """The nearest-rank percentile of a list of values.
+
+    Args:
+        values (list): Values to summarize.
+        p (float): The percentile, between ``0`` and ``100``.
+
+    Returns:
+        The ``p``-th percentile of ``values`` or ``None`` if ``values`` is
+        empty.
+    """
+
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered)) - 1))
+
+    return ordered[rank]
+
+
+def duration(seconds):
+    """Format a number of seconds as ``H:MM:SS``."""
+
+    if seconds is None:
+        return "-:--:--"
+
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+
+    return "{}:{:02}:{:02}".format(hours, minutes, seconds)
+
+
+def size(value):
+    """Format a number of bytes with a binary unit prefix."""
+
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if abs(value) < 1024 or unit == "TiB":
+            break
+
+        value /= 1024
+
+    return "{:.1f} {}".format(value, unit) if unit != "B" else "{} B".format(value)
+
+
+class Progress(object):
+    """Track and report the progress of a dataset build.
+
+    Args:
+        total (int): The total number of samples to build.
+        workers (int): The number of parallel workers.
+        mode (str): The reporting mode - see ``MODE_*``.
+        stream (file): The stream to which progress is reported.
+        interval (float): The minimum number of seconds between reports (JSON
+            status lines are written at most this often, in-place updates
+            ten times as often).
+        window (int): The number of recent samples over which the rate and
+            build time percentiles are computed.
+    """
+
+    def __init__(
+        self, total, workers, mode=MODE_AUTO, stream=None, interval=10, window=256
+    ):
+        self.total = total
+        self.workers = workers
+        self.stream = stream or sys.stderr
+
+        if mode == MODE_AUTO:
+            mode = MODE_TTY if self.stream.isatty() else MODE_JSON
+        self.mode = mode
+
+        self.interval = interval / 10 if mode == MODE_TTY else interval
+
+        self.completed = 0
+        self.failed = 0
+
+        self.start = time.monotonic()
+        self.reported = None
+        self.line = None
+        self.finished = collections.deque(maxlen=window)
+        self.durations = collections.deque(maxlen=window)
+
+    @property
+    def done(self):
+        return self.completed + self.failed
+
+    @property
+    def inflight(self):
+        return min(self.workers, self.total - self.done)
+
+    @property
+    def rate(self):
+        """Samples per second, averaged over the recent window."""
+
+        if len(self.finished) < self.finished.maxlen:
+            reference, count = self.start, len(self.finished)
+        else:
+            reference, count = self.finished[0], len(self.finished) - 1
+
+        elapsed = time.monotonic() - reference
+
+        return count / elapsed if count and elapsed else None
+
+    def status(self):
+        """A JSON-serializable snapshot of current progress."""
+
+        rate = self.rate
+        remaining = self.total - self.done
+
+        return {
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "inflight": self.inflight,
+            "elapsed": time.monotonic() - self.start,
+            "rate": rate,
+            "eta": remaining / rate if rate else None,
+            "p50": percentile(self.durations, 50),
+            "p95": percentile(self.durations, 95),
+        }
+
+    def format(self, status):
+        """Format a status snapshot for display on a single line."""
+
+        def seconds(value):
+            return "-" if value is None else "{:.1f}s".format(value)
+
+        return "{}/{} built ({} failed, {} in flight) {}/s eta {} p50 {} p95 {}".format(
+            mutils.format(status["completed"], style=mutils.Style.bold),
+            status["total"],
+            (
+                mutils.format(status["failed"], color=mutils.Color.red)
+                if status["failed"]
+                else status["failed"]
+            ),
+            status["inflight"],
+            "-" if status["rate"] is None else "{:.2f}".format(status["rate"]),
+            duration(status["eta"]),
+            seconds(status["p50"]),
+            seconds(status["p95"]),
+        )
+
+    def update(self, record):
+        """Record a finished sample and report progress if due.
+
+        Args:
+            record (dict): A sample record, as returned by ``dataset.process``.
+        """
+
+        if record["error"]:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+        self.finished.append(time.monotonic())
+
+        if record.get("duration") is not None:
+            self.durations.append(record["duration"])
+
+        if self.reported is None or time.monotonic() - self.reported >= self.interval:
+            self.report()
+
+    def report(self):
+        """Report current progress."""
+
+        self.reported = time.monotonic()
+
+        if self.mode == MODE_TTY:
+            self.line = self.format(self.status())
+            self.stream.write("\r\033[K{}".format(self.line))
+        elif self.mode == MODE_JSON:
+            self.stream.write(json.dumps(self.status(), sort_keys=True))
+            self.stream.write("\n")
+        else:
+            return
+
+        self.stream.flush()
+
+    def log(self, message):
+        """Print a message without disrupting in-place progress.
+
+        Args:
+            message (str): The message to print.
+        """
+
+        if self.mode == MODE_TTY:
+            self.stream.write("\r\033[K")
+            self.stream.flush()
+
+        print(message)
+
+        if self.mode == MODE_TTY and self.line is not None:
+            sys.stdout.flush()
+            self.stream.write(self.line)
+            self.stream.flush()
+
+    def close(self):
+        """Write a final report."""
+
+        self.report()
+
+        if self.mode == MODE_TTY:
+            self.stream.write("\n")
+            self.stream.flush()
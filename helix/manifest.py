@@ -0,0 +1,263 @@
+"""SQLite dataset manifests.
+
+A manifest indexes every sample in a dataset output directory - its
+Components and their configuration, tags, artifacts, and build results - so
+that datasets may be queried without scanning labels and walking directories.
+"""
+
+import json
+import sqlite3
+
+from . import utils
+from . import dataset
+from . import instrumentation
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    identifier TEXT PRIMARY KEY,
+    plan INTEGER,
+    status TEXT NOT NULL,
+    error TEXT,
+    duration REAL,
+    attempts INTEGER
+);
+CREATE INDEX IF NOT EXISTS samples_status ON samples (status);
+CREATE INDEX IF NOT EXISTS samples_duration ON samples (duration);
+
+CREATE TABLE IF NOT EXISTS components (
+    sample TEXT NOT NULL REFERENCES samples (identifier),
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    configuration TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS components_name ON components (name, sample);
+CREATE INDEX IF NOT EXISTS components_sample ON components (sample);
+
+CREATE TABLE IF NOT EXISTS tags (
+    sample TEXT NOT NULL REFERENCES samples (identifier),
+    key TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tags_value ON tags (key, value, sample);
+CREATE INDEX IF NOT EXISTS tags_sample ON tags (sample);
+
+CREATE TABLE IF NOT EXISTS artifacts (
+    sample TEXT NOT NULL REFERENCES samples (identifier),
+    path TEXT NOT NULL,
+    member TEXT,
+    sha256 TEXT,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS artifacts_sha256 ON artifacts (sha256);
+CREATE INDEX IF NOT EXISTS artifacts_sample ON artifacts (sample);
+
+CREATE TABLE IF NOT EXISTS timings (
+    sample TEXT NOT NULL REFERENCES samples (identifier),
+    category TEXT NOT NULL,
+    name TEXT NOT NULL,
+    wall REAL,
+    cpu REAL,
+    count INTEGER
+);
+CREATE INDEX IF NOT EXISTS timings_name ON timings (category, name);
+CREATE INDEX IF NOT EXISTS timings_sample ON timings (sample);
+"""
+
+
+class Manifest(object):
+    """A SQLite manifest of dataset samples.
+
+    Samples are buffered and written transactionally in batches as they are
+    added.
+
+    Args:
+        path (str): The path to the SQLite database - created if it does not
+            exist.
+        batch (int): The number of samples to buffer before writing.
+
+    Example:
+        Find all samples including a given Component, tagged with a given
+        technique, which built in under two seconds::
+
+            SELECT s.identifier FROM samples s
+            JOIN components c ON c.sample = s.identifier
+            JOIN tags t ON t.sample = s.identifier
+            WHERE c.name = 'linux-zlib-compress-data-compressed'
+                AND t.value = 'T1022'
+                AND s.duration < 2
+    """
+
+    FILENAME = "manifest.sqlite"
+
+    def __init__(self, path, batch=100):
+        self.batch = batch
+        self.pending = []
+
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+        # Manifests written before artifact members were recorded.
+        columns = [
+            c[1] for c in self.connection.execute("PRAGMA table_info(artifacts)")
+        ]
+        if "member" not in columns:
+            with self.connection:
+                self.connection.execute("ALTER TABLE artifacts ADD COLUMN member TEXT")
+
+    def add(self, record, artifacts=None):
+        """Add a sample.
+
+        Args:
+            record (dict): A sample record, as returned by ``dataset.process``.
+            artifacts (list): Artifact descriptions as returned by
+                ``storage.Store.add`` - required for successful samples.
+        """
+
+        self.pending.append((record, artifacts or []))
+
+        if len(self.pending) >= self.batch:
+            self.flush()
+
+    def timings(self, identifier, timings):
+        """Flatten build timings into rows.
+
+        Args:
+            identifier (str): The sample identifier.
+            timings (dict): Build timings, as returned by
+                ``instrumentation.summarize``.
+
+        Returns:
+            A list of ``timings`` table rows.
+        """
+
+        rows = [
+            (
+                identifier,
+                instrumentation.CATEGORY_BUILD,
+                "build",
+                timings["wall"],
+                timings["cpu"],
+                1,
+            )
+        ]
+
+        for name, stage in timings["stages"].items():
+            rows.append(
+                (
+                    identifier,
+                    instrumentation.CATEGORY_STAGE,
+                    name,
+                    stage["wall"],
+                    stage["cpu"],
+                    1,
+                )
+            )
+
+        for transform in timings["transforms"]:
+            rows.append(
+                (
+                    identifier,
+                    instrumentation.CATEGORY_TRANSFORM,
+                    transform["name"],
+                    transform["wall"],
+                    transform["cpu"],
+                    1,
+                )
+            )
+
+        subprocesses = timings["subprocesses"]
+        rows.append(
+            (
+                identifier,
+                instrumentation.CATEGORY_SUBPROCESS,
+                "run",
+                subprocesses["wall"],
+                subprocesses["cpu"],
+                subprocesses["count"],
+            )
+        )
+
+        return rows
+
+    def flush(self):
+        """Write all buffered samples in a single transaction."""
+
+        samples, components, tags, artifacts, timings = [], [], [], [], []
+
+        for record, stored in self.pending:
+            identifier = record["identifier"]
+
+            samples.append(
+                (
+                    identifier,
+                    record.get("index"),
+                    (
+                        "timeout"
+                        if record.get("timeout")
+                        else "failure" if record["error"] else "success"
+                    ),
+                    record["error"],
+                    record.get("duration"),
+                    record.get("attempts", 1),
+                )
+            )
+
+            for position, component in enumerate(record["components"]):
+                specification = utils.parse(dataset.specification(component))
+
+                components.append(
+                    (
+                        identifier,
+                        position,
+                        specification["name"],
+                        json.dumps(specification["configuration"], sort_keys=True),
+                    )
+                )
+
+            for key, value in record["tags"]:
+                tags.append((identifier, key, value))
+
+            for artifact in stored:
+                artifacts.append(
+                    (
+                        identifier,
+                        artifact["path"],
+                        artifact.get("member"),
+                        artifact["sha256"],
+                        artifact["size"],
+                    )
+                )
+
+            if record.get("timings"):
+                timings += self.timings(identifier, record["timings"])
+
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?, ?, ?)", samples
+            )
+            self.connection.executemany(
+                "INSERT INTO components VALUES (?, ?, ?, ?)", components
+            )
+            self.connection.executemany("INSERT INTO tags VALUES (?, ?, ?)", tags)
+            self.connection.executemany(
+                "INSERT INTO artifacts (sample, path, member, sha256, size) "
+                "VALUES (?, ?, ?, ?, ?)",
+                artifacts,
+            )
+            self.connection.executemany(
+                "INSERT INTO timings VALUES (?, ?, ?, ?, ?, ?)", timings
+            )
+
+        self.pending = []
+
+    def close(self):
+        """Write any buffered samples and close the database."""
+
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
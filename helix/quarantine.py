@@ -0,0 +1,154 @@
+"""Quarantine lists of Components which are known to fail.
+
+Quarantined Components are excluded from dataset plans so that no builds are
+wasted on samples which can never succeed. Combinations of Components which
+fail together (but build separately) may also be quarantined, in which case
+only samples including the whole combination are excluded. Combinations may
+include a Component more than once (e.g., from the ``walk`` strategy), in
+which case only samples including it at least as many times are excluded.
+Quarantine lists
+are stored as JSON files of the form::
+
+    {
+        "components": {"<specification>": "<error>", ...},
+        "combinations": [
+            {"components": ["<specification>", ...], "error": "<error>"},
+            ...
+        ]
+    }
+
+and may be shared between runs and edited by hand.
+"""
+
+import os
+import json
+import collections
+
+from . import dataset
+
+
+class Quarantine(object):
+    """A list of quarantined Components and combinations of Components.
+
+    Args:
+        path (str): The path to the quarantine file. It is read if it exists
+            and written by ``save``.
+
+    Example:
+        Excluding quarantined Components from a collection::
+
+            quarantine = Quarantine("quarantine.json")
+            collection = quarantine.filter(collection)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.components = {}
+        self.combinations = []
+
+        if os.path.isfile(path):
+            with open(path, "r") as f:
+                contents = json.load(f)
+
+            if not isinstance(contents, dict):
+                raise ValueError("not a quarantine file: {}".format(path))
+
+            self.components = dict(contents.get("components", {}))
+            self.combinations = [
+                (tuple(sorted(c["components"])), c["error"])
+                for c in contents.get("combinations", [])
+            ]
+
+    def add(self, component, error):
+        """Quarantine a Component.
+
+        Args:
+            component: A Component specification string or class.
+            error (str): Why the Component was quarantined.
+        """
+
+        self.components[dataset.specification(component)] = error
+
+    def combine(self, components, error):
+        """Quarantine a combination of Components.
+
+        A combination of a single Component quarantines that Component.
+
+        Args:
+            components (list): Component specification strings or classes.
+            error (str): Why the combination was quarantined.
+        """
+
+        if len(components) == 1:
+            return self.add(components[0], error)
+
+        combination = tuple(sorted(dataset.specification(c) for c in components))
+
+        if combination not in (c for c, _ in self.combinations):
+            self.combinations.append((combination, error))
+
+    def excludes(self, component):
+        """Check if a Component is quarantined.
+
+        Args:
+            component: A Component specification string or class.
+
+        Returns:
+            ``True`` if ``component`` is quarantined.
+        """
+
+        return dataset.specification(component) in self.components
+
+    def filter(self, components):
+        """Remove quarantined Components from a collection.
+
+        Args:
+            components (list): Component specification strings or classes.
+
+        Returns:
+            A new list of the Components which are not quarantined.
+        """
+
+        return [c for c in components if not self.excludes(c)]
+
+    def allows(self, sample):
+        """Check if a sample includes no quarantined combination.
+
+        Args:
+            sample (list): Component specification strings or classes.
+
+        Returns:
+            ``False`` if ``sample`` includes every Component of a quarantined
+            combination, as many times as the combination does (or any
+            quarantined Component).
+        """
+
+        specifications = collections.Counter(dataset.specification(c) for c in sample)
+
+        if any(s in self.components for s in specifications):
+            return False
+
+        def includes(combination):
+            return all(
+                specifications[s] >= n
+                for s, n in collections.Counter(combination).items()
+            )
+
+        return not any(includes(c) for c, _ in self.combinations)
+
+    def save(self):
+        """Write this quarantine list to its file."""
+
+        with open(self.path, "w") as f:
+            json.dump(
+                {
+                    "components": self.components,
+                    "combinations": [
+                        {"components": list(c), "error": e}
+                        for c, e in self.combinations
+                    ],
+                },
+                f,
+                indent=2,
+                sort_keys=True,
+            )
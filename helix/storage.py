@@ -0,0 +1,1004 @@
+"""Dataset output storage.
+
+Stores control how the artifacts of built samples are persisted in a dataset
+output directory and which build intermediates are retained.
+"""
+
+import io
+import os
+import abc
+import json
+import zlib
+import shutil
+import struct
+import tarfile
+import hashlib
+
+from . import dataset
+from . import exceptions
+
+RETENTION_NONE = "none"
+"""Retain only the final artifacts of successful samples."""
+
+RETENTION_FAILURE = "failure"
+"""Additionally retain build logs of failed samples."""
+
+RETENTION_ALL = "all"
+"""Retain the entire build directory of every sample."""
+
+LOGS = ("stdout.txt", "stderr.txt", "exception.txt")
+"""Build log file names retained with ``RETENTION_FAILURE``."""
+
+FICLONE = 0x40049409
+"""The Linux ``FICLONE`` ioctl request number for reflink copies."""
+
+
+def digest(path):
+    """Compute the SHA256 digest of a file.
+
+    Args:
+        path (str): The path to the file.
+
+    Returns:
+        A tuple of the hex digest and the size of the file in bytes.
+    """
+
+    sha256 = hashlib.sha256()
+    size = 0
+
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+            size += len(chunk)
+
+    return sha256.hexdigest(), size
+
+
+def _copy(source, destination):
+    """Copy a file, preferring a reflink (copy-on-write clone) if supported."""
+
+    try:
+        import fcntl
+
+        with open(source, "rb") as s, open(destination, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+    except (ImportError, OSError):
+        shutil.copyfile(source, destination)
+
+    shutil.copymode(source, destination)
+
+
+def transfer(source, destination):
+    """Move a file as cheaply as possible.
+
+    Attempts a rename first, then a reflink, and finally falls back to a full
+    copy if the source and destination are on different filesystems.
+
+    Args:
+        source (str): The file to move.
+        destination (str): The destination path - parent directories are
+            created if necessary.
+    """
+
+    if os.path.abspath(source) == os.path.abspath(destination):
+        return
+
+    directory = os.path.dirname(destination)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    try:
+        os.rename(source, destination)
+    except OSError:
+        _copy(source, destination)
+        os.remove(source)
+
+
+def move(source, destination):
+    """Move a directory tree, merging it into ``destination`` if it exists.
+
+    Args:
+        source (str): The directory to move.
+        destination (str): The destination directory.
+    """
+
+    if os.path.abspath(source) == os.path.abspath(destination):
+        return
+
+    if not os.path.exists(destination):
+        parent = os.path.dirname(destination)
+        if not os.path.isdir(parent):
+            os.makedirs(parent)
+
+        try:
+            os.rename(source, destination)
+            return
+        except OSError:
+            pass
+
+    for root, _, files in os.walk(source):
+        target = os.path.join(destination, os.path.relpath(root, source))
+
+        for name in files:
+            transfer(os.path.join(root, name), os.path.join(target, name))
+
+    shutil.rmtree(source)
+
+
+class Store(object, metaclass=abc.ABCMeta):
+    """A common base class for all dataset output stores.
+
+    Samples may be built in a separate scratch directory (e.g., on a
+    ``tmpfs``) in which case stores are responsible for moving artifacts and
+    any retained build intermediates into ``<output>/<identifier>``. Stores
+    are used by the process collecting build results, one sample at a time,
+    so implementations do not need to be process-safe.
+
+    Args:
+        output (str): The dataset output directory.
+        retention (str): Which build intermediates to retain - one of
+            ``RETENTION_NONE``, ``RETENTION_FAILURE``, or ``RETENTION_ALL``.
+    """
+
+    def __init__(self, output, retention=RETENTION_ALL):
+        if retention not in (RETENTION_NONE, RETENTION_FAILURE, RETENTION_ALL):
+            raise ValueError("unknown retention policy: {}".format(retention))
+
+        self.output = output
+        self.retention = retention
+
+    def path(self, record, path):
+        """Map a path in a sample's build directory to the output directory.
+
+        Args:
+            record (dict): A sample record.
+            path (str): A path inside of the sample's build directory.
+
+        Returns:
+            The corresponding path in ``<output>/<identifier>``.
+        """
+
+        return os.path.join(
+            self.output,
+            record["identifier"],
+            os.path.relpath(path, record["directory"]),
+        )
+
+    def relocate(self, record):
+        """Move a sample's entire build directory to the output directory.
+
+        Returns:
+            A copy of ``record`` with paths updated to the new location.
+        """
+
+        move(record["directory"], os.path.join(self.output, record["identifier"]))
+
+        return dict(
+            record,
+            directory=os.path.join(self.output, record["identifier"]),
+            artifacts=[self.path(record, a) for a in record["artifacts"]],
+        )
+
+    def clean(self, record, keep=()):
+        """Remove everything from a sample's build directory except ``keep``.
+
+        Args:
+            record (dict): A sample record.
+            keep (iterable): Paths of files which should not be removed.
+        """
+
+        keep = {os.path.abspath(k) for k in keep}
+
+        for root, directories, files in os.walk(record["directory"], topdown=False):
+            for name in files:
+                path = os.path.abspath(os.path.join(root, name))
+                if path not in keep:
+                    os.remove(path)
+
+            for name in directories:
+                path = os.path.join(root, name)
+
+                if os.path.islink(path):
+                    os.remove(path)
+                elif not os.listdir(path):
+                    os.rmdir(path)
+
+        if os.path.isdir(record["directory"]) and not os.listdir(record["directory"]):
+            os.rmdir(record["directory"])
+
+    @abc.abstractmethod
+    def store(self, record):
+        """Store the artifacts of a successfully built sample.
+
+        Implementations should move artifacts out of the scratch directory
+        (see ``path`` and ``transfer``) and into the output directory.
+
+        Args:
+            record (dict): A sample record, as returned by
+                ``dataset.process``.
+
+        Returns:
+            A list of dictionaries describing each stored artifact with its
+            ``path`` (relative to the output directory), ``sha256`` digest, and
+            ``size`` in bytes.
+        """
+
+        return []
+
+    def add(self, record):
+        """Add a successfully built sample.
+
+        Stores the sample's artifacts and applies the retention policy to the
+        rest of its build directory.
+
+        Args:
+            record (dict): A sample record, as returned by
+                ``dataset.process``.
+
+        Returns:
+            A list of artifact descriptions - see ``store``.
+        """
+
+        if self.retention == RETENTION_ALL:
+            return self.store(self.relocate(record))
+
+        artifacts = self.store(record)
+
+        self.clean(
+            record, keep=[os.path.join(self.output, a["path"]) for a in artifacts]
+        )
+
+        return artifacts
+
+    def fail(self, record):
+        """Add a sample which failed to build.
+
+        Applies the retention policy to the sample's build directory.
+
+        Args:
+            record (dict): A sample record, as returned by
+                ``dataset.process``.
+        """
+
+        if self.retention == RETENTION_ALL:
+            self.relocate(record)
+        elif self.retention == RETENTION_FAILURE:
+            logs = []
+            for name in LOGS:
+                log = os.path.join(record["directory"], name)
+
+                if os.path.isfile(log):
+                    transfer(log, self.path(record, log))
+                    logs.append(self.path(record, log))
+
+            self.clean(record, keep=logs)
+        else:
+            self.clean(record)
+
+    def discard(self, record):
+        """Discard a sample which is not part of the dataset.
+
+        Removes the sample's entire build directory regardless of the
+        retention policy (e.g., for samples still being built when enough
+        samples have been generated).
+
+        Args:
+            record (dict): A sample record, as returned by
+                ``dataset.process``.
+        """
+
+        shutil.rmtree(record["directory"], ignore_errors=True)
+
+    def close(self):
+        """Finalize this store once all samples have been added."""
+
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class DirectoryStore(Store):
+    """Store artifacts in their sample build directories.
+
+    This is the default layout: ``<output>/<identifier>/...``.
+    """
+
+    def store(self, record):
+        artifacts = []
+
+        for artifact in record["artifacts"]:
+            destination = self.path(record, artifact)
+            transfer(artifact, destination)
+
+            sha256, size = digest(destination)
+
+            artifacts.append(
+                {
+                    "path": os.path.relpath(destination, self.output),
+                    "sha256": sha256,
+                    "size": size,
+                }
+            )
+
+        return artifacts
+
+
+class ContentAddressedStore(Store):
+    """Store each distinct artifact exactly once.
+
+    Artifacts are stored by their SHA256 digest in an ``objects`` directory
+    (``<output>/objects/<digest[:2]>/<digest>``). Sample directories contain
+    hardlinks to the corresponding objects, falling back to a reference to the
+    object in the returned artifact list if linking is not supported. Artifact
+    descriptions additionally include the ``object`` path.
+    """
+
+    DIRECTORY = "objects"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.objects = os.path.join(self.output, self.DIRECTORY)
+
+        if not os.path.isdir(self.objects):
+            os.makedirs(self.objects)
+
+    def insert(self, path):
+        """Move a file into the object store.
+
+        If an identical object already exists the file is simply removed.
+
+        Args:
+            path (str): The path to the file to insert.
+
+        Returns:
+            A tuple of the path to the stored object, its digest, and its size.
+        """
+
+        sha256, size = digest(path)
+
+        stored = os.path.join(self.objects, sha256[:2], sha256)
+
+        if os.path.isfile(stored):
+            os.remove(path)
+        else:
+            transfer(path, stored)
+
+        return stored, sha256, size
+
+    def store(self, record):
+        artifacts = []
+
+        for artifact in record["artifacts"]:
+            stored, sha256, size = self.insert(artifact)
+
+            destination = self.path(record, artifact)
+
+            try:
+                directory = os.path.dirname(destination)
+                if not os.path.isdir(directory):
+                    os.makedirs(directory)
+
+                os.link(stored, destination)
+                path = destination
+            except OSError:
+                path = stored
+
+            artifacts.append(
+                {
+                    "path": os.path.relpath(path, self.output),
+                    "object": os.path.relpath(stored, self.output),
+                    "sha256": sha256,
+                    "size": size,
+                }
+            )
+
+        return artifacts
+
+
+COMPRESSION_NONE = "none"
+COMPRESSION_DEFLATE = "deflate"
+COMPRESSION_ZSTD = "zstd"
+
+SUFFIXES = {COMPRESSION_NONE: "", COMPRESSION_DEFLATE: ".zz", COMPRESSION_ZSTD: ".zst"}
+"""Member name suffixes for each compression type."""
+
+
+def _zstandard():
+    """Import the optional ``zstandard`` module."""
+
+    try:
+        import zstandard
+    except ImportError:
+        raise exceptions.MissingDependency(
+            "zstd compression requires zstandard (hint: install with the zstd extension)"
+        )
+
+    return zstandard
+
+
+def compress(data, compression):
+    """Compress bytes with a given compression type."""
+
+    if compression == COMPRESSION_DEFLATE:
+        return zlib.compress(data)
+    elif compression == COMPRESSION_ZSTD:
+        return _zstandard().ZstdCompressor().compress(data)
+
+    return data
+
+
+def decompress(data, compression):
+    """Decompress bytes compressed with ``compress``."""
+
+    if compression == COMPRESSION_DEFLATE:
+        return zlib.decompress(data)
+    elif compression == COMPRESSION_ZSTD:
+        return _zstandard().ZstdDecompressor().decompress(data)
+
+    return data
+
+
+class ShardedStore(Store):
+    """Pack samples into fixed-size sharded tar archives.
+
+    Each sample's artifacts and a ``labels.json`` member (containing its tags
+    and components) are appended to the current shard in
+    ``<output>/shards/shard-<number>.tar`` as soon as the sample is added. A
+    new shard is started when the current one would exceed ``size`` bytes -
+    samples are never split across shards. Members may be individually
+    compressed.
+
+    An index (``<output>/shards/index.jsonl``) is appended with one JSON line
+    per sample mapping each member to its ``shard``, the ``offset`` and
+    ``length`` of its data in that shard, its uncompressed ``size``, and its
+    ``compression``. Use ``ShardReader`` to read samples back.
+
+    Artifacts are only stored in shards - with ``RETENTION_ALL``, the rest of
+    each build directory is kept in ``<output>/<identifier>`` as usual.
+
+    Args:
+        size (int): The maximum shard size in bytes.
+        compression (str): Per-member compression - one of
+            ``COMPRESSION_NONE``, ``COMPRESSION_DEFLATE``, or
+            ``COMPRESSION_ZSTD`` (requires ``zstandard``).
+    """
+
+    DIRECTORY = "shards"
+    INDEX = "index.jsonl"
+
+    def __init__(
+        self, *args, size=1024 * 1024 * 1024, compression=COMPRESSION_NONE, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+
+        if compression not in SUFFIXES:
+            raise ValueError("unknown compression type: {}".format(compression))
+        if compression == COMPRESSION_ZSTD:
+            _zstandard()
+
+        self.size = size
+        self.compression = compression
+
+        self.directory = os.path.join(self.output, self.DIRECTORY)
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        self.index = open(os.path.join(self.directory, self.INDEX), "a")
+
+        self.shards = len([n for n in os.listdir(self.directory) if n.endswith(".tar")])
+        self.shard = None
+        self.file = None
+        self.tar = None
+
+    def open(self):
+        """Start a new shard."""
+
+        self.close_shard()
+
+        name = "shard-{:05d}.tar".format(self.shards)
+        self.shards += 1
+
+        self.shard = os.path.join(self.DIRECTORY, name)
+        self.file = open(os.path.join(self.output, self.shard), "wb")
+        self.tar = tarfile.open(fileobj=self.file, mode="w", format=tarfile.PAX_FORMAT)
+
+    def close_shard(self):
+        """Finish the current shard, if any."""
+
+        if self.shard is None:
+            return
+
+        self.tar.close()
+        self.file.close()
+
+        self.shard = None
+
+    def append(self, name, data):
+        """Append a single member to the current shard.
+
+        Returns:
+            A tuple of the offset and length of the member data in the shard.
+        """
+
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mode = 0o644
+
+        self.tar.addfile(info, io.BytesIO(data))
+
+        padded = -(-len(data) // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+        offset = self.file.tell() - padded
+
+        return offset, len(data)
+
+    def store(self, record):
+        def member(name):
+            return "{}/{}{}".format(
+                record["identifier"], name, SUFFIXES[self.compression]
+            )
+
+        artifacts = []
+        for artifact in record["artifacts"]:
+            with open(artifact, "rb") as f:
+                artifacts.append(
+                    (member(os.path.relpath(artifact, record["directory"])), f.read())
+                )
+
+        labels = {
+            "tags": record["tags"],
+            "components": [dataset.specification(c) for c in record["components"]],
+        }
+        labels = (member("labels.json"), json.dumps(labels).encode("utf-8"))
+
+        members = [
+            (name, data, compress(data, self.compression))
+            for name, data in artifacts + [labels]
+        ]
+
+        total = sum(len(c) + 2 * tarfile.BLOCKSIZE for _, _, c in members)
+        if self.shard is None or (
+            self.file.tell() > 0 and self.file.tell() + total > self.size
+        ):
+            self.open()
+
+        entries = {}
+        for name, data, compressed in members:
+            offset, length = self.append(name, compressed)
+
+            entries[name] = {
+                "shard": self.shard,
+                "offset": offset,
+                "length": length,
+                "size": len(data),
+                "compression": self.compression,
+            }
+
+        self.file.flush()
+
+        self.index.write(
+            json.dumps({"identifier": record["identifier"], "members": entries})
+        )
+        self.index.write("\n")
+        self.index.flush()
+
+        return [
+            {
+                "path": self.shard,
+                "member": name,
+                "sha256": hashlib.sha256(data).hexdigest(),
+                "size": len(data),
+            }
+            for name, data in artifacts
+        ]
+
+    def add(self, record):
+        artifacts = self.store(record)
+
+        if self.retention == RETENTION_ALL:
+            # Keep build intermediates, without a second copy of artifacts.
+            for artifact in record["artifacts"]:
+                os.remove(artifact)
+
+            self.relocate(record)
+        else:
+            self.clean(record)
+
+        return artifacts
+
+    def close(self):
+        self.close_shard()
+        self.index.close()
+
+
+class ShardReader(object):
+    """Random access to samples written by ``ShardedStore``.
+
+    Args:
+        output (str): The dataset output directory.
+    """
+
+    def __init__(self, output):
+        self.output = output
+        self.index = {}
+
+        path = os.path.join(output, ShardedStore.DIRECTORY, ShardedStore.INDEX)
+
+        with open(path, "r") as f:
+            for line in f:
+                entry = json.loads(line)
+                self.index[entry["identifier"]] = entry["members"]
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def read(self, identifier):
+        """Read all members of a given sample.
+
+        Args:
+            identifier (str): The sample identifier.
+
+        Returns:
+            A dictionary of member names (relative to the sample and without
+            compression suffixes) to their uncompressed contents.
+        """
+
+        members = {}
+
+        for name, entry in self.index[identifier].items():
+            with open(os.path.join(self.output, entry["shard"]), "rb") as f:
+                f.seek(entry["offset"])
+                data = f.read(entry["length"])
+
+            suffix = SUFFIXES[entry["compression"]]
+            name = name[len(identifier) + 1 : len(name) - len(suffix)]
+
+            members[name] = decompress(data, entry["compression"])
+
+        return members
+
+
+DELTA_MAGIC = b"HXD1"
+DELTA_BLOCK = 32
+
+
+def _forward(a, i, b, j, limit):
+    """The length of the common run of ``a[i:]`` and ``b[j:]``, up to ``limit``.
+
+    Runs are compared in slices of doubling size rather than byte by byte.
+    """
+
+    length, step = 0, DELTA_BLOCK
+    while length < limit:
+        size = min(step, limit - length)
+
+        if a[i + length : i + length + size] == b[j + length : j + length + size]:
+            length += size
+            step *= 2
+        elif size == 1:
+            break
+        else:
+            step = size // 2
+
+    return length
+
+
+def _backward(a, i, b, j, limit):
+    """The length of the common run of ``a`` and ``b`` ending at ``i`` and ``j``.
+
+    The run is at most ``limit`` long - see ``_forward``.
+    """
+
+    length, step = 0, DELTA_BLOCK
+    while length < limit:
+        size = min(step, limit - length)
+
+        if a[i - length - size : i - length] == b[j - length - size : j - length]:
+            length += size
+            step *= 2
+        elif size == 1:
+            break
+        else:
+            step = size // 2
+
+    return length
+
+
+def diff(source, target):
+    """Compute a binary delta which transforms ``source`` into ``target``.
+
+    Any prefix and suffix shared by ``source`` and ``target`` are copied
+    directly. Between them, aligned blocks of ``source`` are indexed and
+    ``target`` is scanned for matching blocks which are greedily extended in
+    both directions. The delta is a compressed sequence of copy (from
+    ``source``) and insert operations.
+
+    Args:
+        source (bytes): The reference content.
+        target (bytes): The content to encode.
+
+    Returns:
+        The delta as bytes - see ``patch``.
+    """
+
+    operations = []
+
+    def copy(offset, length):
+        if length > 0:
+            operations.append(b"C" + struct.pack(">II", offset, length))
+
+    def insert(start, end):
+        if end > start:
+            operations.append(b"I" + struct.pack(">I", end - start))
+            operations.append(target[start:end])
+
+    shared = min(len(source), len(target))
+    prefix = _forward(source, 0, target, 0, shared)
+    suffix = _backward(source, len(source), target, len(target), shared - prefix)
+    limit = len(target) - suffix
+
+    copy(0, prefix)
+
+    index = {}
+    if limit - prefix >= DELTA_BLOCK:
+        for offset in range(0, len(source) - DELTA_BLOCK + 1, DELTA_BLOCK):
+            index.setdefault(source[offset : offset + DELTA_BLOCK], offset)
+
+    pending = position = prefix
+    while index and position <= limit - DELTA_BLOCK:
+        offset = index.get(target[position : position + DELTA_BLOCK])
+
+        if offset is None:
+            position += 1
+            continue
+
+        before = _backward(
+            source, offset, target, position, min(offset, position - pending)
+        )
+        after = _forward(
+            source,
+            offset + DELTA_BLOCK,
+            target,
+            position + DELTA_BLOCK,
+            min(len(source) - offset, limit - position) - DELTA_BLOCK,
+        )
+
+        insert(pending, position - before)
+        copy(offset - before, before + DELTA_BLOCK + after)
+
+        pending = position = position + DELTA_BLOCK + after
+
+    insert(pending, limit)
+    copy(len(source) - suffix, suffix)
+
+    return DELTA_MAGIC + zlib.compress(b"".join(operations))
+
+
+def patch(source, delta):
+    """Apply a binary delta produced by ``diff``.
+
+    Args:
+        source (bytes): The reference content the delta was computed against.
+        delta (bytes): The delta.
+
+    Returns:
+        The reconstructed target content.
+    """
+
+    if not delta.startswith(DELTA_MAGIC):
+        raise ValueError("invalid delta")
+
+    data = zlib.decompress(delta[len(DELTA_MAGIC) :])
+
+    target = []
+    position = 0
+    while position < len(data):
+        operation = data[position : position + 1]
+
+        if operation == b"C":
+            offset, length = struct.unpack_from(">II", data, position + 1)
+            target.append(source[offset : offset + length])
+            position += 9
+        elif operation == b"I":
+            (length,) = struct.unpack_from(">I", data, position + 1)
+            target.append(data[position + 5 : position + 5 + length])
+            position += 5 + length
+        else:
+            raise ValueError("invalid delta operation: {}".format(operation))
+
+    return b"".join(target)
+
+
+class DeltaStore(Store):
+    """Store artifacts as binary deltas against earlier samples.
+
+    Intended for the ``walk`` strategy, where consecutive samples differ by
+    only a few Components. Each sample's artifacts are stored as deltas (see
+    ``diff``) against the corresponding artifacts (by position) of the most
+    recent earlier sample in the plan which has already been stored, so
+    samples which complete slightly out of order still share most of their
+    content. Full copies (keyframes) are stored whenever a reference chain
+    would exceed ``keyframe`` samples, bounding the cost of reading any single
+    sample. Samples without a plan ``index`` are always stored as keyframes.
+
+    Keyframe artifacts are stored as usual in ``<output>/<identifier>``, delta
+    artifacts with an additional ``.delta`` suffix. An index
+    (``<output>/deltas.jsonl``) records the reference of each sample. Use
+    ``DeltaReader`` to reconstruct artifacts. Artifact descriptions
+    additionally include the ``reference`` sample identifier for deltas.
+
+    Args:
+        keyframe (int): The maximum reference chain length.
+    """
+
+    INDEX = "deltas.jsonl"
+
+    def __init__(self, *args, keyframe=16, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.keyframe = keyframe
+
+        # Recently stored samples by plan index: (identifier, depth, contents).
+        self.recent = {}
+
+        self.index = open(os.path.join(self.output, self.INDEX), "a")
+
+    def reference(self, index):
+        """Select the reference sample for a given plan index."""
+
+        if index is None:
+            return None
+
+        candidates = [
+            i
+            for i, (_, depth, _) in self.recent.items()
+            if i < index and depth + 1 < self.keyframe
+        ]
+
+        if not candidates:
+            return None
+
+        return max(candidates)
+
+    def store(self, record):
+        contents = []
+        for artifact in record["artifacts"]:
+            with open(artifact, "rb") as f:
+                contents.append(f.read())
+
+        reference = self.reference(record["index"])
+
+        if reference is None:
+            identifier, depth, previous = None, 0, []
+        else:
+            identifier, depth, previous = self.recent[reference]
+            depth += 1
+
+        artifacts = []
+
+        for position, (artifact, data) in enumerate(zip(record["artifacts"], contents)):
+            description = {
+                "sha256": hashlib.sha256(data).hexdigest(),
+                "size": len(data),
+            }
+
+            if position < len(previous):
+                destination = "{}.delta".format(self.path(record, artifact))
+
+                directory = os.path.dirname(destination)
+                if not os.path.isdir(directory):
+                    os.makedirs(directory)
+
+                with open(destination, "wb") as f:
+                    f.write(diff(previous[position], data))
+
+                os.remove(artifact)
+
+                description["reference"] = identifier
+            else:
+                destination = self.path(record, artifact)
+                transfer(artifact, destination)
+
+            description["path"] = os.path.relpath(destination, self.output)
+
+            artifacts.append(description)
+
+        self.index.write(
+            json.dumps(
+                {
+                    "identifier": record["identifier"],
+                    "reference": identifier,
+                    "artifacts": [a["path"] for a in artifacts],
+                }
+            )
+        )
+        self.index.write("\n")
+        self.index.flush()
+
+        if record["index"] is not None:
+            self.recent[record["index"]] = (record["identifier"], depth, contents)
+
+            for index in sorted(self.recent)[: -self.keyframe]:
+                del self.recent[index]
+
+        return artifacts
+
+    def close(self):
+        self.index.close()
+
+
+class DeltaReader(object):
+    """Reconstruct artifacts written by ``DeltaStore``.
+
+    Args:
+        output (str): The dataset output directory.
+    """
+
+    def __init__(self, output):
+        self.output = output
+        self.index = {}
+
+        with open(os.path.join(output, DeltaStore.INDEX), "r") as f:
+            for line in f:
+                entry = json.loads(line)
+                self.index[entry["identifier"]] = entry
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def artifacts(self, identifier):
+        """Reconstruct all artifacts of a given sample, in order.
+
+        Args:
+            identifier (str): The sample identifier.
+
+        Returns:
+            A list of tuples of artifact paths (relative to the sample
+            directory) and their contents.
+        """
+
+        entry = self.index[identifier]
+
+        previous = []
+        if entry["reference"] is not None:
+            previous = [data for _, data in self.artifacts(entry["reference"])]
+
+        artifacts = []
+
+        for position, path in enumerate(entry["artifacts"]):
+            with open(os.path.join(self.output, path), "rb") as f:
+                data = f.read()
+
+            name = os.path.relpath(path, identifier)
+
+            if name.endswith(".delta"):
+                name = name[: -len(".delta")]
+                data = patch(previous[position], data)
+
+            artifacts.append((name, data))
+
+        return artifacts
+
+    def read(self, identifier):
+        """Reconstruct all artifacts of a given sample.
+
+        Args:
+            identifier (str): The sample identifier.
+
+        Returns:
+            A dictionary of artifact paths (relative to the sample directory)
+            to their contents.
+        """
+
+        return dict(self.artifacts(identifier))
@@ -1,17 +1,43 @@
 import os
+import io
 import abc
+import sys
+import argparse
+import json
+import errno
+import time
+import signal
+import threading
 import ctypes
+import contextlib
+import pickle
 import shutil
+import sqlite3
+import tarfile
+import subprocess
 import tempfile
 import unittest
+import urllib.request
+from unittest import mock
 
 from . import blueprint
 from . import component
 from . import transform
 from . import build
 from . import utils
+from . import dataset
+from . import storage
+from . import costs
+from . import manifest
+from . import quarantine
+from . import instrumentation
+from . import benchmark
 from . import exceptions
 
+from .management import progress
+from .management import metrics
+from .management.commands import datasetsimilarity
+
 
 class UnitTestCase(unittest.TestCase):
     """The base class for all Blueprint, Component, and Transform tests.
@@ -352,6 +378,28 @@ class DependencyTests(unittest.TestCase):
         with self.assertRaises(exceptions.DependencyInstallationFailure):
             Test.install()
 
+    @unittest.skipUnless(os.name == "posix", "test not supported on this platform")
+    def test_script_dependency_without_shebang(self):
+        working = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, working)
+
+        installed = os.path.join(working, "installed")
+        script = os.path.join(working, "install.sh")
+        with open(script, "w") as f:
+            f.write("touch {}\n".format(installed))
+        os.chmod(script, 0o755)
+
+        class Script(utils.ScriptDependency):
+            def installed(self):
+                return os.path.isfile(installed)
+
+        class Test(utils.Dependable):
+            dependencies = [Script(script)]
+
+        Test.install()
+
+        self.assertTrue(Test.installed())
+
     @unittest.skipUnless(os.name == "posix", "test not supported on this platform")
     def test_linux_apt_dependency_installed(self):
         class Test(utils.Dependable):
@@ -464,6 +512,13 @@ class UtilityTests(unittest.TestCase):
 
         self.assertEqual(result, '"{}"'.format(path.name))
 
+    def test_find_no_quotes(self):
+        path = tempfile.NamedTemporaryFile(prefix="test binary")
+
+        result = utils.find("test-binary", guess=[path.name], quote=False)
+
+        self.assertEqual(result, path.name)
+
     def test_find_priority(self):
         env = "TEST_BINARY_PATH"
         guess = tempfile.NamedTemporaryFile()
@@ -475,6 +530,129 @@ class UtilityTests(unittest.TestCase):
 
         self.assertEqual(result, environment.name)
 
+    def test_run_arguments(self):
+        output, _ = utils.run(
+            [sys.executable, "-c", "import sys; print(sys.argv[1])", "$HOME; exit 1"]
+        )
+
+        self.assertEqual(output.strip(), b"$HOME; exit 1")
+
+    def test_run_environment(self):
+        output, _ = utils.run(
+            [sys.executable, "-c", "import os; print(os.environ['HELIX_TEST'])"],
+            env={"HELIX_TEST": "value"},
+        )
+
+        self.assertEqual(output.strip(), b"value")
+        self.assertNotIn("HELIX_TEST", os.environ)
+
+        self.assertIsNone(utils.environment())
+        self.assertIs(
+            utils.environment({"HELIX_TEST": "value"}),
+            utils.environment({"HELIX_TEST": "value"}),
+        )
+
+    def test_run_tail(self):
+        stdout = tempfile.TemporaryFile()
+
+        output, errors = utils.run(
+            '"{}" -c "print(\'x\' * 200000)"'.format(sys.executable),
+            stdout=stdout,
+            tail=100,
+        )
+
+        self.assertEqual(output, b"x" * 99 + b"\n")
+        self.assertEqual(errors, b"")
+
+        stdout.seek(0)
+        self.assertEqual(len(stdout.read().strip()), 200000)
+
+    def test_run_fileno(self):
+        stdout = tempfile.TemporaryFile()
+
+        output, _ = utils.run("echo hello", stdout=stdout.fileno())
+
+        self.assertEqual(output, b"hello\n")
+
+        stdout.seek(0)
+        self.assertEqual(stdout.read(), b"hello\n")
+
+    def test_run_tee(self):
+        terminal = io.StringIO()
+
+        with contextlib.redirect_stdout(terminal):
+            output, _ = utils.run("echo hello", tee=True)
+
+        self.assertEqual(output, b"hello\n")
+        self.assertEqual(terminal.getvalue(), "hello\n")
+
+    @unittest.skipUnless(os.name == "posix", "test not supported on this platform")
+    def test_run_timeout(self):
+        start = time.monotonic()
+
+        # The background sleep holds the output pipes open, so this only
+        # returns promptly if the whole process group is killed.
+        with self.assertRaises(exceptions.BuildTimeout) as context:
+            utils.run("sleep 30 & sleep 30; wait", timeout=0.2)
+
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(context.exception.__cause__.returncode, -signal.SIGKILL)
+
+    def test_run_within_timeout(self):
+        output, _ = utils.run("echo hello", timeout=30)
+
+        self.assertEqual(output.strip(), b"hello")
+
+    def test_deadline(self):
+        sleep = [sys.executable, "-c", "import time; time.sleep(30)"]
+
+        with utils.deadline(0.2):
+            with self.assertRaises(exceptions.BuildTimeout):
+                utils.run(sleep)
+
+            # Out of time - nothing else may run.
+            with self.assertRaises(exceptions.BuildTimeout):
+                utils.run("exit 0")
+
+        with utils.deadline(command=0.2):
+            with utils.deadline(command=30):
+                with self.assertRaises(exceptions.BuildTimeout):
+                    utils.run(sleep)
+
+        utils.run("exit 0")
+
+    def test_run_failure_output(self):
+        with self.assertRaises(exceptions.BuildFailure) as context:
+            utils.run(
+                "echo first >&2; echo second >&2; exit 2",
+                exception=exceptions.BuildFailure("failed"),
+                tail=7,
+            )
+
+        cause = context.exception.__cause__
+
+        self.assertIsInstance(cause, subprocess.CalledProcessError)
+        self.assertEqual(cause.returncode, 2)
+        self.assertEqual(cause.stderr, b"second\n")
+
+    def test_run_missing_executable(self):
+        with self.assertRaises(exceptions.BuildFailure) as context:
+            utils.run(
+                ["helix-missing-executable"],
+                exception=exceptions.BuildFailure("failed"),
+            )
+
+        self.assertIsInstance(context.exception.__cause__, FileNotFoundError)
+
+        with self.assertRaises(FileNotFoundError):
+            utils.run(["helix-missing-executable"])
+
+    def test_run_invalid_argument(self):
+        with self.assertRaises(exceptions.BuildFailure) as context:
+            utils.run([None, "--version"], exception=exceptions.BuildFailure("failed"))
+
+        self.assertIsInstance(context.exception.__cause__, TypeError)
+
     def test_simple_specification_parse(self):
         specification = "name:parameter=value"
 
@@ -569,6 +747,17 @@ class TestComponent(component.Component):
         self.globals = ["global"]
 
 
+class TestConstantComponent(TestComponent):
+    """A test Component which always generates identical source."""
+
+    name = "test-constant"
+
+    def generate(self):
+        self.functions = ["constant"]
+        self.calls = {}
+        self.globals = []
+
+
 class ComponentTests(unittest.TestCase):
     """Test core component functionality."""
 
@@ -615,6 +804,126 @@ class ComponentTests(unittest.TestCase):
         self.assertNotIn("$", first.calls["test"][0])
 
 
+class SyntheticComponentTests(unittest.TestCase):
+    """Test synthetic component generation."""
+
+    def setUp(self):
+        # Example components import this module so this cannot be imported at
+        # module level.
+        from .components.examples.synthetic import synthetic
+
+        self.synthetic = synthetic
+
+    def test_synthesize(self):
+        components = self.synthetic.synthesize(count=3, options=2, tags=2)
+
+        self.assertEqual(
+            [c.name for c in components], ["synthetic-0", "synthetic-1", "synthetic-2"]
+        )
+
+        for c in components:
+            self.assertEqual(len(c.tags), 4)
+            self.assertEqual(len(c.options), 2)
+            self.assertEqual(c().dependencies, [])
+
+    def test_synthesize_invalid(self):
+        with self.assertRaises(ValueError):
+            self.synthetic.synthesize(count=-1)
+
+        with self.assertRaises(ValueError):
+            self.synthetic.synthesize(functions="10")
+
+        with self.assertRaises(ValueError):
+            self.synthetic.synthesize(blueprint="invalid-blueprint")
+
+    def test_synthesize_blueprint(self):
+        components = self.synthetic.synthesize(count=2)
+
+        self.assertEqual([c.blueprints for c in components], [["cmake-cpp"]] * 2)
+
+        (Component,) = self.synthetic.synthesize(blueprint="cmake-c")
+
+        self.assertEqual(Component.blueprints, ["cmake-c"])
+
+    def test_generate(self):
+        (Component,) = self.synthetic.synthesize(functions=3, statements=5, globals=2)
+
+        instance = Component()
+        instance.configure()
+        instance.generate()
+
+        self.assertEqual(len(instance.globals), 5)
+        self.assertEqual(len(instance.calls["main"]), 3)
+        self.assertEqual(sum(f.count("+=") for f in instance.functions), 15)
+
+        instance.finalize()
+
+        self.assertTrue(all("$" not in f for f in instance.functions))
+        self.assertTrue(all("$" not in c for c in instance.calls["main"]))
+
+    def test_configuration(self):
+        (Component,) = self.synthetic.synthesize(options=2)
+
+        instance = Component()
+        instance.configure(option_1='say "hello"')
+        instance.generate()
+
+        self.assertIn('"value-0"', instance.functions[1])
+        self.assertIn('"say \\"hello\\""', instance.functions[1])
+
+    def test_loader(self):
+        loader = utils.load("helix.components.loaders", "synthetic")
+
+        f = io.StringIO(json.dumps({"synthetic": {"count": 5, "prefix": "load"}}))
+
+        components = loader().load(f)
+
+        self.assertEqual(len(components), 5)
+        self.assertEqual(components[-1].name, "load-4")
+
+    def test_loader_invalid(self):
+        loader = utils.load("helix.components.loaders", "synthetic")
+
+        with self.assertRaises(ValueError):
+            loader().load(io.StringIO(json.dumps({"components": []})))
+
+    def test_dataset(self):
+        working = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, working)
+
+        path = os.path.join(working, "synthetic.json")
+        with open(path, "w") as f:
+            json.dump({"synthetic": {"count": 3}}, f)
+
+        output = os.path.join(working, "dataset")
+
+        command = datasetsimilarity.Command()
+        parser = argparse.ArgumentParser()
+        command.add_arguments(parser)
+        options = parser.parse_args(
+            [
+                "random",
+                output,
+                "--load",
+                path,
+                "--component-count",
+                "2",
+                "--sample-count",
+                "2",
+                "--workers",
+                "1",
+            ]
+        )
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            command.execute(options)
+
+        with open(os.path.join(output, "labels.json")) as f:
+            labels = json.load(f)
+
+        self.assertEqual(len(labels), 2)
+
+
 class TestTransform(transform.Transform):
     name = "test"
     verbose_name = "Test"
@@ -659,6 +968,82 @@ class TestBlueprint(blueprint.Blueprint):
         return []
 
 
+class TestArtifactBlueprint(TestBlueprint):
+    """A test Blueprint which writes all functions to a single artifact."""
+
+    def compile(self, directory, options):
+        artifact = os.path.join(directory, self.build_name)
+
+        with open(artifact, "w") as f:
+            f.write("\n".join(self.functions))
+
+        return [artifact]
+
+
+class TestSlowBlueprint(TestBlueprint):
+    """A test Blueprint which runs a slow command when compiled."""
+
+    def compile(self, directory, options):
+        utils.run([sys.executable, "-c", "import time; time.sleep(30)"])
+
+        return []
+
+
+class TestConflictBlueprint(TestArtifactBlueprint):
+    """A test Blueprint which fails to compile a conflicting pair of Components."""
+
+    CONFLICT = {"test-conflict-a", "test-conflict-b"}
+
+    def compile(self, directory, options):
+        if self.CONFLICT <= {c.name for c in self.components}:
+            raise exceptions.BuildFailure("conflicting components")
+
+        return super().compile(directory, options)
+
+
+class TestFlakyBlueprint(TestArtifactBlueprint):
+    """A test Blueprint which fails transiently a given number of times."""
+
+    failures = 0
+
+    def fail(self):
+        raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+
+    def compile(self, directory, options):
+        if TestFlakyBlueprint.failures > 0:
+            TestFlakyBlueprint.failures -= 1
+            self.fail()
+
+        return super().compile(directory, options)
+
+
+class TestOutOfMemoryBlueprint(TestFlakyBlueprint):
+    """A test Blueprint whose compiler is killed under ``make``."""
+
+    def fail(self):
+        utils.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys; "
+                "sys.stderr.write('g++: fatal error: Killed signal terminated "
+                "program cc1plus\\n'); "
+                "sys.exit(2)",
+            ],
+            exception=exceptions.BuildFailure("make invocation failed"),
+        )
+
+
+class TestMissingToolBlueprint(TestFlakyBlueprint):
+    """A test Blueprint whose compiler is not installed."""
+
+    def fail(self):
+        try:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), "cc")
+        except FileNotFoundError as e:
+            raise exceptions.BuildFailure("cc invocation failed") from e
+
+
 class BlueprintTests(unittest.TestCase):
     """Test core blueprint functionality."""
 
@@ -987,14 +1372,1429 @@ class BuildTests(unittest.TestCase):
             build.build(configuration, working.name)
 
 
+class DatasetTests(unittest.TestCase):
+    """Test dataset generation utilities."""
+
+    def setUp(self):
+        self.working = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.working)
+
+    def test_process(self):
+        record = dataset.process(
+            TestArtifactBlueprint, [TestComponent], [], None, self.working
+        )
+
+        self.assertIsNone(record["error"])
+        self.assertEqual(len(record["artifacts"]), 1)
+        self.assertIn(("test", "component-test"), record["tags"])
+
+    def test_sampling_error(self):
+        for strategy in (dataset.rand, dataset.walk):
+            with self.assertRaises(dataset.SamplingError):
+                strategy(["first", "second"], 2, 3)
+
+    def test_configuration_loads(self):
+        path = os.path.join(self.working, "synthetic.json")
+        with open(path, "w") as f:
+            json.dump({"synthetic": {"count": 2}}, f)
+
+        configuration = dataset.configuration(
+            "test", "cmake-c", ["synthetic-0"], [], loads=[path]
+        )
+
+        self.assertEqual(configuration["components"][0]["class"].name, "synthetic-0")
+
+    def test_process_failure(self):
+        record = dataset.process(
+            TestArtifactBlueprint, ["invalid-component"], [], None, self.working
+        )
+
+        self.assertIsNotNone(record["error"])
+        self.assertTrue(
+            os.path.isfile(os.path.join(record["directory"], "exception.txt"))
+        )
+
+    def test_process_timeout(self):
+        record = dataset.process(
+            TestSlowBlueprint, [], [], None, self.working, options={"timeout": 0.2}
+        )
+
+        self.assertTrue(record["timeout"])
+        self.assertIn("timed out", record["error"])
+
+        path = os.path.join(self.working, manifest.Manifest.FILENAME)
+        with manifest.Manifest(path) as index:
+            index.add(record)
+
+        connection = sqlite3.connect(path)
+        self.addCleanup(connection.close)
+
+        (status,) = connection.execute("SELECT status FROM samples").fetchone()
+        self.assertEqual(status, "timeout")
+
+    def test_stream(self):
+        samples = [[TestComponent], [TestComponent, TestComponent]]
+
+        results = list(dataset.stream(TestArtifactBlueprint, samples))
+
+        self.assertEqual(len(results), 2)
+
+        for artifacts, tags, plan in results:
+            self.assertEqual(len(artifacts), 1)
+            self.assertIsInstance(artifacts[0], bytes)
+            self.assertIn(plan, samples)
+
+    def test_stream_parallel_cleanup(self):
+        samples = [[TestComponent]] * 4
+
+        results = list(
+            dataset.stream(
+                TestArtifactBlueprint, samples, workers=2, working=self.working
+            )
+        )
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(os.listdir(self.working), [])
+
+    def test_stream_temporary_cleanup(self):
+        tempdir = tempfile.tempdir
+        tempfile.tempdir = self.working
+        self.addCleanup(setattr, tempfile, "tempdir", tempdir)
+
+        results = list(
+            dataset.stream(TestArtifactBlueprint, [[TestComponent]], cleanup=False)
+        )
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual(os.listdir(self.working), [])
+
+    def test_stream_skips_failures(self):
+        samples = [[TestComponent], ["invalid-component"]]
+
+        results = list(dataset.stream(TestArtifactBlueprint, samples))
+
+        self.assertEqual(len(results), 1)
+
+    def test_stream_threaded(self):
+        samples = [[TestComponent]] * 4 + [["invalid-component"]]
+
+        results = list(
+            dataset.stream(
+                TestArtifactBlueprint,
+                samples,
+                workers=3,
+                working=self.working,
+                engine=dataset.ENGINE_THREAD,
+            )
+        )
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(os.listdir(self.working), [])
+
+    def test_execute_threaded_bounded(self):
+        consumed = []
+        running = []
+        lock = threading.Lock()
+
+        def arguments():
+            for i in range(20):
+                consumed.append(i)
+                yield (i,)
+
+        def square(value):
+            with lock:
+                running.append(value)
+                concurrent = len(running)
+            time.sleep(0.01)
+            with lock:
+                running.remove(value)
+
+            return value * value, concurrent
+
+        results = dataset.execute(
+            square, arguments(), workers=3, prefetch=1, engine=dataset.ENGINE_THREAD
+        )
+
+        first = next(results)
+        self.assertLessEqual(len(consumed), 5)
+
+        results = [first] + list(results)
+
+        self.assertEqual(sorted(r for r, _ in results), [i * i for i in range(20)])
+        self.assertLessEqual(max(concurrent for _, concurrent in results), 3)
+
+    def test_execute_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            list(dataset.execute(abs, [(1,)], engine="invalid"))
+
+    def test_pipeline(self):
+        samples = [[TestComponent]] * 4 + [["invalid-component"]]
+
+        arguments = [
+            (TestArtifactBlueprint, sample, [], None, self.working, index, None)
+            for index, sample in enumerate(samples)
+        ]
+
+        records = list(
+            dataset.pipeline(
+                arguments,
+                workers={dataset.STAGE_PREPARE: 2, dataset.STAGE_COMPILE: 1},
+            )
+        )
+
+        self.assertEqual(sorted(r["index"] for r in records), list(range(5)))
+
+        failures = [r for r in records if r["error"]]
+        self.assertEqual([r["index"] for r in failures], [4])
+        self.assertTrue(
+            os.path.isfile(os.path.join(failures[0]["directory"], "exception.txt"))
+        )
+
+        for record in records:
+            if record["error"]:
+                continue
+
+            self.assertEqual(len(record["artifacts"]), 1)
+            self.assertIn(("test", "component-test"), record["tags"])
+
+            names = [s["name"] for s in record["spans"]]
+            for name in ("configure", "generate", "compile", "build", "sample"):
+                self.assertIn(name, names)
+
+            self.assertIn("compile", record["timings"]["stages"])
+
+    def test_pipeline_timeout(self):
+        records = list(
+            dataset.pipeline(
+                [(TestSlowBlueprint, [], [], None, self.working, 0, {"timeout": 0.2})]
+            )
+        )
+
+        self.assertTrue(records[0]["timeout"])
+        self.assertIn("timed out", records[0]["error"])
+
+    def test_pipeline_bounded(self):
+        consumed = []
+
+        def arguments():
+            for index in range(20):
+                consumed.append(index)
+                yield (
+                    TestArtifactBlueprint,
+                    [TestComponent],
+                    [],
+                    None,
+                    self.working,
+                    index,
+                    None,
+                )
+
+        workers = {stage: 1 for stage in dataset.STAGES}
+
+        records = dataset.pipeline(arguments(), workers=workers, prefetch=1)
+
+        next(records)
+        self.assertLessEqual(len(consumed), len(dataset.STAGES) + 2)
+
+        self.assertEqual(len(list(records)), 19)
+
+    def test_preflight(self):
+        records = []
+
+        failures = dataset.preflight(
+            TestArtifactBlueprint,
+            [TestComponent, "invalid-component", TestComponent],
+            working=self.working,
+            callback=records.append,
+        )
+
+        self.assertEqual(list(failures), ["invalid-component"])
+        self.assertEqual(len(records), 2)
+        self.assertEqual(os.listdir(self.working), [])
+
+    def test_bisect(self):
+        components = [
+            type("Test", (TestConstantComponent,), {"name": name})
+            for name in (
+                "test-conflict-a",
+                "test-other-a",
+                "test-other-b",
+                "test-conflict-b",
+                "test-other-c",
+            )
+        ]
+
+        cache = {}
+
+        minimal, error = dataset.bisect(
+            TestConflictBlueprint, components, working=self.working, cache=cache
+        )
+
+        self.assertEqual(
+            sorted(c.name for c in minimal), ["test-conflict-a", "test-conflict-b"]
+        )
+        self.assertEqual(error, "conflicting components")
+        self.assertEqual(os.listdir(self.working), [])
+
+        builds = len(cache)
+
+        dataset.bisect(
+            TestConflictBlueprint, components, working=self.working, cache=cache
+        )
+        self.assertEqual(len(cache), builds)
+
+        self.assertEqual(
+            dataset.bisect(TestConflictBlueprint, components[:3]), (None, None)
+        )
+
+    def test_transient(self):
+        def chained(error, cause):
+            try:
+                raise error from cause
+            except Exception as e:
+                return e
+
+        killed = subprocess.CalledProcessError(-signal.SIGKILL, ["cc"])
+        exited = subprocess.CalledProcessError(1, ["cc"])
+
+        self.assertTrue(dataset.transient(OSError(errno.ENOSPC, "no space")))
+        self.assertTrue(dataset.transient(killed))
+        self.assertTrue(
+            dataset.transient(chained(exceptions.BuildFailure("failed"), killed))
+        )
+        self.assertFalse(
+            dataset.transient(chained(exceptions.BuildFailure("failed"), exited))
+        )
+        self.assertFalse(
+            dataset.transient(chained(exceptions.BuildTimeout("timed out"), killed))
+        )
+        self.assertFalse(dataset.transient(ValueError("invalid")))
+
+        self.assertFalse(dataset.transient(FileNotFoundError(errno.ENOENT, "cc")))
+        self.assertFalse(dataset.transient(PermissionError(errno.EACCES, "cc")))
+        self.assertTrue(dataset.transient(OSError(errno.EMFILE, "too many files")))
+
+        oom = subprocess.CalledProcessError(
+            2,
+            ["make"],
+            stderr=b"g++: fatal error: Killed signal terminated program cc1plus\n",
+        )
+        self.assertTrue(
+            dataset.transient(chained(exceptions.BuildFailure("failed"), oom))
+        )
+        self.assertTrue(
+            dataset.transient(subprocess.CalledProcessError(137, ["sh", "-c", "cc"]))
+        )
+
+    def retried(self, blueprint):
+        TestFlakyBlueprint.failures = 1
+        self.addCleanup(setattr, TestFlakyBlueprint, "failures", 0)
+
+        (record,) = dataset.retry(
+            lambda a: dataset.execute(dataset.process, a),
+            [(blueprint, [TestComponent], [], None, self.working, 0, None)],
+            dataset.RetryPolicy(attempts=2, backoff=0),
+        )
+
+        return record
+
+    def test_retry_out_of_memory(self):
+        record = self.retried(TestOutOfMemoryBlueprint)
+
+        self.assertIsNone(record["error"])
+        self.assertEqual(record["attempts"], 2)
+
+    def test_retry_missing_tool(self):
+        record = self.retried(TestMissingToolBlueprint)
+
+        self.assertEqual(record["error"], "cc invocation failed")
+        self.assertFalse(record["transient"])
+        self.assertEqual(record["attempts"], 1)
+
+    def test_retry(self):
+        TestFlakyBlueprint.failures = 2
+        self.addCleanup(setattr, TestFlakyBlueprint, "failures", 0)
+
+        samples = [[TestComponent]] * 3 + [["invalid-component"]]
+
+        arguments = [
+            (TestFlakyBlueprint, sample, [], None, self.working, index, None)
+            for index, sample in enumerate(samples)
+        ]
+
+        records = list(
+            dataset.retry(
+                lambda a: dataset.execute(dataset.process, a),
+                arguments,
+                dataset.RetryPolicy(attempts=2, backoff=0.01),
+            )
+        )
+
+        self.assertEqual(sorted(r["index"] for r in records), list(range(4)))
+        self.assertEqual(len(os.listdir(self.working)), 4)
+
+        attempts = {r["index"]: r["attempts"] for r in records}
+        self.assertEqual(attempts, {0: 2, 1: 2, 2: 1, 3: 1})
+
+        self.assertEqual([r["index"] for r in records if r["error"]], [3])
+
+        path = os.path.join(self.working, manifest.Manifest.FILENAME)
+        with manifest.Manifest(path) as index:
+            for record in records:
+                index.add(record)
+
+        connection = sqlite3.connect(path)
+        self.addCleanup(connection.close)
+
+        self.assertEqual(
+            dict(connection.execute("SELECT plan, attempts FROM samples")), attempts
+        )
+
+    def test_retry_index(self):
+        policy = dataset.RetryPolicy(attempts=2, backoff=0)
+
+        def build(arguments):
+            return dataset.execute(dataset.process, arguments)
+
+        for indices in ((None,), (0, 0)):
+            arguments = [
+                (TestArtifactBlueprint, [TestComponent], [], None, self.working, i)
+                for i in indices
+            ]
+
+            with self.assertRaises(ValueError):
+                list(dataset.retry(build, arguments, policy))
+
+    def test_retry_exhausted(self):
+        TestFlakyBlueprint.failures = 3
+        self.addCleanup(setattr, TestFlakyBlueprint, "failures", 0)
+
+        records = list(
+            dataset.retry(
+                lambda a: dataset.execute(dataset.process, a),
+                [
+                    (
+                        TestFlakyBlueprint,
+                        [TestComponent],
+                        [],
+                        None,
+                        self.working,
+                        0,
+                        None,
+                    )
+                ],
+                dataset.RetryPolicy(attempts=3, backoff=0),
+            )
+        )
+
+        self.assertEqual(len(records), 1)
+        self.assertTrue(records[0]["transient"])
+        self.assertEqual(records[0]["attempts"], 3)
+
+    def test_retry_policy(self):
+        policy = dataset.RetryPolicy(attempts=4, backoff=1.0, factor=2.0)
+
+        self.assertEqual([policy.delay(a) for a in (2, 3, 4)], [1.0, 2.0, 4.0])
+
+        with self.assertRaises(ValueError):
+            dataset.RetryPolicy(attempts=0)
+
+    def test_stage_workers(self):
+        workers = dataset.stage_workers({dataset.STAGE_TRANSFORM: 3})
+
+        self.assertEqual(set(workers), set(dataset.STAGES))
+        self.assertEqual(workers[dataset.STAGE_TRANSFORM], 3)
+
+        with self.assertRaises(ValueError):
+            dataset.stage_workers({"invalid": 1})
+        with self.assertRaises(ValueError):
+            dataset.stage_workers({dataset.STAGE_COMPILE: 0})
+
+
+class StorageTests(unittest.TestCase):
+    """Test dataset output stores."""
+
+    def setUp(self):
+        self.working = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.working)
+
+    def sample(self, component=TestConstantComponent):
+        return dataset.process(
+            TestArtifactBlueprint, [component], [], None, self.working
+        )
+
+    def test_directory_store(self):
+        record = self.sample()
+
+        with storage.DirectoryStore(self.working) as store:
+            artifacts = store.add(record)
+
+        self.assertEqual(len(artifacts), 1)
+        self.assertEqual(artifacts[0]["size"], len("constant"))
+        self.assertTrue(
+            os.path.isfile(os.path.join(self.working, artifacts[0]["path"]))
+        )
+
+    def test_content_addressed_store_deduplication(self):
+        first, second = self.sample(), self.sample()
+
+        with storage.ContentAddressedStore(self.working) as store:
+            first = store.add(first)
+            second = store.add(second)
+
+        self.assertEqual(first[0]["sha256"], second[0]["sha256"])
+        self.assertEqual(first[0]["object"], second[0]["object"])
+        self.assertNotEqual(first[0]["path"], second[0]["path"])
+
+        objects = os.path.join(self.working, storage.ContentAddressedStore.DIRECTORY)
+        self.assertEqual(
+            len(os.listdir(os.path.join(objects, first[0]["sha256"][:2]))), 1
+        )
+
+        stored = os.stat(os.path.join(self.working, first[0]["object"]))
+        linked = os.stat(os.path.join(self.working, first[0]["path"]))
+        self.assertTrue(os.path.samestat(stored, linked))
+
+    def test_retention_none(self):
+        record = self.sample()
+
+        with storage.DirectoryStore(self.working, storage.RETENTION_NONE) as store:
+            artifacts = store.add(record)
+
+        files = [
+            os.path.join(root, name)
+            for root, _, names in os.walk(record["directory"])
+            for name in names
+        ]
+
+        self.assertEqual(files, [os.path.join(self.working, artifacts[0]["path"])])
+
+    def test_retention_failure(self):
+        record = self.sample(component="invalid-component")
+
+        with storage.DirectoryStore(self.working, storage.RETENTION_FAILURE) as store:
+            store.fail(record)
+
+        self.assertIn("exception.txt", os.listdir(record["directory"]))
+
+        with storage.DirectoryStore(self.working, storage.RETENTION_NONE) as store:
+            store.fail(record)
+
+        self.assertFalse(os.path.exists(record["directory"]))
+
+    def test_discard(self):
+        record = self.sample()
+
+        with storage.DirectoryStore(self.working, storage.RETENTION_ALL) as store:
+            store.discard(record)
+
+        self.assertFalse(os.path.exists(record["directory"]))
+
+    def test_scratch_relocation(self):
+        output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output)
+
+        record = self.sample()
+
+        with storage.DirectoryStore(output, storage.RETENTION_ALL) as store:
+            artifacts = store.add(record)
+
+        self.assertFalse(os.path.exists(record["directory"]))
+        self.assertTrue(os.path.isfile(os.path.join(output, artifacts[0]["path"])))
+        self.assertTrue(
+            os.path.isfile(os.path.join(output, record["identifier"], "stdout.txt"))
+        )
+
+    def test_scratch_retention_none(self):
+        output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output)
+
+        record = self.sample()
+
+        with storage.ContentAddressedStore(output, storage.RETENTION_NONE) as store:
+            artifacts = store.add(record)
+
+        self.assertFalse(os.path.exists(record["directory"]))
+        self.assertEqual(
+            sorted(os.listdir(output)),
+            sorted([record["identifier"], storage.ContentAddressedStore.DIRECTORY]),
+        )
+        self.assertTrue(os.path.isfile(os.path.join(output, artifacts[0]["path"])))
+
+    def test_sharded_store(self):
+        records = [self.sample(), self.sample(TestComponent)]
+
+        with storage.ShardedStore(
+            self.working, storage.RETENTION_NONE, compression="deflate"
+        ) as store:
+            artifacts = [store.add(r) for r in records]
+
+        reader = storage.ShardReader(self.working)
+
+        self.assertEqual(len(reader), 2)
+
+        for record, artifact in zip(records, artifacts):
+            self.assertFalse(os.path.exists(record["directory"]))
+
+            members = reader.read(record["identifier"])
+            name = record["identifier"]
+
+            self.assertIn(name, members)
+            self.assertIn("labels.json", members)
+            self.assertEqual(len(members[name]), artifact[0]["size"])
+
+    def test_sharded_store_retention(self):
+        output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output)
+
+        record = self.sample()
+
+        with storage.ShardedStore(output, storage.RETENTION_ALL) as store:
+            store.add(record)
+
+        # Intermediates are kept, but artifacts are only stored in the shard.
+        kept = os.listdir(os.path.join(output, record["identifier"]))
+
+        self.assertIn("stdout.txt", kept)
+        self.assertNotIn(record["identifier"], kept)
+        self.assertFalse(os.path.exists(record["directory"]))
+
+        members = storage.ShardReader(output).read(record["identifier"])
+        self.assertEqual(members[record["identifier"]], b"constant")
+
+    def test_sharded_store_rollover(self):
+        records = [self.sample() for _ in range(3)]
+
+        with storage.ShardedStore(self.working, size=1) as store:
+            for record in records:
+                store.add(record)
+
+        shards = os.listdir(os.path.join(self.working, storage.ShardedStore.DIRECTORY))
+        self.assertEqual(len([s for s in shards if s.endswith(".tar")]), 3)
+
+        reader = storage.ShardReader(self.working)
+        for record in records:
+            name = record["identifier"]
+            self.assertEqual(reader.read(record["identifier"])[name], b"constant")
+
+    def test_delta_round_trip(self):
+        source = os.urandom(4096)
+        target = source[:1000] + b"inserted" + source[1000:3000] + source[3500:]
+
+        delta = storage.diff(source, target)
+
+        self.assertLess(len(delta), len(target))
+        self.assertEqual(storage.patch(source, delta), target)
+        self.assertEqual(storage.patch(b"", storage.diff(b"", target)), target)
+
+    def test_delta_edges(self):
+        source = os.urandom(4096)
+
+        for target in (
+            source,
+            source[:10],
+            source[-10:],
+            source + source[:100],
+            b"x" + source[1:],
+            source[:-1] + b"x",
+            source[:2048] + source[2049:],
+            source[3000:] + source[:3000],
+            b"",
+        ):
+            self.assertEqual(
+                storage.patch(source, storage.diff(source, target)), target
+            )
+
+        delta = storage.diff(source, source)
+
+        self.assertLess(len(delta), 32)
+
+    def test_delta_store(self):
+        records = [self.sample(TestComponent) for _ in range(5)]
+        for index, record in enumerate(records):
+            record["index"] = index
+
+        expected = {}
+        for record in records:
+            with open(record["artifacts"][0], "rb") as f:
+                expected[record["identifier"]] = f.read()
+
+        with storage.DeltaStore(
+            self.working, storage.RETENTION_NONE, keyframe=2
+        ) as store:
+            artifacts = [store.add(r) for r in reversed(records[:2])]
+            artifacts += [store.add(r) for r in records[2:]]
+
+        references = [a[0].get("reference") for a in artifacts]
+        self.assertEqual(references[:2], [None, None])
+        self.assertEqual(
+            references[2:], [records[1]["identifier"], records[1]["identifier"], None]
+        )
+
+        reader = storage.DeltaReader(self.working)
+
+        for identifier, content in expected.items():
+            self.assertEqual(reader.read(identifier)[identifier], content)
+
+    def test_content_addressed_store_distinct(self):
+        first, second = self.sample(), self.sample(TestComponent)
+
+        with storage.ContentAddressedStore(self.working) as store:
+            first = store.add(first)
+            second = store.add(second)
+
+        self.assertNotEqual(first[0]["sha256"], second[0]["sha256"])
+
+
+class InstrumentationTests(unittest.TestCase):
+    """Test build instrumentation."""
+
+    def setUp(self):
+        self.working = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.working)
+
+    def test_build_timings(self):
+        configuration = {
+            "name": "test",
+            "blueprint": {"class": TestArtifactBlueprint},
+            "components": [{"class": TestConstantComponent}],
+            "transforms": [{"class": TestTransform}],
+        }
+
+        result = build.build(configuration, self.working)
+        artifacts, tags = result
+
+        self.assertEqual(artifacts, result.artifacts)
+        self.assertEqual(tags, result.tags)
+
+        timings = result.timings
+
+        self.assertGreater(timings["wall"], 0)
+        self.assertEqual(
+            set(timings["stages"]),
+            {
+                "configure",
+                "generate",
+                "source-transforms",
+                "compile",
+                "artifact-transforms",
+            },
+        )
+        self.assertEqual(len(timings["transforms"]), 1)
+        self.assertEqual(timings["transforms"][0]["name"], "test")
+        self.assertEqual(timings["transforms"][0]["type"], "source")
+        self.assertEqual(timings["subprocesses"]["count"], 0)
+        self.assertEqual(timings["artifacts"][0]["size"], len("constant"))
+
+        unpickled = pickle.loads(pickle.dumps(result))
+
+        self.assertEqual(unpickled, result)
+        self.assertEqual(unpickled.timings, result.timings)
+
+    def test_subprocess_span(self):
+        with instrumentation.Collector() as collector:
+            utils.run("exit 0")
+
+        (span,) = collector.spans
+
+        self.assertEqual(span["category"], instrumentation.CATEGORY_SUBPROCESS)
+        self.assertEqual(span["details"]["cmd"], "exit 0")
+        self.assertEqual(span["details"]["status"], 0)
+        self.assertGreaterEqual(span["wall"], 0)
+
+    def test_subprocess_span_arguments(self):
+        with instrumentation.Collector() as collector:
+            utils.run([sys.executable, "-c", "pass"])
+
+        (span,) = collector.spans
+
+        self.assertEqual(span["name"], os.path.basename(sys.executable))
+        self.assertIn("-c pass", span["details"]["cmd"])
+
+    @unittest.skipUnless(hasattr(os, "wait4"), "requires os.wait4")
+    def test_subprocess_accounting(self):
+        with instrumentation.Collector() as collector:
+            with self.assertRaises(subprocess.CalledProcessError):
+                utils.run("exit 3", cwd=self.working)
+
+        (entry,) = instrumentation.accounting(collector.spans)
+
+        self.assertEqual(entry["cmd"], "exit 3")
+        self.assertEqual(entry["cwd"], self.working)
+        self.assertEqual(entry["status"], 3)
+        self.assertGreater(entry["maxrss"], 0)
+        self.assertGreaterEqual(entry["user"], 0)
+        self.assertGreaterEqual(entry["sys"], 0)
+
+        path = os.path.join(self.working, "accounting.jsonl")
+        with open(path, "w") as f:
+            instrumentation.write(f, [entry])
+            instrumentation.write(f, [entry])
+
+        with open(path, "r") as f:
+            self.assertEqual([json.loads(line) for line in f], [entry, entry])
+
+    @unittest.skipUnless(hasattr(os, "wait4"), "requires os.wait4")
+    def test_subprocess_children(self):
+        busy = threading.Thread(
+            target=utils.run,
+            args=([sys.executable, "-c", "sum(range(10 ** 7))"],),
+        )
+
+        with instrumentation.Collector() as collector:
+            with instrumentation.span("outer", instrumentation.CATEGORY_STAGE):
+                busy.start()
+                utils.run([sys.executable, "-c", "pass"])
+                busy.join()
+
+        child, outer = collector.spans
+
+        # CPU time of the subprocess on the other thread is not included.
+        self.assertAlmostEqual(
+            outer["children"],
+            child["details"]["user"] + child["details"]["sys"],
+        )
+        self.assertEqual(outer["children"], child["children"])
+
+    def test_subprocess_output(self):
+        stdout = os.path.join(self.working, "stdout.txt")
+
+        with open(stdout, "wb") as f:
+            output, errors = utils.run("echo hello; echo world >&2", stdout=f)
+
+        self.assertEqual(output, b"hello\n")
+        self.assertEqual(errors, b"world\n")
+
+        with open(stdout, "rb") as f:
+            self.assertEqual(f.read(), b"hello\n")
+
+    def test_dataset_spans(self):
+        record = dataset.process(
+            TestArtifactBlueprint, ["invalid-component"], [], None, self.working
+        )
+
+        self.assertIsNotNone(record["error"])
+        categories = [s["category"] for s in record["spans"]]
+
+        self.assertEqual(
+            categories[-2:],
+            [instrumentation.CATEGORY_BUILD, instrumentation.CATEGORY_SAMPLE],
+        )
+        self.assertIn("error", record["spans"][-1])
+
+    def test_trace(self):
+        with instrumentation.Collector() as collector:
+            with instrumentation.span("outer", instrumentation.CATEGORY_STAGE):
+                utils.run("exit 0")
+
+        trace = instrumentation.trace(collector.spans)
+
+        metadata = [e for e in trace["traceEvents"] if e["ph"] == "M"]
+        events = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+
+        self.assertEqual(len(metadata), 1)
+        self.assertEqual([e["name"] for e in events], ["outer", "exit"])
+        self.assertEqual(events[1]["args"]["cmd"], "exit 0")
+        self.assertEqual(events[0]["tid"], events[1]["tid"])
+        self.assertLessEqual(events[0]["ts"], events[1]["ts"])
+        self.assertGreaterEqual(events[0]["dur"], events[1]["dur"])
+
+    def test_nested_collectors(self):
+        with instrumentation.Collector() as outer:
+            with instrumentation.Collector() as inner:
+                with instrumentation.span("inner", instrumentation.CATEGORY_STAGE):
+                    pass
+
+            with instrumentation.span("outer", instrumentation.CATEGORY_STAGE):
+                pass
+
+        self.assertEqual([s["name"] for s in inner.spans], ["inner"])
+        self.assertEqual([s["name"] for s in outer.spans], ["inner", "outer"])
+
+    def test_span_error(self):
+        with instrumentation.Collector() as collector:
+            with self.assertRaises(ValueError):
+                with instrumentation.span("test", instrumentation.CATEGORY_STAGE):
+                    raise ValueError("failed")
+
+        self.assertEqual(collector.spans[0]["error"], "failed")
+
+
+class ManifestTests(unittest.TestCase):
+    """Test SQLite dataset manifests."""
+
+    def setUp(self):
+        self.working = tempfile.mkdtemp()
+        self.path = os.path.join(self.working, manifest.Manifest.FILENAME)
+
+    def tearDown(self):
+        shutil.rmtree(self.working)
+
+    def sample(self, component=TestConstantComponent):
+        return dataset.process(
+            TestArtifactBlueprint, [component], [], None, self.working
+        )
+
+    def test_manifest(self):
+        success, failure = self.sample(), self.sample(component="invalid-component")
+
+        with storage.DirectoryStore(self.working) as store:
+            artifacts = store.add(success)
+
+        with manifest.Manifest(self.path) as index:
+            index.add(success, artifacts)
+            index.add(failure)
+
+        connection = sqlite3.connect(self.path)
+        self.addCleanup(connection.close)
+
+        samples = dict(connection.execute("SELECT identifier, status FROM samples"))
+        self.assertEqual(
+            samples,
+            {success["identifier"]: "success", failure["identifier"]: "failure"},
+        )
+
+        identifiers = connection.execute(
+            "SELECT s.identifier FROM samples s "
+            "JOIN components c ON c.sample = s.identifier "
+            "JOIN tags t ON t.sample = s.identifier "
+            "WHERE c.name = ? AND t.key = ? AND s.duration IS NOT NULL",
+            ("test-constant", "test"),
+        ).fetchall()
+        self.assertEqual(identifiers, [(success["identifier"],)])
+
+        stored = connection.execute(
+            "SELECT path, sha256, size FROM artifacts WHERE sample = ?",
+            (success["identifier"],),
+        ).fetchall()
+        self.assertEqual(
+            stored,
+            [(artifacts[0]["path"], artifacts[0]["sha256"], artifacts[0]["size"])],
+        )
+
+        stages = connection.execute(
+            "SELECT name FROM timings WHERE sample = ? AND category = ?",
+            (success["identifier"], instrumentation.CATEGORY_STAGE),
+        ).fetchall()
+        self.assertIn(("compile",), stages)
+
+    def test_manifest_sharded(self):
+        record = self.sample()
+
+        with storage.ShardedStore(self.working, storage.RETENTION_NONE) as store:
+            artifacts = store.add(record)
+
+        with manifest.Manifest(self.path) as index:
+            index.add(record, artifacts)
+
+        connection = sqlite3.connect(self.path)
+        self.addCleanup(connection.close)
+
+        ((path, member),) = connection.execute(
+            "SELECT path, member FROM artifacts WHERE sample = ?",
+            (record["identifier"],),
+        ).fetchall()
+
+        with tarfile.open(os.path.join(self.working, path)) as shard:
+            self.assertEqual(shard.extractfile(member).read(), b"constant")
+
+    def test_manifest_migration(self):
+        connection = sqlite3.connect(self.path)
+        connection.executescript(
+            "CREATE TABLE artifacts (sample TEXT NOT NULL, path TEXT NOT NULL, "
+            "sha256 TEXT, size INTEGER);"
+        )
+        connection.close()
+
+        record = self.sample()
+
+        with storage.DirectoryStore(self.working) as store:
+            artifacts = store.add(record)
+
+        with manifest.Manifest(self.path) as index:
+            index.add(record, artifacts)
+
+    def test_manifest_batching(self):
+        index = manifest.Manifest(self.path, batch=2)
+        self.addCleanup(index.connection.close)
+
+        count = "SELECT COUNT(*) FROM samples"
+
+        index.add(self.sample())
+        self.assertEqual(index.connection.execute(count).fetchone(), (0,))
+
+        index.add(self.sample())
+        self.assertEqual(index.connection.execute(count).fetchone(), (2,))
+
+
+class CostModelTests(unittest.TestCase):
+    """Test build cost estimates."""
+
+    def setUp(self):
+        self.working = tempfile.mkdtemp()
+        self.path = os.path.join(self.working, "costs", "costs.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.working)
+
+    def record(self, components, wall, transforms=None, error=None, timeout=False):
+        transforms = [{"name": n, "wall": w} for n, w in (transforms or [])]
+
+        return {
+            "components": components,
+            "error": error,
+            "timeout": timeout,
+            "duration": wall,
+            "timings": (None if error else {"wall": wall, "transforms": transforms}),
+        }
+
+    def test_estimate(self):
+        with costs.CostModel(self.path) as model:
+            self.assertIsNone(model.estimate(["fast"]))
+
+            model.add(self.record(["fast", "slow:option=1"], 4.0, [("upx", 2.0)]))
+            model.add(self.record(["slow"], 5.0))
+
+            self.assertEqual(model.cost(costs.KIND_COMPONENT, "fast"), 1.0)
+            self.assertEqual(model.cost(costs.KIND_COMPONENT, "slow"), 3.0)
+            self.assertEqual(model.cost(costs.KIND_TRANSFORM, "upx"), 2.0)
+
+            self.assertEqual(model.estimate(["fast", "slow"], ["upx"]), 6.0)
+            self.assertEqual(model.estimate(["unknown"]), 2.0)
+
+    def test_failures(self):
+        with costs.CostModel(self.path) as model:
+            model.add(self.record(["failed"], 0.1, error="failure"))
+            model.add(self.record(["hung"], 10.0, error="timed out", timeout=True))
+
+            self.assertIsNone(model.cost(costs.KIND_COMPONENT, "failed"))
+            self.assertEqual(model.cost(costs.KIND_COMPONENT, "hung"), 10.0)
+
+            model.add(self.record(["failed", "hung"], 1.0))
+
+        with costs.CostModel(self.path) as model:
+            self.assertEqual(model.failure("failed"), (0.5, 2, 1))
+            self.assertEqual(model.failure("unknown"), (None, 0, 0))
+
+    def test_persistence(self):
+        with costs.CostModel(self.path) as model:
+            model.add(self.record([TestComponent], 1.0))
+
+        with costs.CostModel(self.path) as model:
+            model.add(self.record([TestComponent], 3.0))
+
+        with costs.CostModel(self.path) as model:
+            self.assertEqual(model.cost(costs.KIND_COMPONENT, TestComponent.name), 2.0)
+
+    def test_order(self):
+        with costs.CostModel(self.path) as model:
+            model.add(self.record(["fast"], 1.0))
+            model.add(self.record(["slow"], 9.0))
+
+            samples = [["fast"], ["unknown"], ["slow"], ["fast"]]
+
+            self.assertEqual(
+                model.order(samples), [["slow"], ["unknown"], ["fast"], ["fast"]]
+            )
+
+    def test_makespan(self):
+        self.assertEqual(costs.makespan([2, 3, 2, 3, 2], 2), 7)
+        self.assertEqual(costs.makespan([2, 3, 2, 3, 2], 8), 3)
+        self.assertEqual(costs.makespan([], 2), 0)
+
+    def test_project(self):
+        success = dataset.process(
+            TestArtifactBlueprint, [TestConstantComponent], [], None, self.working
+        )
+        failure = dataset.process(
+            TestArtifactBlueprint, ["invalid-component"], [], None, self.working
+        )
+
+        footprints = [(r, costs.footprint(r)) for r in (success, failure)]
+
+        self.assertEqual(
+            footprints[0][1]["artifacts"], os.path.getsize(success["artifacts"][0])
+        )
+        self.assertGreater(footprints[1][1]["logs"], 0)
+
+        with costs.CostModel(self.path) as model:
+            model.add(success)
+            model.add(failure)
+
+            samples = [([TestConstantComponent], [])] * 3 + [
+                (["invalid-component"], [])
+            ]
+
+            projection = costs.project(
+                model,
+                samples,
+                2,
+                footprints=footprints,
+                retention=storage.RETENTION_NONE,
+            )
+
+        self.assertEqual(projection["failures"], 1)
+        self.assertEqual(projection["artifacts"], 3 * footprints[0][1]["artifacts"])
+        self.assertEqual(projection["intermediates"], 0)
+        self.assertGreater(projection["wall"], 0)
+        self.assertEqual(projection["components"]["invalid-component"][0], 1.0)
+
+        with costs.CostModel(self.path) as model:
+            projection = costs.project(model, samples, 2)
+
+        self.assertIsNone(projection["artifacts"])
+
+
+class QuarantineTests(unittest.TestCase):
+    """Test Component quarantine lists."""
+
+    def setUp(self):
+        self.working = tempfile.mkdtemp()
+        self.path = os.path.join(self.working, "quarantine.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.working)
+
+    def test_quarantine(self):
+        quarantined = quarantine.Quarantine(self.path)
+        self.assertEqual(quarantined.components, {})
+
+        quarantined.add(TestComponent, "failed")
+        quarantined.add("broken:option=1", "failed")
+        quarantined.save()
+
+        quarantined = quarantine.Quarantine(self.path)
+
+        self.assertTrue(quarantined.excludes(TestComponent))
+        self.assertFalse(quarantined.excludes("broken"))
+        self.assertEqual(
+            quarantined.filter(["broken", "broken:option=1", TestComponent]),
+            ["broken"],
+        )
+
+    def test_combinations(self):
+        quarantined = quarantine.Quarantine(self.path)
+
+        quarantined.combine(["first", "second"], "conflict")
+        quarantined.combine(["second", "first"], "conflict")
+        quarantined.combine(["broken"], "failed")
+        quarantined.save()
+
+        quarantined = quarantine.Quarantine(self.path)
+
+        self.assertEqual(len(quarantined.combinations), 1)
+        self.assertTrue(quarantined.excludes("broken"))
+        self.assertFalse(quarantined.excludes("first"))
+
+        self.assertTrue(quarantined.allows(["first", "third"]))
+        self.assertFalse(quarantined.allows(["second", "third", "first"]))
+        self.assertFalse(quarantined.allows(["broken"]))
+
+    def test_combinations_multiplicity(self):
+        quarantined = quarantine.Quarantine(self.path)
+
+        quarantined.combine(["first", "first"], "conflict")
+        quarantined.save()
+
+        quarantined = quarantine.Quarantine(self.path)
+
+        self.assertFalse(quarantined.excludes("first"))
+        self.assertTrue(quarantined.allows(["first", "second"]))
+        self.assertFalse(quarantined.allows(["second", "first", "first"]))
+
+    def test_invalid(self):
+        with open(self.path, "w") as f:
+            json.dump([], f)
+
+        with self.assertRaises(ValueError):
+            quarantine.Quarantine(self.path)
+
+
+class DatasetCommandTests(unittest.TestCase):
+    """Test the dataset generation command."""
+
+    def setUp(self):
+        self.working = tempfile.mkdtemp()
+        self.output = os.path.join(self.working, "dataset")
+
+        self.synthetic = os.path.join(self.working, "synthetic.json")
+        with open(self.synthetic, "w") as f:
+            json.dump({"synthetic": {"count": 6}}, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.working)
+
+    def command(self, *arguments):
+        command = datasetsimilarity.Command()
+        parser = argparse.ArgumentParser()
+        command.add_arguments(parser)
+        options = parser.parse_args(
+            ["random", self.output, "--load", self.synthetic, "--component-count", "2"]
+            + list(arguments)
+        )
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            command.execute(options)
+
+    def test_maximum_samples(self):
+        self.command(
+            "--sample-count",
+            "10",
+            "--maximum-samples",
+            "3",
+            "--workers",
+            "2",
+            "--engine",
+            dataset.ENGINE_THREAD,
+            "--storage",
+            "sharded",
+            "--retention",
+            storage.RETENTION_NONE,
+        )
+
+        with open(os.path.join(self.output, "labels.json")) as f:
+            self.assertEqual(len(json.load(f)), 3)
+
+        # Samples in progress when the maximum was reached are discarded.
+        self.assertEqual(
+            sorted(os.listdir(self.output)),
+            [
+                "artifacts.json",
+                "labels.json",
+                manifest.Manifest.FILENAME,
+                storage.ShardedStore.DIRECTORY,
+            ],
+        )
+
+    def test_exclusions(self):
+        path = os.path.join(self.working, "quarantine.json")
+        with open(path, "w") as f:
+            json.dump(
+                {"components": {"synthetic-{}".format(i): "failed" for i in range(5)}},
+                f,
+            )
+
+        with mock.patch.object(datasetsimilarity.mutils, "print") as report:
+            with self.assertRaises(SystemExit):
+                self.command("--quarantine", path)
+
+        self.assertIn("only 1 component(s) remain", report.call_args[0][0])
+
+    def test_costs_disabled(self):
+        home = os.path.join(self.working, "home")
+        os.mkdir(home)
+
+        with mock.patch.dict(os.environ, {"HOME": home}):
+            self.command("--sample-count", "2", "--workers", "1")
+
+        self.assertEqual(os.listdir(home), [])
+
+        with self.assertRaises(SystemExit):
+            self.command("--schedule", "cost")
+
+    def test_costs(self):
+        path = os.path.join(self.working, "costs.sqlite")
+
+        self.command(
+            "--sample-count",
+            "2",
+            "--workers",
+            "1",
+            "--costs",
+            path,
+            "--schedule",
+            "cost",
+        )
+
+        with costs.CostModel(path) as model:
+            self.assertEqual(sum(a for a, _ in model.outcomes.values()), 4)
+
+    def test_costs_failure(self):
+        path = os.path.join(self.working, "costs.sqlite")
+
+        failure = sqlite3.OperationalError("database is locked")
+        with mock.patch.object(costs.CostModel, "close", side_effect=failure):
+            self.command("--sample-count", "2", "--workers", "1", "--costs", path)
+
+        with open(os.path.join(self.output, "labels.json")) as f:
+            self.assertEqual(len(json.load(f)), 2)
+
+
+class ProgressTests(unittest.TestCase):
+    """Test dataset progress reporting."""
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+
+        self.assertEqual(progress.percentile(values, 50), 50)
+        self.assertEqual(progress.percentile(values, 95), 95)
+        self.assertEqual(progress.percentile([3.0], 95), 3.0)
+        self.assertIsNone(progress.percentile([], 50))
+
+    def test_json_status(self):
+        stream = io.StringIO()
+
+        reporter = progress.Progress(
+            3, 2, mode=progress.MODE_JSON, stream=stream, interval=3600
+        )
+        reporter.update({"error": None, "duration": 1.0})
+        reporter.update({"error": "failed", "duration": 2.0})
+        reporter.close()
+
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[0]["completed"], 1)
+        self.assertEqual(lines[-1]["completed"], 1)
+        self.assertEqual(lines[-1]["failed"], 1)
+        self.assertEqual(lines[-1]["inflight"], 1)
+        self.assertEqual(lines[-1]["p95"], 2.0)
+        self.assertGreater(lines[-1]["rate"], 0)
+        self.assertIsNotNone(lines[-1]["eta"])
+
+
+class MetricsTests(unittest.TestCase):
+    """Test dataset metrics."""
+
+    def test_metrics_endpoint(self):
+        monitor = metrics.Metrics(2)
+        self.addCleanup(monitor.close)
+
+        record = {
+            "error": None,
+            "duration": 0.3,
+            "timings": {
+                "stages": {"compile": {"wall": 0.2, "cpu": 0.1}},
+                "subprocesses": {"count": 2, "wall": 0.2, "cpu": 0.1},
+            },
+        }
+
+        monitor.update(record, [{"size": 100}, {"size": 20}])
+        monitor.update({"error": "failed", "duration": 0.01})
+        monitor.update({"error": "timed out", "timeout": True, "duration": 0.01})
+
+        host, port = monitor.serve(0)
+
+        url = "http://{}:{}/metrics".format(host, port)
+        with urllib.request.urlopen(url) as response:
+            body = response.read().decode("utf-8")
+
+        lines = body.splitlines()
+
+        self.assertIn("helix_samples_built_total 1", lines)
+        self.assertIn("helix_samples_failed_total 2", lines)
+        self.assertIn("helix_samples_timed_out_total 1", lines)
+        self.assertIn("helix_written_bytes_total 120", lines)
+        self.assertIn(
+            'helix_stage_duration_seconds_bucket{le="0.25",stage="compile"} 1', lines
+        )
+        self.assertIn(
+            'helix_stage_duration_seconds_bucket{le="0.1",stage="compile"} 0', lines
+        )
+        self.assertIn('helix_sample_duration_seconds_bucket{le="+Inf"} 3', lines)
+        self.assertIn("helix_sample_duration_seconds_count 3", lines)
+
+
+class BenchmarkTests(unittest.TestCase):
+    """Test benchmark utilities."""
+
+    def test_measure(self):
+        configuration = {
+            "name": "test",
+            "blueprint": {"class": TestArtifactBlueprint},
+            "components": [{"class": TestConstantComponent}],
+            "transforms": [],
+        }
+
+        result = benchmark.measure(configuration, repeat=2)
+
+        self.assertEqual(result["samples"], 2)
+        self.assertGreater(result["rate"], 0)
+        self.assertIn("compile", result["stages"])
+
+    def test_compare(self):
+        def results(rate, maxrss, status=benchmark.STATUS_SUCCESS):
+            return {
+                "scenarios": {
+                    "test": {"status": status, "rate": rate, "maxrss": maxrss}
+                }
+            }
+
+        baseline = results(10.0, 100)
+
+        self.assertEqual(benchmark.compare(results(9.5, 105), baseline, 0.1), [])
+        self.assertEqual(
+            benchmark.compare(results(8.0, 100), baseline, 0.1),
+            [("test", "rate", 10.0, 8.0)],
+        )
+        self.assertEqual(
+            benchmark.compare(results(10.0, 200), baseline, 0.1),
+            [("test", "maxrss", 100, 200)],
+        )
+        self.assertEqual(
+            benchmark.compare(
+                results(None, None, benchmark.STATUS_FAILURE), baseline, 0.1
+            ),
+            [("test", "status", "success", "failure")],
+        )
+
+    def test_exponent(self):
+        sizes = [10, 100, 1000]
+
+        self.assertAlmostEqual(benchmark.exponent(sizes, [1, 10, 100]), 1.0)
+        self.assertAlmostEqual(benchmark.exponent(sizes, [1, 100, 10000]), 2.0)
+
+    def test_micro(self):
+        results = benchmark.micro(sizes=[1, 4], benchmarks=list(benchmark.MICRO))
+
+        for name, result in results["benchmarks"].items():
+            self.assertEqual(len(result["times"]), 2)
+            self.assertIsNotNone(result["exponent"])
+
+    def test_compare_micro(self):
+        def results(times, exponent):
+            return {
+                "benchmarks": {
+                    "test": {"sizes": [10, 100], "times": times, "exponent": exponent}
+                }
+            }
+
+        baseline = results([1.0, 10.0], 1.0)
+
+        self.assertEqual(
+            benchmark.compare_micro(results([1.0, 10.5], 1.02), baseline, 0.1), []
+        )
+        self.assertEqual(
+            benchmark.compare_micro(results([1.0, 100.0], 2.0), baseline, 0.1),
+            [("test", "time@100", 10.0, 100.0), ("test", "exponent", 1.0, 2.0)],
+        )
+
+
 SYSTEM_TESTS = [
     ConfigurationTests,
     DependencyTests,
     UtilityTests,
     BlueprintTests,
     ComponentTests,
+    SyntheticComponentTests,
     TransformTests,
     BuildTests,
+    DatasetTests,
+    StorageTests,
+    ManifestTests,
+    CostModelTests,
+    QuarantineTests,
+    DatasetCommandTests,
+    InstrumentationTests,
+    ProgressTests,
+    MetricsTests,
+    BenchmarkTests,
 ]
 
 INTEGRATION_TESTS = []
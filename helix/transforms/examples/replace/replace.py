@@ -63,7 +63,7 @@ class ReplaceExampleTransformTests(tests.UnitTestCase, tests.TransformTestCaseMi
             }
         )
 
-        output, _ = utils.run(artifacts[0], self.working)
+        output, _ = utils.run([artifacts[0]], self.working)
 
         self.assertNotIn(b"hello", output)
         self.assertIn(b"goodbye", output)
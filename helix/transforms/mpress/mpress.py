@@ -30,6 +30,8 @@ class MPRESSTransform(transform.Transform):
 
         shutil.copy(source, destination)
 
-        cmd = "{} {}".format(self.mpress, destination)
+        mpress = utils.find("mpress", quote=False)
+
+        cmd = [mpress, destination]
 
         utils.run(cmd, cwd, MPRESSError("MPRESS failed to run."))
@@ -36,13 +36,13 @@ class StripTransform(transform.Transform):
     def transform(self, source, destination):
         """Strip the target binary."""
 
-        strip = utils.find("strip")
+        strip = utils.find("strip", quote=False)
 
         source = os.path.abspath(source)
         destination = os.path.abspath(destination)
 
         cwd, _ = os.path.split(source)
 
-        cmd = "{} {} -o {}".format(strip, source, destination)
+        cmd = [strip, source, "-o", destination]
 
         utils.run(cmd, cwd, StripError("strip failed to run."))
@@ -41,13 +41,13 @@ class UPXTransform(transform.Transform):
     def transform(self, source, destination):
         """Apply UPX to the target binary."""
 
-        upx = utils.find("upx")
+        upx = utils.find("upx", quote=False)
 
         source = os.path.abspath(source)
         destination = os.path.abspath(destination)
 
         cwd, _ = os.path.split(source)
 
-        cmd = "{} {} -o {} -f".format(upx, source, destination)
+        cmd = [upx, source, "-o", destination, "-f"]
 
         utils.run(cmd, cwd, UPXError("UPX failed to run."))
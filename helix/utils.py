@@ -1,11 +1,22 @@
+import io
 import os
 import re
 import abc
+import sys
+import time
+import shlex
+import signal
+import shutil
 import string
+import functools
+import contextlib
+import threading
+import collections
 import subprocess
 import pkg_resources
 
 from . import exceptions
+from . import instrumentation
 
 
 class Metadata(object, metaclass=abc.ABCMeta):
@@ -358,7 +369,7 @@ class WindowsChocolateyDependency(Dependency):
     def install(self, verbose=False):
         """Install the package with Chocolatey."""
 
-        choco = find("choco")
+        choco = find("choco", quote=False)
 
         if not choco:
             raise exceptions.MissingDependency(
@@ -366,7 +377,7 @@ class WindowsChocolateyDependency(Dependency):
             )
 
         run(
-            "{} install -y {}".format(choco, self.package),
+            [choco, "install", "-y", self.package],
             ".",
             exceptions.DependencyInstallationFailure(
                 "failed to install {}".format(self.package)
@@ -377,7 +388,7 @@ class WindowsChocolateyDependency(Dependency):
     def installed(self):
         """Check if the package is installed with Chocolately."""
 
-        choco = find("choco")
+        choco = find("choco", quote=False)
 
         if not choco:
             raise exceptions.MissingDependency(
@@ -385,7 +396,7 @@ class WindowsChocolateyDependency(Dependency):
             )
 
         output, _ = run(
-            "{} list -e {}".format(choco, self.package),
+            [choco, "list", "-e", self.package],
             ".",
         )
 
@@ -423,16 +434,16 @@ class LinuxAPTDependency(Dependency):
     def install(self, verbose=False):
         """Install the package with APT."""
 
-        apt = find("apt")
+        apt = find("apt", quote=False)
 
         if not apt:
             raise exceptions.MissingDependency("APT is not installed on this platform")
 
         def command(cmd, sudo=False, error=None):
-            sudo = "sudo" if sudo else ""
+            sudo = ["sudo"] if sudo else []
 
             run(
-                "{} {} {}".format(sudo, apt, cmd),
+                sudo + [apt] + cmd,
                 ".",
                 error,
                 propagate=verbose,
@@ -444,16 +455,16 @@ class LinuxAPTDependency(Dependency):
         )
 
         try:
-            command("update", sudo=sudo, error=permissions)
+            command(["update"], sudo=sudo, error=permissions)
         except exceptions.DependencyInstallationFailure:
             if verbose:
                 print("\nfailed to install: attempting to elevate\n")
 
             sudo = True
-            command("update", sudo=sudo, error=permissions)
+            command(["update"], sudo=sudo, error=permissions)
 
         command(
-            "install -y {}".format(self.package),
+            ["install", "-y", self.package],
             sudo=sudo,
             error=exceptions.DependencyInstallationFailure(
                 "failed to install {}".format(self.package)
@@ -463,14 +474,14 @@ class LinuxAPTDependency(Dependency):
     def installed(self):
         """Check if the package is installed with dpkg."""
 
-        dpkg = find("dpkg")
+        dpkg = find("dpkg", quote=False)
 
         if not dpkg:
             raise exceptions.MissingDependency("dpkg is not installed on this platform")
 
         try:
             run(
-                "{} -s {}".format(dpkg, self.package),
+                [dpkg, "-s", self.package],
                 ".",
             )
         except subprocess.CalledProcessError:
@@ -521,10 +532,19 @@ class ScriptDependency(Dependency):
                 "---------------------------------- Installing ----------------------------------"
             )
 
+        command = [self.path]
+
+        # Scripts without a shebang are run by the shell, as they would be
+        # from a shell (which falls back to ``sh`` on ``ENOEXEC``).
+        if os.name == "posix":
+            with open(self.path, "rb") as f:
+                if f.read(2) != b"#!":
+                    command = ["/bin/sh", self.path]
+
         exception = None
         try:
             run(
-                self.path,
+                command,
                 ".",
                 exceptions.DependencyInstallationFailure(
                     "dependency installation failed"
@@ -685,7 +705,7 @@ def substitute(template, safe=True, **kwargs):
         return template.substitute(kwargs)
 
 
-def find(name, environment=None, guess=None):
+def find(name, environment=None, guess=None, quote=True):
     """Finds a particular binary on this system.
 
     Attempts to find the binary given by ``name``, first checking the value of
@@ -693,12 +713,16 @@ def find(name, environment=None, guess=None):
     checking the system path, then finally checking hardcoded paths in
     ``guess`` (if provided). This function is cross-platform compatible - it
     works on Windows, Linux, and Mac. If there are spaces in the path found,
-    this function will wrap its return value in double quotes.
+    this function will wrap its return value in double quotes unless
+    ``quote`` is ``False``.
 
     Args:
         name (str): Binary name.
         environment (str): An optional environment variable to check.
         guess (iterable): An optional list of hardcoded paths to check.
+        quote (bool): If ``True``, quote paths with spaces for use in a shell
+            command string. Pass ``False`` when building an argument list for
+            ``run``. Default: ``True``.
 
     Returns:
         A string with the absolute path to the binary if found, otherwise
@@ -707,7 +731,7 @@ def find(name, environment=None, guess=None):
 
     def sanitize(path):
         quotes = ("'", "'")
-        if " " in path and path[0] not in quotes and path[-1] not in quotes:
+        if quote and " " in path and path[0] not in quotes and path[-1] not in quotes:
             path = '"{}"'.format(path)
 
         return path
@@ -719,22 +743,13 @@ def find(name, environment=None, guess=None):
             if os.path.isfile(path):
                 return sanitize(path)
 
-    if os.name == "posix":
-        search = "which"
-    elif os.name == "nt":
-        search = "where.exe"
-    else:
+    if os.name not in ("posix", "nt"):
         raise EnvironmentError("unknown platform: {}".format(os.name))
 
-    try:
-        with open(os.devnull, "w") as output:
-            path = subprocess.check_output([search, name], stderr=output).decode(
-                "utf-8"
-            )
+    path = shutil.which(name)
 
-        return sanitize(os.path.abspath(path.strip()))
-    except subprocess.CalledProcessError:
-        pass
+    if path is not None:
+        return sanitize(os.path.abspath(path))
 
     if guess:
         for path in guess:
@@ -744,59 +759,479 @@ def find(name, environment=None, guess=None):
     return None
 
 
-def run(cmd, cwd=None, exception=None, propagate=False, stdout=None, stderr=None):
+@functools.lru_cache(maxsize=None)
+def _environment(overrides):
+    """A cached copy of the environment with the given overrides applied."""
+
+    environment = dict(os.environ)
+    environment.update(overrides)
+
+    return environment
+
+
+def environment(overrides=None):
+    """Build the environment for a subprocess.
+
+    Environments are cached by their overrides, so repeated calls with the
+    same overrides do not copy ``os.environ`` again.
+
+    Args:
+        overrides (dict): Environment variables to add or replace.
+
+    Returns:
+        A dictionary environment or ``None`` (inherit the environment of the
+        current process) if there are no overrides.
+
+    Note:
+        The environment of the current process is read the first time a given
+        set of overrides is used - call ``environment.cache_clear()`` after
+        modifying ``os.environ`` to pick up changes.
+    """
+
+    if not overrides:
+        return None
+
+    return _environment(tuple(sorted(overrides.items())))
+
+
+environment.cache_clear = _environment.cache_clear
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve(executable, path):
+    """Resolve an executable name to an absolute path, if possible."""
+
+    return shutil.which(executable, path=path) or executable
+
+
+def _argv(cmd, env):
+    """Normalize a command argument list for direct execution."""
+
+    try:
+        argv = [os.fspath(a) for a in cmd]
+    except TypeError:
+        raise TypeError(
+            "invalid command {!r}: arguments must be strings or paths".format(cmd)
+        )
+
+    if argv and not os.path.dirname(argv[0]):
+        path = (env if env is not None else os.environ).get("PATH")
+        argv[0] = _resolve(argv[0], path)
+
+    return argv
+
+
+_limits = threading.local()
+
+
+@contextlib.contextmanager
+def deadline(timeout=None, command=None):
+    """Limit the run time of commands run by the current thread.
+
+    Commands started with ``run`` inside of this context are killed (along
+    with their process group) if they run past ``timeout`` seconds from entry
+    into this context or if they individually run for longer than
+    ``command`` seconds. Nested contexts may only tighten limits.
+
+    Args:
+        timeout (float): The total time allowed for all commands in this
+            context or ``None`` for no limit.
+        command (float): The time allowed for each command or ``None`` for no
+            limit.
+
+    Example:
+        Limit a build to five minutes with no single command taking more than
+        one minute::
+
+            with utils.deadline(300, command=60):
+                build.build(configuration, output)
+    """
+
+    previous = getattr(_limits, "value", (None, None))
+    expires, limit = previous
+
+    if timeout is not None:
+        end = time.monotonic() + timeout
+        expires = end if expires is None else min(expires, end)
+    if command is not None:
+        limit = command if limit is None else min(limit, command)
+
+    _limits.value = (expires, limit)
+
+    try:
+        yield
+    finally:
+        _limits.value = previous
+
+
+def _remaining(timeout):
+    """The time a command may run given its timeout and the thread's limits."""
+
+    expires, limit = getattr(_limits, "value", (None, None))
+
+    candidates = [t for t in (timeout, limit) if t is not None]
+    if expires is not None:
+        candidates.append(expires - time.monotonic())
+
+    return min(candidates) if candidates else None
+
+
+def _kill(process, group):
+    """Kill a process or, if it leads one, its entire process group."""
+
+    try:
+        if group:
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class _Tail(object):
+    """A chunked byte buffer, optionally bounded to its last ``limit`` bytes.
+
+    Args:
+        limit (int): The maximum number of bytes to retain or ``None`` to
+            retain everything.
+    """
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.chunks = collections.deque()
+        self.size = 0
+
+    def append(self, chunk):
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+
+        if self.limit is not None:
+            while self.chunks and self.size - len(self.chunks[0]) >= self.limit:
+                self.size -= len(self.chunks.popleft())
+
+    def value(self):
+        value = b"".join(self.chunks)
+
+        if self.limit is not None:
+            value = value[max(len(value) - self.limit, 0) :]
+
+        return value
+
+
+def _writer(target, live=False):
+    """Build a function which writes binary chunks to a file or fileno."""
+
+    if isinstance(target, int):
+
+        def write(chunk):
+            view = memoryview(chunk)
+            while view:
+                view = view[os.write(target, view) :]
+
+        return write
+
+    # Text streams (e.g., ``sys.stdout``) are written through their binary
+    # buffer where possible.
+    buffer = getattr(target, "buffer", None)
+
+    if buffer is None and isinstance(target, io.TextIOBase):
+
+        def write(chunk):
+            target.write(chunk.decode("utf-8", errors="replace"))
+            if live:
+                target.flush()
+
+        return write
+
+    if buffer is not None:
+        target.flush()
+        target = buffer
+
+    def write(chunk):
+        target.write(chunk)
+        if live:
+            target.flush()
+
+    return write
+
+
+def _drain(pipe, tail, writers, errors):
+    """Stream a pipe to completion in a background thread.
+
+    Chunks are written to each of ``writers`` as they are read and retained in
+    ``tail``. Any exception raised while writing is appended to ``errors``,
+    after which the pipe is still drained so that the process cannot block.
+    """
+
+    for chunk in iter(lambda: pipe.read(65536), b""):
+        tail.append(chunk)
+
+        for write in writers:
+            try:
+                write(chunk)
+            except Exception as e:
+                errors.append(e)
+                writers = []
+
+    pipe.close()
+
+
+def _wait(process):
+    """Wait for a process, returning its resource usage if available.
+
+    Returns:
+        A dictionary of ``user`` and ``sys`` CPU time (seconds) and
+        ``maxrss`` (bytes) of the process and its waited-for descendants, or
+        an empty dictionary if ``os.wait4`` is not supported.
+
+    Note:
+        On Linux, ``maxrss`` of a forked child may include the resident set
+        size of the parent at the time of the fork.
+    """
+
+    if not hasattr(os, "wait4"):
+        process.wait()
+        return {}
+
+    _, status, rusage = os.wait4(process.pid, 0)
+
+    if os.WIFSIGNALED(status):
+        process.returncode = -os.WTERMSIG(status)
+    else:
+        process.returncode = os.WEXITSTATUS(status)
+
+    # ``ru_maxrss`` is in kilobytes on Linux but bytes on macOS.
+    scale = 1 if sys.platform == "darwin" else 1024
+
+    return {
+        "user": rusage.ru_utime,
+        "sys": rusage.ru_stime,
+        "maxrss": rusage.ru_maxrss * scale,
+    }
+
+
+def _spawn(arguments, cwd, env, shell, group, propagate):
+    """Start a subprocess for ``run``."""
+
+    return subprocess.Popen(
+        arguments,
+        # Leave the working directory unset when it would not change, so
+        # that ``posix_spawn`` may be used.
+        cwd=None if cwd == os.getcwd() else cwd,
+        env=env,
+        shell=shell,
+        # File descriptors opened by Python are not inheritable, so there
+        # is no need to close them in the child - closing them prevents
+        # the use of ``posix_spawn``.
+        close_fds=os.name != "posix",
+        start_new_session=group,
+        stdout=None if propagate else subprocess.PIPE,
+        stderr=None if propagate else subprocess.PIPE,
+    )
+
+
+def run(
+    cmd,
+    cwd=None,
+    exception=None,
+    propagate=False,
+    stdout=None,
+    stderr=None,
+    tee=False,
+    tail=None,
+    env=None,
+    timeout=None,
+):
     """Run the given command as a subprocess.
 
     This function caputres ``stdout`` and ``stderr`` by default and returns
     them, and raises the given exception if the process fails.
 
+    Output is read concurrently from both pipes in bounded chunks and streamed
+    directly to ``stdout`` and ``stderr`` (and, with ``tee``, to stdout and
+    stderr of the current process) as it is produced, so memory usage is
+    bounded by ``tail`` rather than by the size of the output.
+
+    Commands given as a list of arguments are executed directly, without a
+    shell (using ``posix_spawn`` where the platform supports it). Commands
+    given as a string are run with the system shell, for backwards
+    compatibility and for commands that need shell features.
+
+    Each invocation is recorded as an ``instrumentation`` span including the
+    command, working directory, exit status and, where supported, the user
+    and system CPU time and maximum resident set size of the process.
+
     Args:
-        cmd (str): The command to run.
+        cmd (list): The command to run as a list of arguments or a string to
+            be run with the shell.
         cwd (str): The working directory in which to run the command.
         exception: An exception to raise if the command fails.
         propagate (bool): If ``True``, command output will be written to stdout
             and stderr of the current process, otherwise command output is
             captured and returned (and written to ``stdout`` and ``stderr`` if
             provided). Default: ``False``.
-        stdout (file): An open file-like object or fileno where stdout should
-            be written or ``None``.
-        stderr (file): An open file-like object or fileno where stderr should
-            be written or ``None``.
+        stdout (file): An open binary file-like object or fileno where stdout
+            should be written or ``None``.
+        stderr (file): An open binary file-like object or fileno where stderr
+            should be written or ``None``.
+        tee (bool): If ``True``, captured output is also written to stdout and
+            stderr of the current process in real time. Default: ``False``.
+        tail (int): If provided, only the last ``tail`` bytes of each stream
+            are retained in memory and returned, otherwise all output is
+            returned. Default: ``None``.
+        env (dict): Environment variables to add or replace in the environment
+            of the command. Default: ``None``.
+        timeout (float): The number of seconds after which the command (and
+            its process group) is killed. This is further limited by any
+            enclosing ``deadline``. Default: ``None``.
 
     Returns:
         Output to stdout and stderr as binary strings.
 
+    Raises:
+        CalledProcessError: if the command fails and no ``exception`` is
+            given, with the (``tail`` bounded) output of the command as its
+            ``output`` and ``stderr`` attributes. If an ``exception`` is
+            given, it is raised from this error.
+        OSError: if the command cannot be started (e.g., its executable does
+            not exist) and no ``exception`` is given. If an ``exception`` is
+            given, it is raised from this error.
+        TypeError: if a command list contains something other than strings
+            and paths (e.g., an executable which ``find`` did not find) and no
+            ``exception`` is given. If an ``exception`` is given, it is raised
+            from this error.
+        BuildTimeout: if the command is killed because it ran out of time,
+            regardless of ``exception``.
+
     Note:
-        Without adding sufficient complexity (additional threads) output cannot
-        be both captured and printed stdout/stderr of the current process in
-        real time. If this is called with ``propagate=True``, then no output
+        If this is called with ``propagate=True``, the subprocess writes
+        directly to stdout and stderr of the current process and no output
         will be returned or written to the provided ``stdout``/``stderr``
-        arguments.
+        arguments - use ``tee`` to both capture and display output.
     """
 
-    cwd = cwd or os.path.abspath(".")
+    cwd = os.path.abspath(cwd or ".")
+    env = environment(env)
 
-    process = subprocess.run(
-        cmd,
-        cwd=cwd,
-        shell=True,
-        stdout=None if propagate else subprocess.PIPE,
-        stderr=None if propagate else subprocess.PIPE,
-    )
+    shell = isinstance(cmd, str)
+
+    if shell:
+        arguments = cmd
+        display = cmd
+        executable = cmd.split()[0] if cmd.split() else "run"
+    else:
+        try:
+            arguments = _argv(cmd, env)
+        except TypeError as e:
+            # E.g., a tool which ``find`` could not find.
+            if exception:
+                raise exception from e
+            raise
+
+        display = (
+            subprocess.list2cmdline(arguments)
+            if os.name == "nt"
+            else " ".join(shlex.quote(a) for a in arguments)
+        )
+        executable = arguments[0] if arguments else "run"
+
+    executable = os.path.basename(executable)
 
-    if stdout and process.stdout:
-        stdout.write(process.stdout)
-        stdout.flush()
-    if stderr and process.stderr:
-        stderr.write(process.stderr)
-        stderr.flush()
+    remaining = _remaining(timeout)
+    if remaining is not None and remaining <= 0:
+        raise exceptions.BuildTimeout("out of time before running: {}".format(display))
+
+    # Commands with a timeout lead their own process group so that all of
+    # their descendants may be killed with them.
+    group = remaining is not None and os.name == "posix"
+
+    with instrumentation.span(
+        executable, instrumentation.CATEGORY_SUBPROCESS, cmd=display, cwd=cwd
+    ) as span:
+        try:
+            process = _spawn(arguments, cwd, env, shell, group, propagate)
+        except OSError as e:
+            # E.g., an executable which does not exist.
+            if exception:
+                raise exception from e
+            raise
+
+        expired = threading.Event()
+        timer = None
+        if remaining is not None:
+
+            def expire():
+                expired.set()
+                _kill(process, group)
+
+            timer = threading.Timer(remaining, expire)
+            timer.daemon = True
+            timer.start()
+
+        output, errors = _Tail(tail), _Tail(tail)
+        failures = []
+        readers = []
+        if not propagate:
+            for pipe, buffer, target, terminal in (
+                (process.stdout, output, stdout, sys.stdout),
+                (process.stderr, errors, stderr, sys.stderr),
+            ):
+                writers = []
+                if target is not None:
+                    writers.append(_writer(target))
+                if tee:
+                    writers.append(_writer(terminal, live=True))
+
+                reader = threading.Thread(
+                    target=_drain, args=(pipe, buffer, writers, failures)
+                )
+                reader.start()
+                readers.append(reader)
+
+        try:
+            usage = _wait(process)
+            span["details"].update(usage)
+
+            if usage:
+                instrumentation.charge(usage["user"] + usage["sys"])
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if group:
+                # Clean up any descendants left behind.
+                _kill(process, group)
+
+            for reader in readers:
+                reader.join()
+
+        span["details"]["status"] = process.returncode
+        if expired.is_set():
+            span["details"]["timeout"] = remaining
+
+    for target in (stdout, stderr):
+        if target is not None and hasattr(target, "flush") and not propagate:
+            target.flush()
+
+    if failures:
+        raise failures[0]
+
+    output = None if propagate else output.value()
+    errors = None if propagate else errors.value()
 
     if process.returncode != 0:
+        error = subprocess.CalledProcessError(
+            cmd=cmd, returncode=process.returncode, output=output, stderr=errors
+        )
+
+        if expired.is_set():
+            raise exceptions.BuildTimeout(
+                "timed out after {:.2f}s: {}".format(remaining, display)
+            ) from error
         if exception:
-            raise exception
-        raise subprocess.CalledProcessError(cmd=cmd, returncode=process.returncode)
+            raise exception from error
+        raise error
 
-    return process.stdout, process.stderr
+    return output, errors
 
 
 def parse(specification):
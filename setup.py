@@ -53,6 +53,7 @@ setup(
             "sphinx_rtd_theme",
         ],
         "testing": ["unittest-xml-reporting", "flake8-formatter-junit-xml"],
+        "zstd": ["zstandard"],
         # Platform-specific extras.
         # It's not necessary to specify these extras when installing HELIX.
         # Because of the environment markers here make these dependency lists
@@ -88,7 +89,9 @@ setup(
             "linux-openssl-aes-encrypt-data-encrypted = helix.components.attack.exfiltration.data_encrypted.openssl.aes.aes:AttackLinuxOpenSSLAESEncryptDataEncryptedComponent [linux]",
             "linux-openssl-aes-decrypt-data-encrypted = helix.components.attack.exfiltration.data_encrypted.openssl.aes.aes:AttackLinuxOpenSSLAESDecryptDataEncryptedComponent [linux]",
         ],
-        "helix.components.loaders": [],
+        "helix.components.loaders": [
+            "synthetic = helix.components.examples.synthetic.synthetic:SyntheticComponentLoader",
+        ],
         "helix.transforms": [
             "replace-example = helix.transforms.examples.replace.replace:ReplaceExampleTransform",
             "strip = helix.transforms.strip.strip:StripTransform [linux]",